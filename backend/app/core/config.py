@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import List
 from pydantic import Field, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict 
 
@@ -26,6 +27,28 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = Field(default=500, gt=0, description="Harus lebih besar dari 0")
     TEMPERATURE: float = Field(default=0.0, ge=0.0, le=2.0, description="Range 0.0 sampai 2.0")
 
+    # LLM circuit breaker & warm-up
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = Field(default=5, gt=0, description="Kegagalan LLM berturut-turut sebelum circuit dibuka")
+    LLM_CIRCUIT_RESET_SECONDS: float = Field(default=30.0, gt=0, description="Lama circuit terbuka sebelum panggilan percobaan")
+    LLM_WARMUP_ENABLED: bool = Field(default=True, description="Buka koneksi HTTP ke provider LLM saat startup worker")
+
+    # Adaptive narrative call: turunkan max_tokens / pakai prompt narasi pendek saat LLM lambat
+    LLM_ADAPTIVE_ENABLED: bool = Field(default=True, description="Aktifkan controller degradasi narrative call")
+    LLM_SLO_P95_MS: float = Field(default=8000.0, gt=0, description="Target p95 latency narrative call (ms)")
+    LLM_SLO_QUEUE_DEPTH: int = Field(default=16, gt=0, description="Target maksimum narrative call yang berjalan bersamaan per worker")
+    LLM_RECOVER_RATIO: float = Field(default=0.7, gt=0.0, lt=1.0, description="Hysteresis: naik level lagi hanya jika p95 & antrean di bawah target x rasio ini")
+    LLM_DEGRADE_COOLDOWN_SECONDS: float = Field(default=20.0, ge=0, description="Jeda minimum antar perubahan level")
+    LLM_LATENCY_WINDOW: int = Field(default=50, ge=5, description="Jumlah sampel latency terakhir untuk menghitung p95")
+    LLM_DEGRADE_TOKEN_FACTORS: List[float] = Field(
+        default=[1.0, 0.6, 0.35],
+        description="Pengali MAX_TOKENS per level degradasi, level 0 = normal (JSON list)"
+    )
+    LLM_SHORT_PROMPT_LEVEL: int = Field(default=1, ge=0, description="Mulai level ini prompt narasi pendek dipakai")
+
+    # Storage backend (lihat app.db.storage)
+    STORAGE_BACKEND: str = Field(default="postgres", pattern="^(postgres|sqlite|memory)$", description='"postgres", "sqlite" (satu node, file SQLITE_PATH) atau "memory" (test/demo, data hilang saat restart, satu worker)')
+    SQLITE_PATH: str = Field(default="ai_dungeon.sqlite3", description="File database untuk STORAGE_BACKEND=sqlite")
+
     # PostgreSQL Configuration
     POSTGRES_USER: str = Field(default="dungeon_user", description="PostgreSQL username")
     POSTGRES_PASSWORD: SecretStr = Field(default="dungeon_secret_password", description="PostgreSQL password")
@@ -33,6 +56,97 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = Field(default=5432, description="PostgreSQL port")
     POSTGRES_DB: str = Field(default="ai_dungeon", description="PostgreSQL database name")
 
+    DB_STARTUP_TIMEOUT: float = Field(default=60.0, gt=0, description="Batas tunggu database siap saat startup worker (detik)")
+
+    # Connection Pool
+    DB_POOL_MIN_SIZE: int = Field(default=1, ge=0, description="Koneksi yang dibuka saat pool dibuat")
+    DB_POOL_MAX_SIZE: int = Field(default=10, gt=0, description="Maksimum koneksi per worker")
+    DB_POOL_MAX_WAITERS: int = Field(default=50, ge=0, description="Maksimum request yang boleh antre menunggu koneksi")
+    DB_POOL_CHECKOUT_TIMEOUT: float = Field(default=5.0, gt=0, description="Batas tunggu koneksi sebelum 503 (detik)")
+    DB_POOL_MAX_LIFETIME: float = Field(default=1800.0, gt=0, description="Koneksi lebih tua dari ini dibuat ulang (detik)")
+    DB_POOL_PING_AFTER: float = Field(default=30.0, ge=0, description="Cek liveness koneksi yang idle lebih lama dari ini (detik)")
+    DB_POOL_LEAK_THRESHOLD: float = Field(default=30.0, ge=0, description="Laporkan (dengan stack trace) koneksi yang dipegang lebih lama dari ini, 0 = nonaktif")
+
+    # Read replica (opsional): GET /game/{id}, history, story card & preset dibaca dari replica
+    POSTGRES_REPLICA_SERVER: str = Field(default="", description="Host read replica (user/password/db sama dengan primary), kosong = semua query ke primary")
+    POSTGRES_REPLICA_PORT: int = Field(default=5432, description="Port read replica")
+    DB_REPLICA_MAX_LAG_SECONDS: float = Field(default=5.0, gt=0, description="Replica yang tertinggal lebih dari ini tidak dipakai; session yang baru ditulis worker lain dibaca dari primary selama ini")
+    DB_REPLICA_LAG_CHECK_SECONDS: float = Field(default=1.0, gt=0, description="Interval cek lag replica per worker")
+
+    DB_PREPARED_STATEMENTS: bool = Field(default=True, description="Named prepared statement untuk query hot path (matikan di belakang PgBouncer transaction mode)")
+
+    # Server (serve.py)
+    SERVER_HOST: str = Field(default="0.0.0.0", description="Alamat bind server")
+    SERVER_PORT: int = Field(default=8000, gt=0, description="Port server")
+    SERVER_WORKERS: int = Field(default=0, ge=0, description="Jumlah proses worker, 0 = jumlah CPU")
+    SHUTDOWN_GRACE_SECONDS: float = Field(default=30.0, ge=0, description="Batas tunggu request & turn LLM yang sedang berjalan saat SIGTERM")
+
+    # Rate limiting (token bucket per session_id & per IP; rate = token per menit)
+    RATE_LIMIT_ENABLED: bool = Field(default=True, description="Aktifkan rate limiting middleware")
+    RATE_LIMIT_BACKEND: str = Field(default="memory", pattern="^(memory|postgres)$", description='"memory" (satu worker) atau "postgres" (bucket dibagi antar worker)')
+    RATE_LIMIT_LLM_SESSION_RATE: float = Field(default=20.0, gt=0, description="Endpoint LLM (/game/action, /game/new, aksi WebSocket): request per menit per session")
+    RATE_LIMIT_LLM_SESSION_BURST: int = Field(default=5, gt=0, description="Burst endpoint LLM per session")
+    RATE_LIMIT_LLM_IP_RATE: float = Field(default=60.0, gt=0, description="Endpoint LLM: request per menit per IP")
+    RATE_LIMIT_LLM_IP_BURST: int = Field(default=10, gt=0, description="Burst endpoint LLM per IP")
+    RATE_LIMIT_READ_SESSION_RATE: float = Field(default=300.0, gt=0, description="Endpoint murah (read): request per menit per session")
+    RATE_LIMIT_READ_SESSION_BURST: int = Field(default=50, gt=0, description="Burst endpoint read per session")
+    RATE_LIMIT_READ_IP_RATE: float = Field(default=1200.0, gt=0, description="Endpoint read: request per menit per IP")
+    RATE_LIMIT_READ_IP_BURST: int = Field(default=200, gt=0, description="Burst endpoint read per IP")
+    RATE_LIMIT_MAX_KEYS: int = Field(default=100000, gt=0, description="Backend memory: jumlah maksimum bucket yang disimpan")
+
+    # Session Cache (in-process LRU, invalidasi antar worker via LISTEN/NOTIFY)
+    SESSION_CACHE_SIZE: int = Field(default=1000, ge=0, description="Jumlah maksimum session di cache, 0 = nonaktif")
+
+    # WebSocket Game Channel
+    WS_HEARTBEAT_INTERVAL: float = Field(default=15.0, gt=0, description="Interval ping server (detik)")
+    WS_HEARTBEAT_TIMEOUT: float = Field(default=45.0, gt=0, description="Tutup koneksi jika client diam lebih lama dari ini (detik)")
+    WS_SEND_QUEUE_SIZE: int = Field(default=64, gt=0, description="Maksimum pesan keluar yang antre per koneksi")
+    WS_SEND_TIMEOUT: float = Field(default=10.0, gt=0, description="Batas tunggu antrean penuh sebelum client lambat diputus (detik)")
+
+    # Story Card Lore Injection
+    LORE_TOKEN_BUDGET: int = Field(default=300, ge=0, description="Batas token deskripsi lore yang disisipkan per turn")
+    LORE_INDEX_CACHE_SIZE: int = Field(default=1000, gt=0, description="Jumlah maksimum keyword index session di memori")
+
+    # Long-term Memory (embedding lokal atas turn yang diarsipkan)
+    MEMORY_EMBED_DIM: int = Field(default=512, gt=0, description="Dimensi hashing embedder")
+    MEMORY_TOP_K: int = Field(default=3, ge=0, description="Jumlah memori relevan yang disisipkan per turn, 0 = nonaktif")
+    MEMORY_MIN_SCORE: float = Field(default=0.15, ge=0.0, le=1.0, description="Cosine similarity minimum")
+    MEMORY_INDEX_CACHE_SIZE: int = Field(default=200, gt=0, description="Jumlah maksimum index session di memori")
+
+    # Hierarchical Summaries (chunk -> chapter -> saga)
+    SUMMARY_CHUNKS_PER_CHAPTER: int = Field(default=5, gt=1, description="Jumlah chunk summary per chapter")
+    SUMMARY_CHUNK_TOKENS: int = Field(default=150, gt=0, description="Batas ukuran chunk summary (token)")
+    SUMMARY_CHAPTER_TOKENS: int = Field(default=250, gt=0, description="Batas ukuran chapter summary (token)")
+    SUMMARY_SAGA_TOKENS: int = Field(default=400, gt=0, description="Batas ukuran saga summary (token)")
+
+    # Abandoned Session Garbage Collector
+    SESSION_GC_ENABLED: bool = Field(default=True, description="Jalankan GC di background")
+    SESSION_TTL_HOURS: float = Field(default=168.0, gt=0, description="Session yang idle lebih lama dari ini akan dihapus")
+    SESSION_GC_INTERVAL_SECONDS: float = Field(default=600.0, gt=0, description="Jeda antar putaran GC")
+    SESSION_GC_BATCH_SIZE: int = Field(default=100, gt=0, description="Jumlah session per batch DELETE")
+    SESSION_GC_MAX_BATCHES: int = Field(default=10, gt=0, description="Rate limit: batch maksimum per putaran")
+    SESSION_GC_BATCH_PAUSE: float = Field(default=0.5, ge=0, description="Jeda antar batch (detik)")
+
+    # Idempotency /game/action (single-flight + replay response)
+    IDEMPOTENCY_TTL_SECONDS: float = Field(default=300.0, gt=0, description="Lama response disimpan untuk replay (detik)")
+    IDEMPOTENCY_MAX_ENTRIES: int = Field(default=10000, gt=0, description="Jumlah maksimum response yang disimpan per worker")
+
+    # Warm Pool /game/new (session + narasi pembuka dibuat di background)
+    WARM_POOL_ENABLED: bool = Field(default=True, description="Isi ulang warm pool di background")
+    WARM_POOL_SIZE: int = Field(default=5, ge=0, description="Watermark: jumlah session siap pakai per skenario/preset")
+    WARM_POOL_REFILL_INTERVAL: float = Field(default=60.0, gt=0, description="Jeda maksimum antar pengecekan pool (detik)")
+    WARM_POOL_SCENARIOS: List[str] = Field(
+        default=[
+            "You wake up in a dark cave with only a rusty sword in your hand.",
+            "You stand at the entrance of a dark, ominous dungeon.",
+        ],
+        description="starting_scenario yang dibuatkan stok (JSON list)"
+    )
+    WARM_POOL_CHARACTERS: List[str] = Field(
+        default=[""],
+        description='Kombinasi preset "race/class/background" per skenario; "" = tanpa preset (JSON list)'
+    )
+
     def get_database_url(self) -> str:
         """Build PostgreSQL connection string"""
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD.get_secret_value()}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
@@ -0,0 +1,37 @@
+"""
+Helper HTTP conditional GET (ETag / If-None-Match).
+"""
+
+from datetime import datetime
+from typing import Optional, Iterable, Any
+
+
+def make_etag(*parts: Any) -> str:
+    """Bangun strong ETag dari komponen versi (mis. turn_count, updated_at, sequence)"""
+    tokens = []
+    for part in parts:
+        if isinstance(part, datetime):
+            tokens.append(str(int(part.timestamp() * 1_000_000)))
+        else:
+            tokens.append(str(part))
+    return '"' + "-".join(tokens) + '"'
+
+
+def _parse_if_none_match(header: str) -> Iterable[str]:
+    for tag in header.split(","):
+        tag = tag.strip()
+        # Weak comparison: W/"x" dianggap sama dengan "x"
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            yield tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True jika header If-None-Match cocok dengan ETag saat ini"""
+    if not if_none_match:
+        return False
+    for tag in _parse_if_none_match(if_none_match):
+        if tag == "*" or tag == etag:
+            return True
+    return False
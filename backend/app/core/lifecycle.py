@@ -0,0 +1,64 @@
+"""
+Status proses worker untuk probe & graceful shutdown.
+
+- ready: startup (DB pool, migrasi, warm-up LLM client) sudah selesai
+- draining: SIGTERM diterima; turn baru ditolak (503), turn yang sedang
+  berjalan (termasuk panggilan LLM) ditunggu sampai selesai
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+_cond = threading.Condition()
+_state = {"ready": False, "draining": False, "in_flight_turns": 0}
+
+
+class ShuttingDown(Exception):
+    """Worker sedang drain, turn baru tidak diterima (HTTP 503)"""
+
+
+def mark_ready():
+    with _cond:
+        _state["ready"] = True
+
+
+def is_ready() -> bool:
+    return _state["ready"] and not _state["draining"]
+
+
+def is_draining() -> bool:
+    return _state["draining"]
+
+
+@contextmanager
+def track_turn():
+    """Tandai satu turn sedang berjalan; ShuttingDown jika worker sedang drain"""
+    with _cond:
+        if _state["draining"]:
+            raise ShuttingDown("Server is shutting down, retry on another instance")
+        _state["in_flight_turns"] += 1
+    try:
+        yield
+    finally:
+        with _cond:
+            _state["in_flight_turns"] -= 1
+            _cond.notify_all()
+
+
+def drain(timeout: float) -> int:
+    """Tolak turn baru lalu tunggu turn berjalan selesai (maks timeout); return sisa turn"""
+    deadline = time.monotonic() + timeout
+    with _cond:
+        _state["draining"] = True
+        while _state["in_flight_turns"] > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _cond.wait(remaining)
+        return _state["in_flight_turns"]
+
+
+def get_lifecycle_stats() -> dict:
+    with _cond:
+        return dict(_state)
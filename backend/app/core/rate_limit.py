@@ -0,0 +1,291 @@
+"""
+Rate limiting token bucket per session_id dan per IP client.
+
+Dua kelas budget:
+- "llm":  endpoint yang memanggil LLM (POST /game/action, POST /game/new, aksi WebSocket)
+- "read": endpoint murah lainnya
+Setiap request harus lolos bucket IP dan (jika session_id diketahui) bucket
+session, all-or-nothing: token hanya diambil jika semua bucket cukup.
+Ditolak -> 429 + Retry-After.
+
+Backend:
+- memory:   bucket di dict per worker (cocok untuk satu worker), ~mikrodetik
+- postgres: bucket di tabel UNLOGGED rate_limit_buckets, dibagi semua worker;
+            satu round trip untuk semua bucket request, dijalankan di
+            threadpool agar event loop tidak terblok. Jika database error,
+            request diloloskan.
+GET kondisional (If-None-Match) dihitung di backend yang sama: header-nya
+dikirim client sehingga tidak bisa menjadi alasan melewati bucket bersama.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+
+# Path yang tidak pernah dibatasi (probe orchestrator, preflight CORS ditangani terpisah)
+EXEMPT_PATHS = ("/healthz", "/readyz")
+
+# Endpoint yang memanggil LLM: (method, path)
+LLM_ENDPOINTS = {("POST", "/game/action"), ("POST", "/game/new")}
+
+# Endpoint dengan session_id di body JSON
+BODY_SESSION_ENDPOINTS = {("POST", "/game/action"), ("POST", "/game/undo")}
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class MemoryBackend:
+    """Token bucket di memori proses: key -> [tokens, updated_at]"""
+
+    blocking = False
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Tuple[str, float, int]], cost: float = 1.0) -> Tuple[bool, List[float]]:
+        """buckets: [(key, rate, burst)]; return (allowed, sisa token per bucket)"""
+        now = time.monotonic()
+        with self._lock:
+            states = []
+            for key, rate, burst in buckets:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = [float(burst), now]
+                    self._buckets[key] = bucket
+                    if len(self._buckets) > self.max_keys:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(key)
+                    bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                    bucket[1] = now
+                states.append(bucket)
+            allowed = all(bucket[0] >= cost for bucket in states)
+            if allowed:
+                for bucket in states:
+                    bucket[0] -= cost
+            return allowed, [bucket[0] for bucket in states]
+
+
+class PostgresBackend:
+    """Token bucket di Postgres (lihat database.take_rate_limit_tokens)"""
+
+    blocking = True
+    PURGE_INTERVAL = 600.0
+
+    def __init__(self):
+        self._last_purge = time.monotonic()
+
+    def take(self, buckets: List[Tuple[str, float, int]], cost: float = 1.0) -> Tuple[bool, List[float]]:
+        from app.db import database
+        now = time.monotonic()
+        if now - self._last_purge > self.PURGE_INTERVAL:
+            self._last_purge = now
+            threading.Thread(target=database.purge_rate_limit_buckets, name="rate-limit-purge",
+                             daemon=True).start()
+        return database.take_rate_limit_tokens(buckets, cost)
+
+
+class RateLimiter:
+
+    def __init__(self, backend, budgets: Dict[str, Dict[str, Tuple[float, int]]]):
+        """budgets: {"llm"|"read": {"session"|"ip": (token per detik, burst)}}"""
+        self.backend = backend
+        self.budgets = budgets
+        self._lock = threading.Lock()
+        self.metrics = {
+            "allowed": {"llm": 0, "read": 0},
+            "limited": {"llm": 0, "read": 0},
+            "backend_errors": 0,
+            "check_us_total": 0.0,
+            "checks": 0
+        }
+
+    def check(self, kind: str, ip: Optional[str], session_id: Optional[str]) -> float:
+        """
+        Ambil token dari bucket IP + session (all-or-nothing); return 0 jika
+        lolos, atau detik Retry-After.
+        """
+        start = time.perf_counter()
+        retry_after = 0.0
+        buckets = []
+        for scope, value in (("session", session_id), ("ip", ip)):
+            if value:
+                rate, burst = self.budgets[kind][scope]
+                buckets.append((f"{kind}:{scope}:{value}", rate, burst))
+        try:
+            if buckets:
+                allowed, tokens = self.backend.take(buckets)
+                if not allowed:
+                    retry_after = max((1.0 - remaining) / rate
+                                      for (_, rate, _), remaining in zip(buckets, tokens))
+        except Exception as e:
+            # Backend bermasalah: jangan menolak traffic
+            print(f"⚠️ Rate limiter backend error: {e}")
+            retry_after = 0.0
+            with self._lock:
+                self.metrics["backend_errors"] += 1
+
+        elapsed_us = (time.perf_counter() - start) * 1_000_000
+        with self._lock:
+            self.metrics["checks"] += 1
+            self.metrics["check_us_total"] += elapsed_us
+            self.metrics["limited" if retry_after else "allowed"][kind] += 1
+        return retry_after
+
+    async def check_async(self, kind: str, ip: Optional[str], session_id: Optional[str]) -> float:
+        if self.backend.blocking:
+            return await run_in_threadpool(self.check, kind, ip, session_id)
+        return self.check(kind, ip, session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "allowed": dict(self.metrics["allowed"]),
+                "limited": dict(self.metrics["limited"]),
+                "backend_errors": self.metrics["backend_errors"],
+                "checks": self.metrics["checks"]
+            }
+            checks = self.metrics["checks"]
+            stats["check_us_avg"] = round(self.metrics["check_us_total"] / checks, 2) if checks else 0.0
+        stats["backend"] = "postgres" if isinstance(self.backend, PostgresBackend) else "memory"
+        stats["budgets_per_minute"] = {
+            kind: {scope: {"rate": round(rate * 60, 2), "burst": burst} for scope, (rate, burst) in scopes.items()}
+            for kind, scopes in self.budgets.items()
+        }
+        return stats
+
+
+def create_rate_limiter() -> RateLimiter:
+    settings = get_settings()
+    # Bucket di tabel Postgres hanya tersedia jika storage-nya juga Postgres
+    shared = settings.RATE_LIMIT_BACKEND == "postgres" and settings.STORAGE_BACKEND == "postgres"
+    return RateLimiter(PostgresBackend() if shared else MemoryBackend(settings.RATE_LIMIT_MAX_KEYS), {
+        "llm": {
+            "session": (settings.RATE_LIMIT_LLM_SESSION_RATE / 60, settings.RATE_LIMIT_LLM_SESSION_BURST),
+            "ip": (settings.RATE_LIMIT_LLM_IP_RATE / 60, settings.RATE_LIMIT_LLM_IP_BURST)
+        },
+        "read": {
+            "session": (settings.RATE_LIMIT_READ_SESSION_RATE / 60, settings.RATE_LIMIT_READ_SESSION_BURST),
+            "ip": (settings.RATE_LIMIT_READ_IP_RATE / 60, settings.RATE_LIMIT_READ_IP_BURST)
+        }
+    })
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """RateLimiter per worker, dibuat saat pertama dipakai (import modul ini tidak membaca Settings)"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = create_rate_limiter()
+    return _rate_limiter
+
+
+def client_ip(scope) -> Optional[str]:
+    """IP client (uvicorn --proxy-headers sudah mengganti ini dengan X-Forwarded-For)"""
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def path_session_id(path: str) -> Optional[str]:
+    """session_id dari /game/{session_id}[/...]"""
+    parts = path.split("/", 3)
+    if len(parts) >= 3 and parts[1] == "game" and parts[2] not in ("new", "action", "undo", ""):
+        return parts[2]
+    return None
+
+
+def _too_many_requests(retry_after: float) -> Tuple[dict, list]:
+    body = orjson.dumps({"detail": "Rate limit exceeded, slow down"})
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode())
+    ]
+    return body, headers
+
+
+class RateLimitMiddleware:
+    """ASGI middleware murni (tanpa BaseHTTPMiddleware) agar overhead per request minimal"""
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter
+        # None: RATE_LIMIT_ENABLED dibaca dari Settings saat request pertama
+        self.enabled = True if limiter is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if self.enabled is None:
+            self.enabled = get_settings().RATE_LIMIT_ENABLED
+            self.limiter = get_rate_limiter() if self.enabled else None
+        if (not self.enabled or scope["type"] != "http" or scope["method"] == "OPTIONS"
+                or scope["path"] in EXEMPT_PATHS):
+            # WebSocket: setiap aksi dibatasi di GameChannel
+            return await self.app(scope, receive, send)
+
+        endpoint = (scope["method"], scope["path"])
+        kind = "llm" if endpoint in LLM_ENDPOINTS else "read"
+        session_id = path_session_id(scope["path"])
+
+        if endpoint in BODY_SESSION_ENDPOINTS:
+            receive, session_id = await self._session_from_body(receive)
+
+        retry_after = await self.limiter.check_async(kind, client_ip(scope), session_id)
+        if retry_after:
+            body, headers = _too_many_requests(retry_after)
+            await send({"type": "http.response.start", "status": 429, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _session_from_body(receive):
+        """Baca body (kecil) untuk session_id, lalu putar ulang ke aplikasi"""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if not message.get("more_body") or size > MAX_BODY_BYTES:
+                break
+
+        body = b"".join(chunks)
+        session_id = None
+        try:
+            data = orjson.loads(body)
+            if isinstance(data, dict) and isinstance(data.get("session_id"), str):
+                session_id = data["session_id"]
+        except orjson.JSONDecodeError:
+            pass
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": size > MAX_BODY_BYTES}
+            return await receive()
+
+        return replay, session_id
+
+
+def get_rate_limit_stats() -> Dict[str, Any]:
+    return get_rate_limiter().stats()
@@ -0,0 +1,182 @@
+"""
+In-process LRU cache untuk state session (hasil get_session + daftar pesan).
+Dipakai oleh app.db.database secara write-through; invalidasi antar worker
+dilakukan lewat Postgres LISTEN/NOTIFY (lihat database.start_cache_listener).
+"""
+
+import copy
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+
+def _deep_sizeof(obj: Any, seen: set = None) -> int:
+    """Perkiraan ukuran memori (bytes) sebuah objek beserta isinya"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def _copy_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Salinan session tanpa berbagi inventory/quest/game_variables dengan entry cache"""
+    return {key: copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+            for key, value in session.items()}
+
+
+class SessionCache:
+    """
+    Bounded LRU cache. Setiap entry menyimpan:
+    - version: turn_count terakhir yang diketahui
+    - session: dict format get_session
+    - messages: list format get_all_messages (None jika belum dimuat)
+    - last_seq: sequence pesan terakhir (None jika belum diketahui)
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _touch(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            self._entries.move_to_end(session_id)
+        return entry
+
+    def _insert(self, session_id: str, entry: Dict[str, Any]):
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._touch(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return _copy_session(entry["session"])
+
+    def get_messages(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._touch(session_id)
+            if entry is None or entry["messages"] is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return [dict(message) for message in entry["messages"]]
+
+    def put_session(self, session_id: str, session: Dict[str, Any]):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            # Jangan timpa entry yang lebih baru dengan hasil baca yang lebih lama
+            if entry is not None and entry["version"] > session["turn_count"]:
+                return
+            messages = entry["messages"] if entry is not None else None
+            last_seq = entry["last_seq"] if entry is not None else None
+            self._insert(session_id, {
+                "version": session["turn_count"],
+                "session": _copy_session(session),
+                "messages": messages,
+                "last_seq": last_seq
+            })
+
+    def put_messages(self, session_id: str, messages: List[Dict[str, Any]]):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry["messages"] = list(messages)
+            entry["last_seq"] = messages[-1]["sequence"] if messages else 0
+            self._entries.move_to_end(session_id)
+
+    def update_session(self, session_id: str, changes: Dict[str, Any]):
+        """Write-through: terapkan perubahan ke entry yang sudah ada"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry["session"].update(changes)
+            if "turn_count" in changes:
+                entry["version"] = changes["turn_count"]
+
+    def update_inventory(self, session_id: str, diff: Dict[str, int]):
+        """Write-through inventory diff ({item: quantity baru}, 0 = dihapus)"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            inventory = dict(entry["session"].get("inventory") or {})
+            for name, quantity in diff.items():
+                if quantity > 0:
+                    inventory[name] = quantity
+                else:
+                    inventory.pop(name, None)
+            entry["session"]["inventory"] = inventory
+
+    def append_message(self, session_id: str, message: Dict[str, Any]):
+        """Write-through: tambahkan pesan ke daftar pesan yang sudah dimuat"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            if entry["last_seq"] is not None:
+                entry["last_seq"] = max(entry["last_seq"], message["sequence"])
+            if entry["messages"] is not None:
+                entry["messages"].append(message)
+
+    def get_version(self, session_id: str) -> Optional[tuple]:
+        """(turn_count, updated_at, last_seq) dari cache, None jika tidak lengkap"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry["last_seq"] is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            session = entry["session"]
+            return (session["turn_count"], session.get("updated_at"), entry["last_seq"])
+
+    def drop_messages(self, session_id: str):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry["messages"] = None
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            if self._entries.pop(session_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "memory_bytes": _deep_sizeof(self._entries)
+            }
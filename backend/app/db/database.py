@@ -4,61 +4,498 @@ Skema: game_sessions, characters, inventory_items, quests, chat_history,
        story_cards, world_state, game_presets
 """
 
-import psycopg2
-from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
 import json
+import os
+import select
+import threading
 import time
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
+from collections import OrderedDict
 from contextlib import contextmanager
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from app.core.config import get_settings
+from app.db.cache import SessionCache
+from app.db.presets import PresetCatalog
+from app.db.pool import ManagedPool, PoolTimeout
+from app.db import prepared, storage
 
-# Connection pool (min 1, max 10 connections)
+# Import modul ini tidak membaca Settings dan tidak memuat psycopg2 (lihat
+# test_import_time.py): keduanya dibaca / di-import saat pertama dipakai.
+
+# psycopg2 di-import sebelum koneksi Postgres pertama dibuat (_load_driver)
+psycopg2 = RealDictCursor = execute_values = None
+
+# Connection pool (ukuran & batas tunggu dari Settings DB_POOL_*)
 connection_pool = None
 
+# Session cache (write-through) + identitas worker untuk LISTEN/NOTIFY
+session_cache: Optional[SessionCache] = None
+# None = ikut Settings (SESSION_CACHE_SIZE > 0); test & benchmark boleh menimpa
+CACHE_ENABLED: Optional[bool] = None
+CACHE_CHANNEL = "session_cache_invalidate"
+WORKER_ID = f"{os.getpid()}-{uuid4().hex[:8]}"
+_cache_listener = None
+
+# Katalog game_presets (statis, dimuat sekali; lihat load_preset_catalog)
+preset_catalog: Optional[PresetCatalog] = None
+
+# Read replica (opsional, lihat READ REPLICA FUNCTIONS)
+replica_pool = None
+# None = ikut Settings (POSTGRES_REPLICA_SERVER diisi dan STORAGE_BACKEND=postgres)
+REPLICA_ENABLED: Optional[bool] = None
+
+
+def _load_driver():
+    """
+    Import psycopg2 (sekali per proses). Dengan backend embedded hanya fungsi
+    di storage.OPERATIONS yang tersedia; fungsi khusus Postgres lainnya gagal
+    di sini dengan pesan yang jelas, bukan ImportError / PoolTimeout.
+    """
+    global psycopg2, RealDictCursor, execute_values
+    if psycopg2 is None:
+        backend = storage_backend()
+        if backend != "postgres":
+            raise RuntimeError(f"This database function requires STORAGE_BACKEND=postgres (current: {backend}); "
+                               "embedded backends only provide app.db.storage.OPERATIONS")
+        from psycopg2.extras import RealDictCursor, execute_values
+        import psycopg2.extensions
+
+
+def storage_backend() -> str:
+    """Settings STORAGE_BACKEND (lihat STORAGE BACKEND di akhir modul)"""
+    return get_settings().STORAGE_BACKEND
+
+
+def _cache_enabled() -> bool:
+    if CACHE_ENABLED is None:
+        return get_settings().SESSION_CACHE_SIZE > 0
+    return CACHE_ENABLED
+
+
+def _replica_enabled() -> bool:
+    # Read replica hanya untuk backend postgres (lihat app.db.storage)
+    if REPLICA_ENABLED is None:
+        return bool(get_settings().POSTGRES_REPLICA_SERVER) and storage_backend() == "postgres"
+    return REPLICA_ENABLED
+
+
+_session_cache_lock = threading.Lock()
+
+
+def get_session_cache() -> SessionCache:
+    """Session cache per worker (ukuran dari Settings SESSION_CACHE_SIZE)"""
+    global session_cache
+    if session_cache is None:
+        with _session_cache_lock:
+            if session_cache is None:
+                session_cache = SessionCache(max_entries=get_settings().SESSION_CACHE_SIZE)
+    return session_cache
+
+
+def create_connection_pool(**connect_kwargs) -> ManagedPool:
+    """ManagedPool sesuai Settings; connect_kwargs diteruskan ke psycopg2.connect"""
+    _load_driver()
+    settings = get_settings()
+    params = dict(
+        host=settings.POSTGRES_SERVER,
+        port=settings.POSTGRES_PORT,
+        database=settings.POSTGRES_DB,
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD.get_secret_value()
+    )
+    params.update(connect_kwargs)
+    return ManagedPool(
+        lambda: psycopg2.connect(**params),
+        minconn=settings.DB_POOL_MIN_SIZE,
+        maxconn=settings.DB_POOL_MAX_SIZE,
+        max_waiters=settings.DB_POOL_MAX_WAITERS,
+        checkout_timeout=settings.DB_POOL_CHECKOUT_TIMEOUT,
+        max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+        ping_after=settings.DB_POOL_PING_AFTER,
+        leak_threshold=settings.DB_POOL_LEAK_THRESHOLD
+    )
+
+
+_pool_lock = threading.Lock()
+
 
 def get_connection_pool():
-    """Get or create connection pool"""
+    """
+    Get or create connection pool.
+    Tidak pernah sleep/retry di jalur request: database yang tidak bisa
+    dihubungi -> PoolTimeout (HTTP 503). Menunggu database siap hanya
+    dilakukan saat startup (wait_for_database).
+    """
     global connection_pool
     if connection_pool is None:
-        settings = get_settings()
-        max_retries = 30
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                connection_pool = pool.ThreadedConnectionPool(
-                    minconn=1,
-                    maxconn=10,
-                    host=settings.POSTGRES_SERVER,
-                    port=settings.POSTGRES_PORT,
-                    database=settings.POSTGRES_DB,
-                    user=settings.POSTGRES_USER,
-                    password=settings.POSTGRES_PASSWORD.get_secret_value()
-                )
+        _load_driver()
+        with _pool_lock:
+            if connection_pool is None:
+                try:
+                    connection_pool = create_connection_pool()
+                except psycopg2.OperationalError as e:
+                    raise PoolTimeout(f"Database unavailable: {e}")
                 print(f"✅ Database connection pool created successfully")
-                break
-            except psycopg2.OperationalError as e:
-                if attempt < max_retries - 1:
-                    print(f"⏳ Database not ready (attempt {attempt + 1}/{max_retries}), retrying in {retry_delay}s...")
-                    time.sleep(retry_delay)
-                else:
-                    raise Exception(f"❌ Failed to connect to database after {max_retries} attempts: {e}")
     
     return connection_pool
 
 
+def wait_for_database(timeout: float) -> ManagedPool:
+    """
+    Startup: tunggu database menerima koneksi (backoff 0.5s .. 5s, maks
+    timeout detik) lalu buat pool beserta DB_POOL_MIN_SIZE koneksinya,
+    sehingga worker tidak menerima traffic dengan pool kosong.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            pool = get_connection_pool()
+            with get_db() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                conn.rollback()
+            return pool
+        except (PoolTimeout, psycopg2.OperationalError) as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"❌ Database not ready after {timeout:.0f}s ({attempt} attempts): {e}")
+            print(f"⏳ Database not ready (attempt {attempt}), retrying in {min(delay, remaining):.1f}s...")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 5.0)
+
+
+def check_database(timeout: float = 1.0) -> bool:
+    """Readiness: pool ada dan satu koneksi bisa dipakai dalam timeout"""
+    pool = connection_pool
+    if pool is None:
+        return False
+    try:
+        conn = pool.getconn(timeout=timeout)
+    except (PoolTimeout, psycopg2.Error):
+        return False
+    broken = False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        broken = True
+        return False
+    finally:
+        pool.putconn(conn, close=broken)
+
+
+def close_connection_pool():
+    """Shutdown: tutup koneksi idle di pool"""
+    global connection_pool, replica_pool
+    with _pool_lock:
+        if connection_pool is not None:
+            connection_pool.closeall()
+            connection_pool = None
+        if replica_pool is not None:
+            replica_pool.closeall()
+            replica_pool = None
+
+
 @contextmanager
 def get_db():
-    """Context manager for database connection"""
+    """
+    Context manager for database connection.
+    Raise PoolTimeout jika tidak ada koneksi dalam DB_POOL_CHECKOUT_TIMEOUT;
+    koneksi yang error di level koneksi dibuang, bukan dikembalikan ke pool.
+    """
     db_pool = get_connection_pool()
     conn = db_pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        db_pool.putconn(conn, close=broken)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Ukuran pool, antrean tunggu, waktu tunggu checkout, leak, dst."""
+    if connection_pool is None:
+        return {"size": 0}
+    return connection_pool.stats()
+
+
+# ==================== READ REPLICA FUNCTIONS ====================
+# Fungsi read-only (get_session, get_all_chat_history, get_story_cards,
+# preset) dibaca dari replica jika POSTGRES_REPLICA_SERVER diisi.
+# Read-your-writes: setiap tulis mencatat watermark per session (version
+# session + turn_order pesan terakhir). Hasil dari replica yang lebih tua dari
+# watermark dibuang dan dibaca ulang dari primary. Tulis dari worker lain
+# (diketahui lewat NOTIFY) atau tanpa watermark pasti membuat session dibaca
+# dari primary selama DB_REPLICA_MAX_LAG_SECONDS. Replica yang lag-nya
+# melewati batas itu (atau error) tidak dipakai sama sekali.
+
+REPLICA_WATERMARK_LIMIT = 10_000
+
+_replica_lock = threading.Lock()
+_watermark_lock = threading.Lock()
+# session_id -> [version, last_seq, berlaku sampai (monotonic)]
+_watermarks: "OrderedDict[str, list]" = OrderedDict()
+_replica_state = {"healthy": False, "lag_seconds": None, "checked_at": 0.0, "error": None}
+replica_metrics = {
+    "replica_reads": 0,
+    "primary_reads": 0,
+    "stale_fallbacks": 0,     # hasil replica lebih tua dari watermark session
+    "pinned_fallbacks": 0,    # session baru ditulis tanpa watermark pasti
+    "unhealthy_fallbacks": 0  # replica error / lag terlalu besar
+}
+
+_REPLICA_LAG = """
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+
+def get_replica_pool() -> ManagedPool:
+    """Pool ke replica (dibuat saat pertama dipakai); replica tidak bisa dihubungi -> PoolTimeout"""
+    global replica_pool
+    if replica_pool is None:
+        _load_driver()
+        with _pool_lock:
+            if replica_pool is None:
+                settings = get_settings()
+                try:
+                    replica_pool = create_connection_pool(host=settings.POSTGRES_REPLICA_SERVER,
+                                                          port=settings.POSTGRES_REPLICA_PORT)
+                except psycopg2.OperationalError as e:
+                    raise PoolTimeout(f"Read replica unavailable: {e}")
+                print(f"✅ Read replica pool created ({settings.POSTGRES_REPLICA_SERVER})")
+    return replica_pool
+
+
+@contextmanager
+def get_replica_db():
+    """Seperti get_db, tetapi koneksi ke read replica"""
+    db_pool = get_replica_pool()
+    conn = db_pool.getconn()
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     finally:
-        db_pool.putconn(conn)
+        db_pool.putconn(conn, close=broken)
+
+
+def _replica_healthy() -> bool:
+    """Lag replica dicek paling sering sekali per DB_REPLICA_LAG_CHECK_SECONDS per worker"""
+    settings = get_settings()
+    now = time.monotonic()
+    if now - _replica_state["checked_at"] < settings.DB_REPLICA_LAG_CHECK_SECONDS:
+        return _replica_state["healthy"]
+    if not _replica_lock.acquire(blocking=False):
+        return _replica_state["healthy"]  # Thread lain sedang mengecek
+    try:
+        _replica_state["checked_at"] = now
+        with get_replica_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_REPLICA_LAG)
+            lag = float(cursor.fetchone()[0])
+            conn.rollback()
+        healthy = lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        if healthy != _replica_state["healthy"]:
+            print(f"{'✅' if healthy else '⚠️'} Read replica lag {lag:.2f}s, "
+                  f"{'using replica' if healthy else 'reading from primary'}")
+        _replica_state.update(healthy=healthy, lag_seconds=lag, error=None)
+    except (PoolTimeout, psycopg2.Error) as e:
+        if _replica_state["healthy"] or _replica_state["error"] is None:
+            print(f"⚠️ Read replica unavailable, reading from primary: {e}")
+        _replica_state.update(healthy=False, lag_seconds=None, error=str(e))
+    finally:
+        _replica_lock.release()
+    return _replica_state["healthy"]
+
+
+def _newest(current: Optional[int], written: Optional[int]) -> Optional[int]:
+    if current is None or written is None:
+        return written if current is None else current
+    return max(current, written)
+
+
+def _mark_written(session_id: str, version: Optional[int] = None, last_seq: Optional[int] = None):
+    """
+    Catat watermark tulis untuk session. Tanpa version/last_seq (mis. notifikasi
+    dari worker lain) session dibaca dari primary sampai watermark kedaluwarsa.
+    """
+    if not _replica_enabled():
+        return
+    until = time.monotonic() + get_settings().DB_REPLICA_MAX_LAG_SECONDS
+    with _watermark_lock:
+        mark = _watermarks.pop(session_id, None)
+        pinned = mark is not None and mark[0] is None and mark[1] is None
+        if pinned or (version is None and last_seq is None):
+            # Tulisan worker lain belum tentu terlihat dari version kita: tetap ke primary
+            mark = [None, None, until]
+        elif mark is None:
+            mark = [version, last_seq, until]
+        else:
+            mark = [_newest(mark[0], version), _newest(mark[1], last_seq), until]
+        _watermarks[session_id] = mark
+        while len(_watermarks) > REPLICA_WATERMARK_LIMIT:
+            _watermarks.popitem(last=False)
+
+
+def _watermark(session_id: Optional[str]) -> Optional[list]:
+    if session_id is None:
+        return None
+    with _watermark_lock:
+        mark = _watermarks.get(session_id)
+        if mark is not None and mark[2] <= time.monotonic():
+            # Lebih lama dari batas lag: replica yang sehat pasti sudah punya tulisan ini
+            del _watermarks[session_id]
+            return None
+        return list(mark) if mark is not None else None
+
+
+def _route_read(session_id: Optional[str], read, is_fresh=None):
+    """
+    Jalankan read(conn) di replica jika boleh, kalau tidak (atau hasilnya lebih
+    tua dari watermark) di primary. is_fresh(result, watermark) -> bool.
+    """
+    if _replica_enabled():
+        mark = _watermark(session_id)
+        exact = mark is not None and (mark[0] is not None or mark[1] is not None)
+        if mark is not None and not exact:
+            replica_metrics["pinned_fallbacks"] += 1
+        elif not _replica_healthy():
+            replica_metrics["unhealthy_fallbacks"] += 1
+        else:
+            try:
+                with get_replica_db() as conn:
+                    result = read(conn)
+            except (PoolTimeout, psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                print(f"⚠️ Read replica query failed, reading from primary: {e}")
+                _replica_state.update(healthy=False, checked_at=time.monotonic(), error=str(e))
+                replica_metrics["unhealthy_fallbacks"] += 1
+            else:
+                if result is not None and (mark is None or is_fresh is None or is_fresh(result, mark)):
+                    replica_metrics["replica_reads"] += 1
+                    return result
+                # None: bisa jadi baris baru yang belum sampai ke replica
+                replica_metrics["stale_fallbacks"] += 1
+    
+    replica_metrics["primary_reads"] += 1
+    with get_db() as conn:
+        return read(conn)
+
+
+def get_replica_stats() -> Dict[str, Any]:
+    """Routing baca replica vs primary, lag terakhir, dan jumlah watermark session"""
+    stats = dict(replica_metrics)
+    stats["enabled"] = _replica_enabled()
+    if not _replica_enabled():
+        return stats
+    reads = stats["replica_reads"] + stats["primary_reads"]
+    stats["replica_ratio"] = round(stats["replica_reads"] / reads, 4) if reads else 0.0
+    stats["healthy"] = _replica_state["healthy"]
+    stats["lag_seconds"] = _replica_state["lag_seconds"]
+    stats["error"] = _replica_state["error"]
+    stats["watermarks"] = len(_watermarks)
+    stats["pool"] = replica_pool.stats() if replica_pool is not None else {"size": 0}
+    return stats
+
+
+# ==================== SESSION CACHE FUNCTIONS ====================
+
+_NOTIFY = prepared.statement("notify_session", "SELECT pg_notify(%s, %s)")
+
+
+def _notify_session_changed(cursor, session_id: str, version: Optional[int] = None,
+                            last_seq: Optional[int] = None):
+    """
+    Kirim NOTIFY (ikut transaksi) agar worker lain membuang cache session ini
+    (dan membaca session ini dari primary), lalu catat watermark read replica:
+    version / last_seq jika diketahui, selain itu session dibaca dari primary.
+    """
+    if _cache_enabled() or _replica_enabled():
+        prepared.execute(cursor, _NOTIFY, (CACHE_CHANNEL, f"{WORKER_ID}:{session_id}"))
+    _mark_written(session_id, version, last_seq)
+
+
+def _notify_character_changed(cursor, character_id: str):
+    """Sama seperti _notify_session_changed, tapi dari character_id"""
+    cursor.execute("SELECT session_id FROM characters WHERE id = %s", (character_id,))
+    row = cursor.fetchone()
+    if row:
+        session_id = str(row[0] if isinstance(row, tuple) else row["session_id"])
+        _notify_session_changed(cursor, session_id)
+        get_session_cache().invalidate(session_id)
+
+
+def _listen_for_invalidations():
+    """Loop thread listener: LISTEN pada channel cache, invalidasi entry dari worker lain"""
+    _load_driver()
+    settings = get_settings()
+    retry_delay = 2
+
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(
+                host=settings.POSTGRES_SERVER,
+                port=settings.POSTGRES_PORT,
+                database=settings.POSTGRES_DB,
+                user=settings.POSTGRES_USER,
+                password=settings.POSTGRES_PASSWORD.get_secret_value()
+            )
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {CACHE_CHANNEL}")
+
+            while True:
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    origin, _, session_id = notify.payload.partition(":")
+                    if origin != WORKER_ID:
+                        get_session_cache().invalidate(session_id)
+                        _mark_written(session_id)
+        except Exception as e:
+            # Notifikasi bisa terlewat selama listener mati, jadi cache harus dikosongkan
+            # (dan replica tidak dipakai sampai listener tersambung lagi)
+            print(f"⚠️ Cache listener disconnected: {e}, retrying in {retry_delay}s...")
+            get_session_cache().clear()
+            _replica_state.update(healthy=False, checked_at=time.monotonic() + retry_delay)
+            time.sleep(retry_delay)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def start_cache_listener():
+    """Start background thread LISTEN/NOTIFY (sekali per worker; dipakai session cache & read replica)"""
+    global _cache_listener
+    if not (_cache_enabled() or _replica_enabled()) or _cache_listener is not None:
+        return
+    _cache_listener = threading.Thread(
+        target=_listen_for_invalidations, name="session-cache-listener", daemon=True
+    )
+    _cache_listener.start()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Statistik session cache (hit ratio, memori)"""
+    stats = get_session_cache().stats()
+    stats["enabled"] = _cache_enabled()
+    stats["listener_alive"] = _cache_listener is not None and _cache_listener.is_alive()
+    return stats
 
 
 # ==================== GAME SESSION FUNCTIONS ====================
@@ -117,8 +554,12 @@ def update_game_session(session_id: str, **kwargs) -> bool:
         cursor.execute(f"""
             UPDATE game_sessions SET {', '.join(updates)} WHERE id = %s
         """, values)
+        updated = cursor.rowcount > 0
+        if updated:
+            _notify_session_changed(cursor, session_id)
         conn.commit()
-        return cursor.rowcount > 0
+    get_session_cache().invalidate(session_id)
+    return updated
 
 
 def delete_game_session(session_id: str) -> bool:
@@ -126,8 +567,51 @@ def delete_game_session(session_id: str) -> bool:
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM game_sessions WHERE id = %s", (session_id,))
+        deleted = cursor.rowcount > 0
+        if deleted:
+            _notify_session_changed(cursor, session_id)
+        conn.commit()
+    get_session_cache().invalidate(session_id)
+    return deleted
+
+
+def count_idle_sessions(ttl_hours: float) -> Dict[str, Any]:
+    """Dry-run GC: jumlah session idle melewati TTL dan yang paling lama"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), MIN(updated_at) FROM game_sessions 
+            WHERE updated_at < NOW() - make_interval(secs => %s)
+        """, (ttl_hours * 3600,))
+        count, oldest = cursor.fetchone()
+        return {"idle_sessions": count, "oldest_updated_at": oldest}
+
+
+def purge_idle_sessions(ttl_hours: float, batch_size: int) -> List[str]:
+    """
+    Hapus satu batch session idle (CASCADE ke characters, inventory, chat, dst).
+    Memakai index updated_at + SKIP LOCKED agar aman dijalankan beberapa worker.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM game_sessions WHERE id IN (
+                SELECT id FROM game_sessions 
+                WHERE updated_at < NOW() - make_interval(secs => %s)
+                ORDER BY updated_at 
+                LIMIT %s 
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id
+        """, (ttl_hours * 3600, batch_size))
+        purged = [str(row[0]) for row in cursor.fetchall()]
+        for session_id in purged:
+            _notify_session_changed(cursor, session_id)
         conn.commit()
-        return cursor.rowcount > 0
+    
+    for session_id in purged:
+        get_session_cache().invalidate(session_id)
+    return purged
 
 
 # ==================== CHARACTER FUNCTIONS ====================
@@ -188,8 +672,11 @@ def update_character(character_id: str, **kwargs) -> bool:
         cursor.execute(f"""
             UPDATE characters SET {', '.join(updates)} WHERE id = %s
         """, values)
+        updated = cursor.rowcount > 0
+        if updated:
+            _notify_character_changed(cursor, character_id)
         conn.commit()
-        return cursor.rowcount > 0
+        return updated
 
 
 # ==================== INVENTORY FUNCTIONS ====================
@@ -197,17 +684,20 @@ def update_character(character_id: str, **kwargs) -> bool:
 def add_inventory_item(character_id: str, item_name: str, 
                        description: str = None, quantity: int = 1,
                        item_type: str = None, stat_modifier: Dict = None) -> Dict[str, Any]:
-    """Add item to character's inventory"""
+    """Add item to character's inventory (item yang sudah ada ditambah quantity-nya)"""
     with get_db() as conn:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             INSERT INTO inventory_items 
             (character_id, item_name, description, quantity, item_type, stat_modifier)
             VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (character_id, item_name)
+            DO UPDATE SET quantity = inventory_items.quantity + EXCLUDED.quantity
             RETURNING *
         """, (character_id, item_name, description, quantity, item_type, 
               json.dumps(stat_modifier or {})))
         item = cursor.fetchone()
+        _notify_character_changed(cursor, character_id)
         conn.commit()
         return dict(item)
 
@@ -248,18 +738,25 @@ def update_inventory_item(item_id: str, **kwargs) -> bool:
         cursor = conn.cursor()
         cursor.execute(f"""
             UPDATE inventory_items SET {', '.join(updates)} WHERE id = %s
+            RETURNING character_id
         """, values)
+        row = cursor.fetchone()
+        if row:
+            _notify_character_changed(cursor, row[0])
         conn.commit()
-        return cursor.rowcount > 0
+        return row is not None
 
 
 def delete_inventory_item(item_id: str) -> bool:
     """Remove item from inventory"""
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM inventory_items WHERE id = %s", (item_id,))
+        cursor.execute("DELETE FROM inventory_items WHERE id = %s RETURNING character_id", (item_id,))
+        row = cursor.fetchone()
+        if row:
+            _notify_character_changed(cursor, row[0])
         conn.commit()
-        return cursor.rowcount > 0
+        return row is not None
 
 
 # ==================== QUEST FUNCTIONS ====================
@@ -274,8 +771,10 @@ def create_quest(session_id: str, title: str, description: str = None) -> Dict[s
             RETURNING *
         """, (session_id, title, description))
         quest = cursor.fetchone()
+        _notify_session_changed(cursor, session_id)
         conn.commit()
-        return dict(quest)
+    get_session_cache().invalidate(session_id)
+    return dict(quest)
 
 
 def get_quests(session_id: str, status: str = None) -> List[Dict[str, Any]]:
@@ -304,56 +803,73 @@ def update_quest_status(quest_id: str, status: str) -> bool:
         if status == "completed":
             cursor.execute("""
                 UPDATE quests SET status = %s, completed_at = NOW() WHERE id = %s
+                RETURNING session_id
             """, (status, quest_id))
         else:
             cursor.execute("""
                 UPDATE quests SET status = %s WHERE id = %s
+                RETURNING session_id
             """, (status, quest_id))
+        row = cursor.fetchone()
+        if row:
+            _notify_session_changed(cursor, str(row[0]))
+            get_session_cache().invalidate(str(row[0]))
         conn.commit()
-        return cursor.rowcount > 0
+        return row is not None
 
 
 # ==================== CHAT HISTORY FUNCTIONS ====================
 
+_NEXT_TURN_ORDER = prepared.statement("next_turn_order", """
+    SELECT COALESCE(MAX(turn_order), 0) + 1 AS turn_order FROM chat_history WHERE session_id = %s
+""")
+_INSERT_CHAT_MESSAGE = prepared.statement("insert_chat_message", """
+    INSERT INTO chat_history (session_id, role, content, turn_order)
+    VALUES (%s, %s, %s, %s)
+    RETURNING id, session_id, role, content, created_at, turn_order
+""")
+
+
 def add_chat_message(session_id: str, role: str, content: str) -> Dict[str, Any]:
     """Add a message to chat history"""
     with get_db() as conn:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         # Get next turn order
-        cursor.execute("""
-            SELECT COALESCE(MAX(turn_order), 0) + 1 FROM chat_history WHERE session_id = %s
-        """, (session_id,))
-        turn_order = cursor.fetchone()["coalesce"]
+        prepared.execute(cursor, _NEXT_TURN_ORDER, (session_id,))
+        turn_order = cursor.fetchone()["turn_order"]
         
-        cursor.execute("""
-            INSERT INTO chat_history (session_id, role, content, turn_order)
-            VALUES (%s, %s, %s, %s)
-            RETURNING *
-        """, (session_id, role, content, turn_order))
+        prepared.execute(cursor, _INSERT_CHAT_MESSAGE, (session_id, role, content, turn_order))
         message = cursor.fetchone()
+        _notify_session_changed(cursor, session_id, last_seq=turn_order)
         conn.commit()
-        return dict(message)
+    
+    if _cache_enabled():
+        get_session_cache().append_message(session_id, _to_legacy_message(message))
+    return dict(message)
+
+
+_GET_CHAT_HISTORY = prepared.statement("get_chat_history", """
+    SELECT id, session_id, role, content, created_at, turn_order FROM chat_history 
+    WHERE session_id = %s 
+    ORDER BY turn_order DESC 
+    LIMIT %s
+""")
 
 
 def get_chat_history(session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
     """Get last N messages for context window"""
     with get_db() as conn:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-            SELECT * FROM chat_history 
-            WHERE session_id = %s 
-            ORDER BY turn_order DESC 
-            LIMIT %s
-        """, (session_id, limit))
+        prepared.execute(cursor, _GET_CHAT_HISTORY, (session_id, limit))
         rows = cursor.fetchall()
         # Reverse to get chronological order
         return [dict(row) for row in reversed(rows)]
 
 
 def get_all_chat_history(session_id: str) -> List[Dict[str, Any]]:
-    """Get all messages for a session"""
-    with get_db() as conn:
+    """Get all messages for a session (dari read replica jika sudah memuat turn terakhir)"""
+    def read(conn):
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute("""
             SELECT * FROM chat_history 
@@ -362,6 +878,11 @@ def get_all_chat_history(session_id: str) -> List[Dict[str, Any]]:
         """, (session_id,))
         return [dict(row) for row in cursor.fetchall()]
 
+    def is_fresh(rows, mark):
+        return mark[1] is None or (rows[-1]["turn_order"] if rows else 0) >= mark[1]
+
+    return _route_read(session_id, read, is_fresh)
+
 
 # ==================== STORY CARD FUNCTIONS ====================
 
@@ -378,12 +899,13 @@ def create_story_card(session_id: str, title: str, card_type: str,
         """, (session_id, title, card_type, description, json.dumps(keys or []), once_only))
         card = cursor.fetchone()
         conn.commit()
-        return dict(card)
+    _mark_written(session_id)
+    return dict(card)
 
 
 def get_story_cards(session_id: str, card_type: str = None) -> List[Dict[str, Any]]:
     """Get story cards, optionally filtered by type"""
-    with get_db() as conn:
+    def read(conn):
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         if card_type:
             cursor.execute("""
@@ -397,6 +919,23 @@ def get_story_cards(session_id: str, card_type: str = None) -> List[Dict[str, An
             """, (session_id,))
         return [dict(row) for row in cursor.fetchall()]
 
+    # create_story_card mem-pin session ke primary sampai watermark kedaluwarsa
+    return _route_read(session_id, read)
+
+
+_STORY_CARDS_VERSION = prepared.statement("story_cards_version", """
+    SELECT COUNT(*), MAX(created_at) FROM story_cards 
+    WHERE session_id = %s AND is_active = TRUE
+""")
+
+
+def get_story_cards_version(session_id: str) -> tuple:
+    """Versi murah kumpulan story card aktif (jumlah + created_at terbaru)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        prepared.execute(cursor, _STORY_CARDS_VERSION, (session_id,))
+        return tuple(cursor.fetchone())
+
 
 def search_story_cards_by_keyword(session_id: str, keyword: str) -> List[Dict[str, Any]]:
     """Search story cards by keyword in keys JSONB array"""
@@ -410,6 +949,85 @@ def search_story_cards_by_keyword(session_id: str, keyword: str) -> List[Dict[st
         return [dict(row) for row in cursor.fetchall()]
 
 
+# ==================== MEMORY VECTOR FUNCTIONS ====================
+
+def add_memory_vectors(session_id: str, rows: List[tuple]) -> int:
+    """
+    Simpan embedding turn yang diarsipkan. rows: (turn_order, role, content, embedding_bytes).
+    Turn yang sudah punya embedding dilewati (aman diulang); return jumlah baris baru.
+    """
+    if not rows:
+        return 0
+    with get_db() as conn:
+        cursor = conn.cursor()
+        inserted = execute_values(cursor, """
+            INSERT INTO memory_vectors (session_id, turn_order, role, content, embedding)
+            VALUES %s
+            ON CONFLICT (session_id, turn_order) DO NOTHING
+            RETURNING turn_order
+        """, [(session_id, turn_order, role, content, psycopg2.Binary(embedding))
+              for turn_order, role, content, embedding in rows], fetch=True)
+        conn.commit()
+        return len(inserted)
+
+
+_GET_MEMORY_VECTORS = prepared.statement("get_memory_vectors", """
+    SELECT turn_order, role, content, embedding FROM memory_vectors 
+    WHERE session_id = %s AND turn_order > %s
+    ORDER BY turn_order ASC
+""")
+
+
+def get_memory_vectors(session_id: str, after_turn_order: int = 0) -> List[Dict[str, Any]]:
+    """Ambil embedding dengan turn_order > after_turn_order (untuk update index incremental)"""
+    with get_db() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        prepared.execute(cursor, _GET_MEMORY_VECTORS, (session_id, after_turn_order))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+# ==================== STORY SUMMARY FUNCTIONS ====================
+
+def upsert_story_summary(session_id: str, level: str, idx: int, content: str,
+                         child_count: int) -> None:
+    """Simpan / ganti rangkuman satu node (level, idx)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO story_summaries (session_id, level, idx, content, child_count)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (session_id, level, idx)
+            DO UPDATE SET content = EXCLUDED.content, child_count = EXCLUDED.child_count,
+                          updated_at = NOW()
+        """, (session_id, level, idx, content, child_count))
+        conn.commit()
+
+
+def get_last_story_summary(session_id: str, level: str) -> Optional[Dict[str, Any]]:
+    """Rangkuman dengan idx terbesar pada satu level"""
+    with get_db() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT * FROM story_summaries 
+            WHERE session_id = %s AND level = %s
+            ORDER BY idx DESC LIMIT 1
+        """, (session_id, level))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+
+def get_story_summaries(session_id: str, level: str, min_idx: int, max_idx: int) -> List[Dict[str, Any]]:
+    """Rangkuman pada satu level dengan min_idx <= idx <= max_idx (urut idx)"""
+    with get_db() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT * FROM story_summaries 
+            WHERE session_id = %s AND level = %s AND idx BETWEEN %s AND %s
+            ORDER BY idx ASC
+        """, (session_id, level, min_idx, max_idx))
+        return [dict(row) for row in cursor.fetchall()]
+
+
 # ==================== WORLD STATE FUNCTIONS ====================
 
 def set_world_state(session_id: str, entity_key: str, state: Dict,
@@ -421,14 +1039,39 @@ def set_world_state(session_id: str, entity_key: str, state: Dict,
             INSERT INTO world_state (session_id, entity_key, current_state, related_card_id)
             VALUES (%s, %s, %s, %s)
             ON CONFLICT (session_id, entity_key) 
-            DO UPDATE SET current_state = %s, updated_at = NOW()
+            DO UPDATE SET current_state = EXCLUDED.current_state, updated_at = NOW()
             RETURNING *
-        """, (session_id, entity_key, json.dumps(state), related_card_id, json.dumps(state)))
+        """, (session_id, entity_key, json.dumps(state), related_card_id))
         result = cursor.fetchone()
         conn.commit()
         return dict(result)
 
 
+def set_world_states(session_id: str, states: Dict[str, Dict],
+                     related_card_ids: Dict[str, str] = None) -> int:
+    """
+    Set banyak world state sekaligus: {entity_key: state} dalam satu
+    multi-row upsert. related_card_ids opsional per key.
+    """
+    if not states:
+        return 0
+    related_card_ids = related_card_ids or {}
+    rows = [(session_id, key, json.dumps(state), related_card_ids.get(key))
+            for key, state in states.items()]
+    with get_db() as conn:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO world_state (session_id, entity_key, current_state, related_card_id)
+            VALUES %s
+            ON CONFLICT (session_id, entity_key)
+            DO UPDATE SET current_state = EXCLUDED.current_state,
+                          related_card_id = COALESCE(EXCLUDED.related_card_id, world_state.related_card_id),
+                          updated_at = NOW()
+        """, rows, template="(%s, %s, %s::jsonb, %s::uuid)", page_size=len(rows))
+        conn.commit()
+        return len(rows)
+
+
 def get_world_state(session_id: str, entity_key: str) -> Optional[Dict[str, Any]]:
     """Get specific world state by key"""
     with get_db() as conn:
@@ -453,45 +1096,150 @@ def get_all_world_states(session_id: str) -> List[Dict[str, Any]]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+def get_world_state_map(session_id: str) -> Dict[str, Dict]:
+    """Semua world state sebuah session sebagai {entity_key: current_state}"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT entity_key, current_state FROM world_state WHERE session_id = %s
+        """, (session_id,))
+        return {key: state for key, state in cursor.fetchall()}
+
+
 # ==================== GAME PRESETS FUNCTIONS ====================
 
-def get_presets_by_category(category: str) -> List[Dict[str, Any]]:
-    """Get all presets for a category (RACE, CLASS, BACKGROUND)"""
-    with get_db() as conn:
+def load_preset_catalog() -> PresetCatalog:
+    """Muat (ulang) seluruh game_presets ke katalog di memori"""
+    global preset_catalog
+
+    def read(conn):
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-            SELECT * FROM game_presets WHERE category = %s
-        """, (category,))
+        cursor.execute("SELECT * FROM game_presets ORDER BY category, id")
         return [dict(row) for row in cursor.fetchall()]
 
+    preset_catalog = PresetCatalog(_route_read(None, read))
+    print(f"✅ Preset catalog loaded ({len(preset_catalog.rows)} presets)")
+    return preset_catalog
+
+
+def get_preset_catalog() -> PresetCatalog:
+    """Katalog preset; dimuat saat pertama dipakai jika startup belum memuatnya"""
+    return preset_catalog or load_preset_catalog()
+
+
+def get_presets_by_category(category: str) -> List[Dict[str, Any]]:
+    """Get all presets for a category (RACE, CLASS, BACKGROUND)"""
+    return get_preset_catalog().by_category(category)
+
 
 def get_preset_by_value(category: str, value: str) -> Optional[Dict[str, Any]]:
     """Get specific preset by category and value"""
+    return get_preset_catalog().get(category, value)
+
+
+def get_all_presets() -> Dict[str, List[Dict[str, Any]]]:
+    """Get all presets grouped by category"""
+    return get_preset_catalog().grouped()
+
+
+# ==================== RATE LIMIT FUNCTIONS ====================
+
+# Refill + ambil token dalam satu statement (row lock ON CONFLICT = atomik antar worker).
+# Parameter: key, burst, cost, rate, burst, cost (rate = token per detik)
+_TAKE_RATE_LIMIT_TOKENS = prepared.statement("take_rate_limit_tokens", """
+    SELECT o_allowed, o_tokens FROM take_rate_limit_tokens(%s::text[], %s::float8[], %s::float8[], %s::float8)
+""")
+
+
+def take_rate_limit_tokens(buckets: List[tuple], cost: float = 1.0) -> tuple:
+    """
+    Ambil `cost` token dari setiap bucket [(key, rate token/detik, burst)]
+    dalam satu round trip, all-or-nothing (lihat migrasi 0009).
+    Return (allowed, [sisa token per bucket]); bucket baru mulai penuh.
+    """
+    keys, rates, bursts = (list(column) for column in zip(*buckets))
     with get_db() as conn:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
+        prepared.execute(cursor, _TAKE_RATE_LIMIT_TOKENS, (keys, rates, bursts, cost))
+        allowed, tokens = cursor.fetchone()
+        conn.commit()
+    return allowed, tokens
+
+
+def purge_rate_limit_buckets(idle_seconds: float = 3600.0) -> int:
+    """Hapus bucket yang tidak dipakai selama idle_seconds (bucket itu sudah penuh lagi)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
         cursor.execute("""
-            SELECT * FROM game_presets WHERE category = %s AND value = %s
-        """, (category, value))
+            DELETE FROM rate_limit_buckets
+            WHERE updated_at < EXTRACT(EPOCH FROM clock_timestamp()) - %s
+        """, (idle_seconds,))
+        purged = cursor.rowcount
+        conn.commit()
+    return purged
+
+
+# ==================== IDEMPOTENCY FUNCTIONS ====================
+
+_CLAIM_IDEMPOTENCY_KEY = prepared.statement("claim_idempotency_key", """
+    INSERT INTO idempotency_keys (key, fingerprint, response, expires_at)
+    VALUES (%s, %s, NULL, NOW() + make_interval(secs => %s))
+    ON CONFLICT (key) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, response = NULL, expires_at = EXCLUDED.expires_at
+        WHERE idempotency_keys.expires_at < NOW()
+    RETURNING key
+""")
+_GET_IDEMPOTENCY_KEY = prepared.statement("get_idempotency_key", """
+    SELECT fingerprint, response FROM idempotency_keys WHERE key = %s AND expires_at >= NOW()
+""")
+
+
+def claim_idempotency_key(key: str, fingerprint: str, pending_seconds: float) -> tuple:
+    """
+    Klaim key untuk diproses worker ini (berlaku pending_seconds). Return
+    (claimed, fingerprint, response): claimed True -> proses lalu
+    complete/release; False -> (fingerprint, response JSON atau None jika
+    masih diproses worker lain). (False, None, None): baris baru saja hilang, coba lagi.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        prepared.execute(cursor, _CLAIM_IDEMPOTENCY_KEY, (key, fingerprint, pending_seconds))
+        if cursor.fetchone() is not None:
+            conn.commit()
+            return True, fingerprint, None
+        prepared.execute(cursor, _GET_IDEMPOTENCY_KEY, (key,))
         row = cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+        conn.commit()
+    return (False, row[0], row[1]) if row else (False, None, None)
 
 
-def get_all_presets() -> Dict[str, List[Dict[str, Any]]]:
-    """Get all presets grouped by category"""
+def complete_idempotency_key(key: str, response: str, ttl_seconds: float):
+    """Simpan response untuk replay selama ttl_seconds"""
     with get_db() as conn:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT * FROM game_presets ORDER BY category, id")
-        rows = cursor.fetchall()
-        
-        result = {"RACE": [], "CLASS": [], "BACKGROUND": []}
-        for row in rows:
-            category = row["category"]
-            if category in result:
-                result[category].append(dict(row))
-        
-        return result
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE idempotency_keys SET response = %s, expires_at = NOW() + make_interval(secs => %s)
+            WHERE key = %s
+        """, (response, ttl_seconds, key))
+        conn.commit()
+
+
+def release_idempotency_key(key: str):
+    """Request gagal: lepas klaim agar retry boleh diproses ulang"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM idempotency_keys WHERE key = %s AND response IS NULL", (key,))
+        conn.commit()
+
+
+def purge_idempotency_keys() -> int:
+    """Hapus response & klaim yang sudah kedaluwarsa"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW()")
+        purged = cursor.rowcount
+        conn.commit()
+    return purged
 
 
 # ==================== UTILITY FUNCTIONS ====================
@@ -532,87 +1280,283 @@ def get_full_game_state(session_id: str) -> Optional[Dict[str, Any]]:
 # These functions maintain compatibility with old main.py API
 # They map old session-based API to new game_sessions + characters schema
 
+NEW_SESSION_SUMMARY = "You begin your adventure..."
+
+# Kolom characters yang boleh diisi dari stats hasil character builder
+CHARACTER_STAT_COLUMNS = ["level", "exp", "hp", "max_hp", "mana", "max_mana", "gold",
+                          "str", "dex", "con", "int", "wis", "cha"]
+
+
+def new_session_state(session_id: str, inventory: Dict[str, int],
+                      character: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    State format lama untuk session yang baru dibuat (sama dengan hasil
+    get_session), tanpa perlu membaca ulang dari database.
+    """
+    stats = (character or {}).get("stats") or {}
+    return {
+        "id": str(session_id),
+        "hp": stats.get("hp", 100),
+        "max_hp": stats.get("max_hp", 100),
+        "inventory": dict(inventory),
+        "location": "Unknown",  # Not in new schema
+        "level": stats.get("level", 1),
+        "exp": stats.get("exp", 0),
+        "turn_count": 0,
+        "game_variables": {},
+        "active_quests": [],
+        "completed_quests": [],
+        "summary": NEW_SESSION_SUMMARY,
+        "last_event_trigger": None,
+        "game_over": False,
+        "version": 0
+    }
+
+
+def _insert_session(cursor, session_id: str, inventory: Dict[str, int],
+                    character: Dict[str, Any], opening: Optional[str]):
+    """Insert game_sessions + characters + inventory (+ narasi pembuka) dalam satu statement"""
+    stats = character.get("stats") or {}
+    columns = ["name", "race", "job_class", "background"]
+    values = [character.get("name") or "Adventurer", character.get("race"),
+              character.get("job_class"), character.get("background")]
+    for column in CHARACTER_STAT_COLUMNS:
+        if column in stats:
+            columns.append(column)
+            values.append(stats[column])
+    
+    params = [session_id, NEW_SESSION_SUMMARY, *values, list(inventory), list(inventory.values())]
+    opening_cte = ""
+    if opening is not None:
+        opening_cte = """, new_opening AS (
+                INSERT INTO chat_history (session_id, role, content, turn_order)
+                SELECT id, 'assistant', %s, 1 FROM new_session
+            )"""
+        params.append(opening)
+    
+    cursor.execute(f"""
+        WITH new_session AS (
+            INSERT INTO game_sessions (id, summary) VALUES (%s, %s)
+            RETURNING id, updated_at
+        ), new_character AS (
+            INSERT INTO characters (session_id, {', '.join(columns)})
+            SELECT id, {', '.join(['%s'] * len(values))} FROM new_session
+            RETURNING id
+        ), new_items AS (
+            INSERT INTO inventory_items (character_id, item_name, quantity)
+            SELECT new_character.id, item.name, item.quantity
+            FROM new_character, unnest(%s::text[], %s::int[]) AS item(name, quantity)
+        ){opening_cte}
+        SELECT updated_at FROM new_session
+    """, params)
+    return cursor.fetchone()[0]
+
+
 def create_session(session_id: str, location: str = "Dark Cave Entrance", 
-                   inventory: List[str] = None) -> Dict[str, Any]:
+                   inventory: Dict[str, int] = None,
+                   character: Dict[str, Any] = None,
+                   opening: str = None) -> Dict[str, Any]:
     """
     LEGACY: Create session using old API format
-    Maps to: game_sessions + characters + inventory_items
+    Maps to: game_sessions + characters + inventory_items (+ chat_history)
+
+    character: {"name", "race", "job_class", "background", "stats": {...}}
+    (lihat services.character.build_character). opening: narasi pembuka
+    (pesan assistant pertama). Semua baris dibuat dalam satu statement dan
+    hasilnya langsung masuk session cache.
     """
-    inventory = inventory or ["Rusty Sword"]
+    inventory = {name: qty for name, qty in (inventory or {"Rusty Sword": 1}).items() if qty > 0}
+    character = character or {}
     
     with get_db() as conn:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Create game session with custom UUID
+        cursor = conn.cursor()
+        updated_at = _insert_session(cursor, session_id, inventory, character, opening)
+        conn.commit()
+    _mark_written(session_id, version=0, last_seq=0 if opening is None else 1)
+    
+    session = new_session_state(session_id, inventory, character)
+    session["updated_at"] = updated_at
+    if _cache_enabled():
+        get_session_cache().put_session(session_id, session)
+        if opening is not None:
+            get_session_cache().put_messages(session_id, [_to_legacy_message(
+                {"turn_order": 1, "role": "assistant", "content": opening})])
+    return dict(session)
+
+
+# ==================== WARM POOL ====================
+
+def add_pooled_session(session_id: str, pool_key: str, inventory: Dict[str, int],
+                       character: Dict[str, Any], opening: str, payload: Dict[str, Any]):
+    """Buat session siap pakai + simpan response /game/new yang sudah dirender"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        _insert_session(cursor, session_id, inventory, character, opening)
         cursor.execute("""
-            INSERT INTO game_sessions (id, summary)
-            VALUES (%s, %s)
-            RETURNING *
-        """, (session_id, "You begin your adventure..."))
-        session = cursor.fetchone()
-        
-        # Create default character
+            INSERT INTO session_pool (session_id, pool_key, payload) VALUES (%s, %s, %s)
+        """, (session_id, pool_key, json.dumps(payload)))
+        conn.commit()
+    _mark_written(session_id, version=0, last_seq=1)
+
+
+def claim_pooled_session(pool_key: str, player_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Ambil satu session dari warm pool (satu round trip). SKIP LOCKED agar
+    request paralel tidak saling menunggu. Return payload, None jika pool kosong.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
         cursor.execute("""
-            INSERT INTO characters (session_id, name)
-            VALUES (%s, %s)
-            RETURNING *
-        """, (session_id, "Adventurer"))
-        character = cursor.fetchone()
-        
-        # Add inventory items
-        for item in inventory:
-            cursor.execute("""
-                INSERT INTO inventory_items (character_id, item_name, quantity)
-                VALUES (%s, %s, 1)
-            """, (character["id"], item))
-        
+            WITH claimed AS (
+                SELECT session_id FROM session_pool
+                WHERE pool_key = %s
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ), removed AS (
+                DELETE FROM session_pool p USING claimed
+                WHERE p.session_id = claimed.session_id
+                RETURNING p.session_id, p.payload
+            ), renamed AS (
+                UPDATE characters c SET name = %s
+                FROM removed WHERE c.session_id = removed.session_id
+            ), touched AS (
+                UPDATE game_sessions s SET created_at = NOW(), updated_at = NOW()
+                FROM removed WHERE s.id = removed.session_id
+            )
+            SELECT payload FROM removed
+        """, (pool_key, player_name or "Adventurer"))
+        row = cursor.fetchone()
         conn.commit()
-    
-    return get_session(session_id)
+        return row[0] if row else None
+
+
+def count_pooled_sessions() -> Dict[str, int]:
+    """Jumlah session siap pakai per pool_key"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pool_key, COUNT(*) FROM session_pool GROUP BY pool_key")
+        return {key: count for key, count in cursor.fetchall()}
+
+
+@contextmanager
+def try_advisory_lock(key: int) -> Iterator[bool]:
+    """Session-level advisory lock non-blocking; yield True jika lock didapat"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (key,))
+        acquired = cursor.fetchone()[0]
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (key,))
+                conn.commit()
+
+
+_ACQUIRE_LEASE = prepared.statement("acquire_lease", """
+    INSERT INTO leases (key, holder, expires_at)
+    VALUES (%s, %s, NOW() + make_interval(secs => %s))
+    ON CONFLICT (key) DO UPDATE SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+    WHERE leases.expires_at < NOW()
+    RETURNING holder
+""")
+_RELEASE_LEASE = prepared.statement("release_lease", """
+    DELETE FROM leases WHERE key = %s AND holder = %s
+""")
+
+
+@contextmanager
+def try_lease(key: str, ttl_seconds: float) -> Iterator[bool]:
+    """
+    Lease non-blocking antar worker; yield True jika didapat. Berbeda dengan
+    try_advisory_lock, tidak ada koneksi yang ditahan selama lease dipegang
+    (aman untuk pekerjaan yang menunggu LLM). Lease dari pemegang yang crash
+    kedaluwarsa setelah ttl_seconds.
+    """
+    holder = f"{WORKER_ID}:{uuid4().hex[:8]}"
+    with get_db() as conn:
+        cursor = conn.cursor()
+        prepared.execute(cursor, _ACQUIRE_LEASE, (key, holder, ttl_seconds))
+        acquired = cursor.fetchone() is not None
+        conn.commit()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with get_db() as conn:
+                cursor = conn.cursor()
+                prepared.execute(cursor, _RELEASE_LEASE, (key, holder))
+                conn.commit()
 
 
 def get_session(session_id: str) -> Optional[Dict[str, Any]]:
     """
     LEGACY: Get session in old format
     Combines: game_sessions + characters + inventory
+    Dilayani dari session cache jika tersedia.
     """
-    with get_db() as conn:
+    if _cache_enabled():
+        cached = get_session_cache().get_session(session_id)
+        if cached is not None:
+            return cached
+
+    session = _load_session(session_id)
+    if session is not None and _cache_enabled():
+        get_session_cache().put_session(session_id, session)
+    return session
+
+
+_LOAD_SESSION_ROW = prepared.statement("load_session_row", """
+    SELECT id, turn_count, game_variables, summary, last_event_trigger, is_game_over,
+           version, updated_at
+    FROM game_sessions WHERE id = %s
+""")
+_LOAD_SESSION_CHARACTER = prepared.statement("load_session_character", """
+    SELECT id, hp, max_hp, level, exp FROM characters WHERE session_id = %s
+""")
+_LOAD_SESSION_INVENTORY = prepared.statement("load_session_inventory", """
+    SELECT item_name, quantity FROM inventory_items 
+    WHERE character_id = %s AND quantity > 0
+    ORDER BY added_at
+""")
+_LOAD_SESSION_QUESTS = prepared.statement("load_session_quests", """
+    SELECT title, status FROM quests 
+    WHERE session_id = %s AND status IN ('active', 'completed')
+    ORDER BY started_at
+""")
+
+
+def _load_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Baca session format lama langsung dari database (tanpa cache); dari read
+    replica jika version-nya tidak lebih tua dari watermark tulis session.
+    """
+    def read(conn):
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         # Get session
-        cursor.execute("SELECT * FROM game_sessions WHERE id = %s", (session_id,))
+        prepared.execute(cursor, _LOAD_SESSION_ROW, (session_id,))
         session = cursor.fetchone()
         if not session:
             return None
         
         # Get character
-        cursor.execute("SELECT * FROM characters WHERE session_id = %s", (session_id,))
+        prepared.execute(cursor, _LOAD_SESSION_CHARACTER, (session_id,))
         character = cursor.fetchone()
         
-        # Get inventory
-        inventory = []
+        # Get inventory ({item_name: quantity})
+        inventory = {}
         if character:
-            cursor.execute("""
-                SELECT item_name, quantity FROM inventory_items 
-                WHERE character_id = %s
-            """, (character["id"],))
-            for row in cursor.fetchall():
-                for _ in range(row["quantity"]):
-                    inventory.append(row["item_name"])
-        
-        # Get active quests
-        cursor.execute("""
-            SELECT title FROM quests 
-            WHERE session_id = %s AND status = 'active'
-        """, (session_id,))
-        active_quests = [row["title"] for row in cursor.fetchall()]
+            prepared.execute(cursor, _LOAD_SESSION_INVENTORY, (character["id"],))
+            inventory = {row["item_name"]: row["quantity"] for row in cursor.fetchall()}
         
-        # Get completed quests
-        cursor.execute("""
-            SELECT title FROM quests 
-            WHERE session_id = %s AND status = 'completed'
-        """, (session_id,))
-        completed_quests = [row["title"] for row in cursor.fetchall()]
+        # Get active & completed quests
+        prepared.execute(cursor, _LOAD_SESSION_QUESTS, (session_id,))
+        quests = cursor.fetchall()
+        active_quests = [row["title"] for row in quests if row["status"] == "active"]
+        completed_quests = [row["title"] for row in quests if row["status"] == "completed"]
         
         # Map to old format
         return {
@@ -629,63 +1573,255 @@ def get_session(session_id: str) -> Optional[Dict[str, Any]]:
             "completed_quests": completed_quests,
             "summary": session["summary"],
             "last_event_trigger": session["last_event_trigger"],
-            "game_over": session["is_game_over"]
+            "game_over": session["is_game_over"],
+            "version": session["version"],
+            "updated_at": session["updated_at"]
         }
 
+    def is_fresh(session, mark):
+        return mark[0] is None or session["version"] >= mark[0]
 
-def update_session(session_id: str, **kwargs) -> bool:
+    return _route_read(session_id, read, is_fresh)
+
+
+_SESSION_VERSION = prepared.statement("session_version", """
+    SELECT s.turn_count, s.updated_at,
+           COALESCE((SELECT MAX(turn_order) FROM chat_history c WHERE c.session_id = s.id), 0)
+    FROM game_sessions s WHERE s.id = %s
+""")
+
+
+def get_session_version(session_id: str) -> Optional[tuple]:
     """
-    LEGACY: Update session using old API
-    Maps to: game_sessions + characters
+    Versi session untuk ETag: (turn_count, updated_at, last message sequence).
+    Dari cache jika ada, jika tidak satu query murah (index-only pada chat_history).
     """
-    session_fields = ["summary", "last_event_trigger", "game_variables", "turn_count", "game_over"]
-    character_fields = ["hp", "max_hp", "level", "exp"]
+    if _cache_enabled():
+        version = get_session_cache().get_version(session_id)
+        if version is not None:
+            return version
     
-    session_updates = []
-    session_values = []
+    with get_db() as conn:
+        cursor = conn.cursor()
+        prepared.execute(cursor, _SESSION_VERSION, (session_id,))
+        row = cursor.fetchone()
+        return tuple(row) if row else None
+
+
+class SessionConflict(Exception):
+    """Session sudah diubah (atau sedang disimpan) oleh request lain -> HTTP 409"""
+
+
+# Advisory lock per session: pg_try_advisory_xact_lock(TURN_LOCK_CLASS, hashtext(session_id))
+TURN_LOCK_CLASS = 7_310_044
+
+turn_metrics = {
+    "commits": 0,
+    "lock_busy": 0,          # lock dipegang request lain (tanpa menunggu)
+    "version_conflicts": 0   # version berubah sejak session dibaca
+}
+
+
+# Urutan kolom kanonik: kumpulan kolom yang sama selalu menghasilkan SQL yang
+# sama, sehingga setiap bentuk UPDATE cukup di-PREPARE sekali per koneksi.
+SESSION_UPDATE_COLUMNS = [("summary", "summary"), ("last_event_trigger", "last_event_trigger"),
+                          ("game_variables", "game_variables"), ("turn_count", "turn_count"),
+                          ("game_over", "is_game_over")]
+CHARACTER_UPDATE_COLUMNS = ["hp", "max_hp", "level", "exp"]
+
+_UPSERT_INVENTORY = prepared.statement("upsert_inventory", """
+    WITH changes AS (
+        SELECT c.id AS character_id, d.item_name, d.quantity
+        FROM characters c, unnest(%s::text[], %s::int[]) AS d(item_name, quantity)
+        WHERE c.session_id = %s
+    ), removed AS (
+        DELETE FROM inventory_items i USING changes
+        WHERE i.character_id = changes.character_id
+          AND i.item_name = changes.item_name AND changes.quantity <= 0
+    )
+    INSERT INTO inventory_items (character_id, item_name, quantity)
+    SELECT character_id, item_name, quantity FROM changes WHERE quantity > 0
+    ON CONFLICT (character_id, item_name) DO UPDATE SET quantity = EXCLUDED.quantity
+""")
+
+
+def _session_update_statement(mask: int, columns: List[str], versioned: bool) -> prepared.Statement:
+    sets = [f"{column} = %s" for column in columns] + ["updated_at = NOW()"]
+    condition = "id = %s"
+    if versioned:
+        sets.append("version = version + 1")
+        condition += " AND version = %s"
+    return prepared.statement(
+        f"update_session_{mask:02x}{'_v' if versioned else ''}",
+        f"UPDATE game_sessions SET {', '.join(sets)} WHERE {condition} RETURNING updated_at, version"
+    )
+
+
+def _character_update_statement(mask: int, columns: List[str]) -> prepared.Statement:
+    sets = ", ".join(f"{column} = %s" for column in columns)
+    return prepared.statement(f"update_character_{mask:x}",
+                              f"UPDATE characters SET {sets} WHERE session_id = %s")
+
+
+def _apply_session_updates(cursor, session_id: str, kwargs: Dict[str, Any],
+                           expected_version: Optional[int] = None) -> tuple:
+    """
+    Jalankan UPDATE session/character/inventory dalam transaksi pemanggil.
+    Jika expected_version diberikan, UPDATE hanya berlaku bila version masih
+    sama (lalu version + 1); jika tidak, SessionConflict. Return perubahan
+    untuk write-through cache: (cache_changes, inventory_changes).
+    """
+    # Perubahan yang ikut ditulis ke session cache (write-through)
+    cache_changes = {}
+    inventory_changes = kwargs.pop("inventory_diff", None) or {}
     
-    character_updates = []
-    character_values = []
+    session_mask, session_columns, session_values = 0, [], []
+    for bit, (key, column) in enumerate(SESSION_UPDATE_COLUMNS):
+        if key in kwargs:
+            value = kwargs[key]
+            cache_changes[key] = value
+            session_mask |= 1 << bit
+            session_columns.append(column)
+            session_values.append(json.dumps(value) if isinstance(value, dict) else value)
     
-    for key, value in kwargs.items():
-        if key in session_fields:
-            if key == "game_over":
-                session_updates.append("is_game_over = %s")
-                session_values.append(value)
-            elif isinstance(value, dict):
-                session_updates.append(f"{key} = %s")
-                session_values.append(json.dumps(value))
-            else:
-                session_updates.append(f"{key} = %s")
-                session_values.append(value)
-        elif key in character_fields:
-            character_updates.append(f"{key} = %s")
-            character_values.append(value)
-        elif key == "inventory":
-            # Handle inventory separately
-            pass
+    character_mask, character_columns, character_values = 0, [], []
+    for bit, column in enumerate(CHARACTER_UPDATE_COLUMNS):
+        if column in kwargs:
+            cache_changes[column] = kwargs[column]
+            character_mask |= 1 << bit
+            character_columns.append(column)
+            character_values.append(kwargs[column])
     
+    # Update session (updated_at selalu disentuh agar versi/ETag ikut berubah)
+    if session_columns or character_columns or inventory_changes or expected_version is not None:
+        versioned = expected_version is not None
+        stmt = _session_update_statement(session_mask, session_columns, versioned)
+        params = session_values + [session_id] + ([expected_version] if versioned else [])
+        prepared.execute(cursor, stmt, params)
+        row = cursor.fetchone()
+        if row:
+            cache_changes["updated_at"] = row[0]
+            cache_changes["version"] = row[1]
+        elif versioned:
+            raise SessionConflict("Session was modified by another action, reload and try again")
+    
+    # Update character
+    if character_columns:
+        stmt = _character_update_statement(character_mask, character_columns)
+        prepared.execute(cursor, stmt, character_values + [session_id])
+    
+    # Update inventory: upsert item yang berubah + hapus yang habis
+    if inventory_changes:
+        names = list(inventory_changes)
+        prepared.execute(cursor, _UPSERT_INVENTORY,
+                         (names, [inventory_changes[n] for n in names], session_id))
+    
+    return cache_changes, inventory_changes
+
+
+def _write_through(session_id: str, cache_changes: Dict[str, Any], inventory_changes: Dict[str, int]):
+    if _cache_enabled() and cache_changes:
+        get_session_cache().update_session(session_id, cache_changes)
+    if _cache_enabled() and inventory_changes:
+        get_session_cache().update_inventory(session_id, inventory_changes)
+
+
+def update_session(session_id: str, expected_version: int = None, **kwargs) -> bool:
+    """
+    LEGACY: Update session using old API
+    Maps to: game_sessions + characters + inventory_items
+
+    inventory_diff: {item_name: quantity baru} (lihat game_engine.inventory_diff);
+    quantity 0 menghapus item. Diterapkan dalam satu statement upsert.
+    expected_version: optimistic check, raise SessionConflict jika version berubah.
+    """
     with get_db() as conn:
         cursor = conn.cursor()
+        try:
+            cache_changes, inventory_changes = _apply_session_updates(
+                cursor, session_id, kwargs, expected_version)
+        except SessionConflict:
+            conn.rollback()
+            turn_metrics["version_conflicts"] += 1
+            raise
         
-        # Update session
-        if session_updates:
-            session_updates.append("updated_at = NOW()")
-            session_values.append(session_id)
-            cursor.execute(f"""
-                UPDATE game_sessions SET {', '.join(session_updates)} WHERE id = %s
-            """, session_values)
+        # Baris session tidak ada / tidak ada perubahan: tanpa NOTIFY dan tanpa write-through
+        updated = "version" in cache_changes
+        if updated:
+            # Tanpa expected_version, version tidak naik: watermark tidak bisa dicek di replica
+            _notify_session_changed(cursor, session_id,
+                                    version=cache_changes["version"] if expected_version is not None else None)
+        conn.commit()
+    
+    if updated:
+        _write_through(session_id, cache_changes, inventory_changes)
+    return updated
+
+
+_TRY_TURN_LOCK = prepared.statement("try_turn_lock", "SELECT pg_try_advisory_xact_lock(%s, hashtext(%s))")
+_INSERT_TURN_MESSAGES = prepared.statement("insert_turn_messages", """
+    WITH last AS (
+        SELECT COALESCE(MAX(turn_order), 0) AS turn_order FROM chat_history WHERE session_id = %s
+    )
+    INSERT INTO chat_history (session_id, role, content, turn_order)
+    SELECT %s::uuid, m.role, m.content, last.turn_order + m.pos
+    FROM last, unnest(%s::text[], %s::text[]) WITH ORDINALITY AS m(role, content, pos)
+    RETURNING turn_order, role, content
+""")
+
+
+def commit_turn(session_id: str, expected_version: int, action: str, narrative: str,
+                **changes) -> Dict[str, int]:
+    """
+    Simpan satu turn secara atomik: pesan user + assistant dan perubahan state.
+    Diserialisasi per session dengan pg_try_advisory_xact_lock (tidak pernah
+    menunggu, tidak memblok session lain) + cek version. Raise SessionConflict
+    jika kalah; return {"user_seq", "assistant_seq", "version"}.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        prepared.execute(cursor, _TRY_TURN_LOCK, (TURN_LOCK_CLASS, session_id))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            turn_metrics["lock_busy"] += 1
+            raise SessionConflict("Another action for this session is being saved")
         
-        # Update character
-        if character_updates:
-            character_values.append(session_id)
-            cursor.execute(f"""
-                UPDATE characters SET {', '.join(character_updates)} 
-                WHERE session_id = %s
-            """, character_values)
+        try:
+            cache_changes, inventory_changes = _apply_session_updates(
+                cursor, session_id, changes, expected_version)
+        except SessionConflict:
+            conn.rollback()
+            turn_metrics["version_conflicts"] += 1
+            raise
         
+        prepared.execute(cursor, _INSERT_TURN_MESSAGES,
+                         (session_id, session_id, ["user", "assistant"], [action, narrative]))
+        messages = sorted(cursor.fetchall())
+        _notify_session_changed(cursor, session_id, version=cache_changes.get("version"),
+                                last_seq=messages[-1][0])
         conn.commit()
-        return True
+    
+    turn_metrics["commits"] += 1
+    _write_through(session_id, cache_changes, inventory_changes)
+    if _cache_enabled():
+        for turn_order, role, content in messages:
+            get_session_cache().append_message(session_id, _to_legacy_message(
+                {"turn_order": turn_order, "role": role, "content": content}))
+    
+    return {
+        "user_seq": messages[0][0],
+        "assistant_seq": messages[1][0],
+        "version": cache_changes.get("version")
+    }
+
+
+def get_turn_lock_stats() -> Dict[str, Any]:
+    """Jumlah commit turn + rate lock busy / version conflict"""
+    stats = dict(turn_metrics)
+    attempts = stats["commits"] + stats["lock_busy"] + stats["version_conflicts"]
+    stats["lock_busy_rate"] = round(stats["lock_busy"] / attempts, 4) if attempts else 0.0
+    stats["conflict_rate"] = round(stats["version_conflicts"] / attempts, 4) if attempts else 0.0
+    return stats
 
 
 def add_message(session_id: str, role: str, content: str, 
@@ -708,31 +1844,36 @@ def get_messages(session_id: str, limit: int = 15) -> List[Dict[str, Any]]:
     messages = get_chat_history(session_id, limit)
     
     # Convert to old format
-    return [{
+    return [_to_legacy_message(msg) for msg in messages]
+
+
+def _to_legacy_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """Konversi baris chat_history ke format pesan lama"""
+    return {
         "id": msg["turn_order"],
         "role": msg["role"],
         "content": msg["content"],
         "choices_options": None,
         "chosen_option": None,
         "sequence": msg["turn_order"]
-    } for msg in messages]
+    }
 
 
 def get_all_messages(session_id: str) -> List[Dict[str, Any]]:
     """
     LEGACY: Get all messages
     Maps to: chat_history
+    Dilayani dari session cache jika tersedia.
     """
-    messages = get_all_chat_history(session_id)
+    if _cache_enabled():
+        cached = get_session_cache().get_messages(session_id)
+        if cached is not None:
+            return cached
     
-    return [{
-        "id": msg["turn_order"],
-        "role": msg["role"],
-        "content": msg["content"],
-        "choices_options": None,
-        "chosen_option": None,
-        "sequence": msg["turn_order"]
-    } for msg in messages]
+    messages = [_to_legacy_message(msg) for msg in get_all_chat_history(session_id)]
+    if _cache_enabled():
+        get_session_cache().put_messages(session_id, messages)
+    return messages
 
 
 def get_message_count(session_id: str) -> int:
@@ -743,21 +1884,71 @@ def get_message_count(session_id: str) -> int:
         return cursor.fetchone()[0]
 
 
-def delete_old_messages(session_id: str, keep_last: int = 10):
-    """LEGACY: Delete old messages, keep last N"""
+def archive_old_messages(session_id: str, keep_last: int = 10,
+                         max_turn_order: Optional[int] = None) -> int:
+    """
+    Pindahkan semua pesan kecuali N terakhir ke chat_history_archive dalam satu
+    statement (DELETE ... RETURNING -> INSERT ... SELECT). Threshold turn_order
+    dicari lewat index (session_id, turn_order DESC), tanpa NOT IN subquery.
+    max_turn_order: jangan arsipkan pesan setelah turn_order ini (mis. pesan
+    yang ditambahkan turn lain setelah summary dibuat).
+    updated_at session ikut dinaikkan agar ETag GET /game/{id} berubah.
+    """
+    updated_at = None
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            DELETE FROM chat_history 
-            WHERE session_id = %s AND id NOT IN (
-                SELECT id FROM chat_history 
+            WITH threshold AS (
+                SELECT turn_order FROM chat_history 
                 WHERE session_id = %s 
                 ORDER BY turn_order DESC 
-                LIMIT %s
+                OFFSET %s LIMIT 1
+            ), moved AS (
+                DELETE FROM chat_history 
+                WHERE session_id = %s AND turn_order <= (SELECT turn_order FROM threshold)
+                  AND (%s::int IS NULL OR turn_order <= %s::int)
+                RETURNING id, session_id, role, content, created_at, turn_order
             )
-        """, (session_id, session_id, keep_last))
+            INSERT INTO chat_history_archive (id, session_id, role, content, created_at, turn_order)
+            SELECT id, session_id, role, content, created_at, turn_order FROM moved
+        """, (session_id, keep_last, session_id, max_turn_order, max_turn_order))
+        archived = cursor.rowcount
+        if archived:
+            cursor.execute("UPDATE game_sessions SET updated_at = NOW() WHERE id = %s RETURNING updated_at",
+                           (session_id,))
+            row = cursor.fetchone()
+            updated_at = row[0] if row else None
+            _notify_session_changed(cursor, session_id)
         conn.commit()
-        return cursor.rowcount
+    
+    get_session_cache().drop_messages(session_id)
+    if updated_at is not None:
+        get_session_cache().update_session(session_id, {"updated_at": updated_at})
+    return archived
+
+
+def delete_old_messages(session_id: str, keep_last: int = 10):
+    """LEGACY: Remove old messages from hot history, keep last N (now archived, not destroyed)"""
+    return archive_old_messages(session_id, keep_last)
+
+
+def iter_archived_messages(session_id: str, after_turn_order: int = 0,
+                           batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """Stream pesan arsip (format lama) memakai server-side cursor"""
+    with get_db() as conn:
+        cursor = conn.cursor(name=f"archive_{uuid4().hex}", cursor_factory=RealDictCursor)
+        cursor.itersize = batch_size
+        try:
+            cursor.execute("""
+                SELECT role, content, turn_order FROM chat_history_archive 
+                WHERE session_id = %s AND turn_order > %s
+                ORDER BY turn_order ASC
+            """, (session_id, after_turn_order))
+            for row in cursor:
+                yield _to_legacy_message(row)
+        finally:
+            cursor.close()
+            conn.rollback()
 
 
 def save_snapshot(session_id: str) -> bool:
@@ -782,3 +1973,24 @@ def get_snapshot_count(session_id: str) -> int:
     """LEGACY: Get snapshot count"""
     # TODO: Implement snapshot system with new schema if needed
     return 0
+
+
+# ==================== STORAGE BACKEND ====================
+# STORAGE_BACKEND=sqlite|memory: fungsi di storage.OPERATIONS dilayani backend
+# embedded (app.db.storage) alih-alih Postgres; pemanggil tetap memakai
+# database.<fungsi>. Fungsi lain di modul ini tetap khusus Postgres.
+# Backend dibaca saat fungsi dipanggil, bukan saat modul di-import.
+
+
+def _delegate(name: str, postgres_operation):
+    def operation(*args, **kwargs):
+        if storage_backend() == "postgres":
+            return postgres_operation(*args, **kwargs)
+        return getattr(storage.get_storage(), name)(*args, **kwargs)
+    operation.__name__ = operation.__qualname__ = name
+    operation.__doc__ = postgres_operation.__doc__
+    return operation
+
+
+for _name in storage.OPERATIONS:
+    globals()[_name] = _delegate(_name, globals()[_name])
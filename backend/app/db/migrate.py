@@ -0,0 +1,78 @@
+"""
+Versioned schema migrations.
+
+init.sql hanya dijalankan docker-entrypoint saat database pertama kali dibuat.
+Perubahan skema setelahnya ditulis sebagai file SQL bernomor di
+app/db/migrations/ (NNNN_nama.sql) dan diterapkan saat startup, berurutan,
+masing-masing dalam satu transaksi. Versi yang sudah diterapkan dicatat di
+tabel schema_migrations. Advisory lock mencegah beberapa worker menerapkan
+migrasi yang sama secara bersamaan.
+
+Backend embedded (STORAGE_BACKEND=sqlite|memory) membuat skemanya sendiri
+(lihat app.db.storage), sehingga migrasi dilewati.
+"""
+
+import os
+import re
+from typing import List, Tuple
+
+from app.db.database import get_db, storage_backend
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATION_LOCK_KEY = 7_310_042  # pg_advisory_lock key khusus migrasi
+_FILENAME_RE = re.compile(r"^(\d{4})_[\w-]+\.sql$")
+
+
+def list_migrations() -> List[Tuple[int, str, str]]:
+    """Daftar migrasi (version, name, path) urut berdasarkan version"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), filename, os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+def apply_migrations() -> List[str]:
+    """Terapkan migrasi yang belum tercatat. Return nama migrasi yang baru diterapkan."""
+    applied_now = []
+    if storage_backend() != "postgres":
+        return applied_now
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(200) NOT NULL,
+                    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+
+            for version, name, path in list_migrations():
+                if version in applied:
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    sql = f.read()
+                try:
+                    cursor.execute(sql)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, name)
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied_now.append(name)
+                print(f"✅ Applied migration {name}")
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+            conn.commit()
+
+    return applied_now
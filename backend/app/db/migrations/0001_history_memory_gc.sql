@@ -0,0 +1,60 @@
+-- Tabel & index yang ditambahkan setelah skema awal (init.sql).
+-- Semua statement idempotent agar aman untuk database lama maupun baru.
+
+-- Garbage collector: cari session idle berdasarkan updated_at
+CREATE INDEX IF NOT EXISTS idx_game_sessions_updated_at ON game_sessions (updated_at);
+
+-- Arsip Chat History (cold, append-only), dipartisi berdasarkan hash session_id
+CREATE TABLE IF NOT EXISTS chat_history_archive (
+    id UUID NOT NULL,
+    session_id UUID NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    
+    role VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    
+    created_at TIMESTAMP WITH TIME ZONE,
+    turn_order INTEGER,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+) PARTITION BY HASH (session_id);
+
+CREATE TABLE IF NOT EXISTS chat_history_archive_p0 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 0);
+CREATE TABLE IF NOT EXISTS chat_history_archive_p1 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 1);
+CREATE TABLE IF NOT EXISTS chat_history_archive_p2 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 2);
+CREATE TABLE IF NOT EXISTS chat_history_archive_p3 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 3);
+CREATE TABLE IF NOT EXISTS chat_history_archive_p4 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 4);
+CREATE TABLE IF NOT EXISTS chat_history_archive_p5 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 5);
+CREATE TABLE IF NOT EXISTS chat_history_archive_p6 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 6);
+CREATE TABLE IF NOT EXISTS chat_history_archive_p7 PARTITION OF chat_history_archive FOR VALUES WITH (MODULUS 8, REMAINDER 7);
+
+CREATE INDEX IF NOT EXISTS idx_chat_history_archive_session ON chat_history_archive (session_id, turn_order);
+
+-- Memory Vectors (long-term memory dari turn yang diarsipkan)
+CREATE TABLE IF NOT EXISTS memory_vectors (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    session_id UUID REFERENCES game_sessions(id) ON DELETE CASCADE,
+    
+    turn_order INTEGER NOT NULL,  -- turn_order asli di chat_history
+    role VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    
+    embedding BYTEA NOT NULL,     -- float16 vector (hashing embedder, CPU-only)
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_memory_vectors_session ON memory_vectors (session_id, turn_order);
+
+-- Story Summaries (rangkuman bertingkat: chunk -> chapter -> saga)
+CREATE TABLE IF NOT EXISTS story_summaries (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    session_id UUID REFERENCES game_sessions(id) ON DELETE CASCADE,
+    
+    level VARCHAR(10) NOT NULL,   -- 'chunk', 'chapter', 'saga'
+    idx INTEGER NOT NULL,         -- Urutan dalam level
+    content TEXT NOT NULL,
+    child_count INTEGER DEFAULT 0, -- Jumlah anak yang sudah dirangkum
+    
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    
+    UNIQUE(session_id, level, idx)
+);
@@ -0,0 +1,13 @@
+-- Index untuk lookup yang dipanggil setiap turn / setiap GET /game/{id}
+
+-- get_session / update_session: characters WHERE session_id = ?
+CREATE INDEX IF NOT EXISTS idx_characters_session ON characters (session_id);
+
+-- get_session / get_inventory: inventory_items WHERE character_id = ?
+CREATE INDEX IF NOT EXISTS idx_inventory_items_character ON inventory_items (character_id);
+
+-- get_session / get_quests: quests WHERE session_id = ? AND status = ?
+CREATE INDEX IF NOT EXISTS idx_quests_session_status ON quests (session_id, status);
+
+-- select_lore / get_story_cards: story_cards WHERE session_id = ? AND is_active
+CREATE INDEX IF NOT EXISTS idx_story_cards_session ON story_cards (session_id) WHERE is_active = TRUE;
@@ -0,0 +1,21 @@
+-- Inventory sebagai {item_name: quantity}: satu baris per (character, item)
+
+-- Gabungkan baris duplikat (quantity dijumlah ke baris tertua)
+WITH ranked AS (
+    SELECT id,
+           SUM(quantity) OVER (PARTITION BY character_id, item_name) AS total,
+           ROW_NUMBER() OVER (PARTITION BY character_id, item_name ORDER BY added_at, id) AS rn
+    FROM inventory_items
+), kept AS (
+    UPDATE inventory_items i SET quantity = r.total
+    FROM ranked r
+    WHERE i.id = r.id AND r.rn = 1 AND i.quantity <> r.total
+)
+DELETE FROM inventory_items i USING ranked r WHERE i.id = r.id AND r.rn > 1;
+
+-- Target ON CONFLICT untuk upsert inventory di update_session
+CREATE UNIQUE INDEX IF NOT EXISTS uq_inventory_items_character_item
+    ON inventory_items (character_id, item_name);
+
+-- Prefix (character_id) sudah dicakup unique index di atas
+DROP INDEX IF EXISTS idx_inventory_items_character;
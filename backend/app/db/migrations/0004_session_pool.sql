@@ -0,0 +1,12 @@
+-- Warm pool /game/new: session yang sudah dibuat lengkap (karakter, inventory,
+-- narasi pembuka dari LLM) dan siap diklaim dalam satu round trip
+
+CREATE TABLE IF NOT EXISTS session_pool (
+    session_id UUID PRIMARY KEY REFERENCES game_sessions(id) ON DELETE CASCADE,
+    pool_key TEXT NOT NULL,        -- skenario + preset (lihat services.warm_pool.pool_key)
+    payload JSONB NOT NULL,        -- response /game/new yang sudah dirender
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- claim_pooled_session: WHERE pool_key = ? ORDER BY created_at LIMIT 1
+CREATE INDEX IF NOT EXISTS idx_session_pool_key ON session_pool (pool_key, created_at);
@@ -0,0 +1,3 @@
+-- Optimistic concurrency: version naik setiap turn disimpan (commit_turn),
+-- update dengan expected_version yang sudah usang ditolak (HTTP 409)
+ALTER TABLE game_sessions ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,12 @@
+-- Rate limiting (RATE_LIMIT_BACKEND=postgres): satu token bucket per key,
+-- dibagi semua worker. UNLOGGED: tidak perlu WAL, boleh hilang saat crash.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    key TEXT PRIMARY KEY,               -- mis. "llm:ip:203.0.113.7", "read:session:<uuid>"
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL, -- epoch detik (jam server database)
+    allowed BOOLEAN NOT NULL DEFAULT TRUE -- hasil request terakhir (untuk RETURNING)
+);
+
+-- purge_rate_limit_buckets: bucket yang sudah lama tidak dipakai (= penuh)
+CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated_at ON rate_limit_buckets (updated_at);
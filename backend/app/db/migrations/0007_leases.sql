@@ -0,0 +1,9 @@
+-- Lease non-blocking antar worker (database.try_lease) untuk pekerjaan yang
+-- lama (LLM) tanpa menahan koneksi pool seperti session-level advisory lock.
+-- UNLOGGED: lease hanya berlaku sebentar, boleh hilang saat crash.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,                     -- mis. "summarize:<session_id>"
+    holder TEXT NOT NULL,                     -- WORKER_ID + token pemegang
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL  -- pemegang yang crash tidak mengunci selamanya
+);
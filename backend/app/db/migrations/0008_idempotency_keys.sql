@@ -0,0 +1,13 @@
+-- Idempotency POST /game/action dibagi semua worker: retry yang mendarat di
+-- worker lain diputar ulang dari sini, tanpa LLM dan tanpa commit_turn kedua.
+-- UNLOGGED: response hanya disimpan sebentar (TTL), boleh hilang saat crash.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,                         -- "<session_id>:key:<Idempotency-Key>" / ":turn:<N>"
+    fingerprint TEXT NOT NULL,                    -- aksi pemain; key sama + aksi beda -> 422
+    response TEXT,                                -- JSON response; NULL = masih diproses
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL  -- claim pending / response kedaluwarsa
+);
+
+-- purge_idempotency_keys
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
@@ -0,0 +1,33 @@
+-- Rate limiting: ambil token dari beberapa bucket (session + IP) dalam satu
+-- round trip, all-or-nothing. Bucket dikunci urut key (tanpa deadlock antar
+-- request); jika salah satu bucket kurang, tidak ada token yang diambil.
+
+CREATE OR REPLACE FUNCTION take_rate_limit_tokens(p_keys TEXT[], p_rates FLOAT8[],
+                                                  p_bursts FLOAT8[], p_cost FLOAT8,
+                                                  OUT o_allowed BOOLEAN, OUT o_tokens FLOAT8[])
+LANGUAGE plpgsql AS $$
+DECLARE
+    now_ts FLOAT8 := EXTRACT(EPOCH FROM clock_timestamp());
+BEGIN
+    -- Bucket baru mulai penuh
+    INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+    SELECT k, b, now_ts FROM unnest(p_keys, p_bursts) AS i(k, b)
+    ON CONFLICT (key) DO NOTHING;
+
+    PERFORM 1 FROM rate_limit_buckets WHERE key = ANY(p_keys) ORDER BY key FOR UPDATE;
+
+    SELECT array_agg(LEAST(i.burst, b.tokens + (now_ts - b.updated_at) * i.rate) ORDER BY i.n)
+    INTO o_tokens
+    FROM unnest(p_keys, p_rates, p_bursts) WITH ORDINALITY AS i(k, rate, burst, n)
+    JOIN rate_limit_buckets b ON b.key = i.k;
+
+    SELECT bool_and(t >= p_cost) INTO o_allowed FROM unnest(o_tokens) AS t;
+
+    IF o_allowed THEN
+        UPDATE rate_limit_buckets b SET tokens = i.t - p_cost, updated_at = now_ts, allowed = TRUE
+        FROM unnest(p_keys, o_tokens) AS i(k, t)
+        WHERE b.key = i.k;
+        SELECT array_agg(t - p_cost) INTO o_tokens FROM unnest(o_tokens) AS t;
+    END IF;
+END;
+$$;
@@ -0,0 +1,10 @@
+-- Satu embedding per turn: _summarize menyimpan embedding sebelum
+-- archive_old_messages, sehingga crash di antaranya membuat turn yang sama
+-- di-embed ulang pada summary berikutnya. add_memory_vectors memakai
+-- ON CONFLICT DO NOTHING terhadap index unik ini.
+
+DELETE FROM memory_vectors a USING memory_vectors b
+WHERE a.session_id = b.session_id AND a.turn_order = b.turn_order AND a.ctid > b.ctid;
+
+DROP INDEX IF EXISTS idx_memory_vectors_session;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_memory_vectors_turn ON memory_vectors (session_id, turn_order);
@@ -0,0 +1,246 @@
+"""
+Connection pool dengan antrean tunggu terbatas (pengganti ThreadedConnectionPool).
+
+- getconn menunggu (maks checkout_timeout) saat semua koneksi terpakai, bukan
+  langsung PoolError; antrean tunggu dibatasi max_waiters.
+- Koneksi yang idle lebih lama dari ping_after dicek dulu (SELECT 1); koneksi
+  mati (mis. setelah Postgres restart) dibuang dan diganti.
+- Koneksi yang umurnya melewati max_lifetime ditutup dan dibuat ulang.
+- putconn melakukan rollback jika koneksi dikembalikan di tengah transaksi.
+- Watchdog mencetak stack trace checkout untuk koneksi yang dipegang terlalu lama.
+"""
+
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Any, Callable, Optional
+
+# Di-import saat pool pertama dibuat (import modul ini tidak memuat psycopg2)
+psycopg2 = None
+
+
+class PoolTimeout(Exception):
+    """Tidak ada koneksi tersedia dalam batas waktu / antrean penuh (HTTP 503)"""
+
+
+class ManagedPool:
+
+    def __init__(self, connect: Callable[[], Any], minconn: int = 1, maxconn: int = 10,
+                 max_waiters: int = 50, checkout_timeout: float = 5.0,
+                 max_lifetime: float = 1800.0, ping_after: float = 30.0,
+                 leak_threshold: float = 30.0):
+        global psycopg2
+        import psycopg2.extensions
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_waiters = max_waiters
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.leak_threshold = leak_threshold
+
+        self._cond = threading.Condition()
+        self._idle = deque()              # (conn, created_at, returned_at)
+        self._in_use: Dict[int, Dict[str, Any]] = {}
+        self._size = 0
+        self._waiters = 0
+        self._closed = False
+
+        self.metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "timeouts": 0,
+            "rejected": 0,            # antrean tunggu penuh
+            "created": 0,
+            "recycled": 0,            # melewati max_lifetime
+            "broken": 0,              # gagal liveness check / error koneksi
+            "rollbacks_on_return": 0,
+            "leaks_detected": 0
+        }
+
+        for _ in range(minconn):
+            self._idle.append((self._new_connection(), time.monotonic(), time.monotonic()))
+            self._size += 1
+
+        if leak_threshold > 0:
+            threading.Thread(target=self._watch_leaks, name="db-pool-leaks", daemon=True).start()
+
+    # ---------- internal ----------
+
+    def _new_connection(self):
+        conn = self._connect()
+        self.metrics["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _is_alive(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # ---------- public ----------
+
+    def getconn(self, timeout: Optional[float] = None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            conn = None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if not self._idle and self._size >= self.maxconn:
+                    if self._waiters >= self.max_waiters:
+                        self.metrics["rejected"] += 1
+                        raise PoolTimeout("Connection pool wait queue is full")
+                    self._waiters += 1
+                    self.metrics["waits"] += 1
+                    try:
+                        while not self._idle and self._size >= self.maxconn:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self.metrics["timeouts"] += 1
+                                raise PoolTimeout(f"No database connection available within {timeout:.1f}s")
+                            self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+                if self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                else:
+                    self._size += 1
+                    created_at = returned_at = None
+
+            now = time.monotonic()
+            if conn is None:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created_at = now
+            elif now - created_at > self.max_lifetime:
+                self.metrics["recycled"] += 1
+                self._discard(conn)
+                continue
+            elif now - returned_at > self.ping_after and not self._is_alive(conn):
+                self.metrics["broken"] += 1
+                self._discard(conn)
+                continue
+
+            waited_ms = (now - start) * 1000
+            with self._cond:
+                self.metrics["checkouts"] += 1
+                self.metrics["wait_ms_total"] += waited_ms
+                self.metrics["wait_ms_max"] = max(self.metrics["wait_ms_max"], waited_ms)
+                self._in_use[id(conn)] = {
+                    "conn": conn,
+                    "created_at": created_at,
+                    "checked_out_at": now,
+                    "thread": threading.current_thread().name,
+                    "stack": traceback.extract_stack(limit=13)[:-1] if self.leak_threshold > 0 else None,
+                    "reported": False
+                }
+            return conn
+
+    def putconn(self, conn, close: bool = False):
+        with self._cond:
+            info = self._in_use.pop(id(conn), None)
+        if info is None:
+            return
+        if close or conn.closed:
+            self.metrics["broken"] += 1
+            self._discard(conn)
+            return
+
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            self.metrics["broken"] += 1
+            self._discard(conn)
+            return
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # Dikembalikan di tengah transaksi (lupa commit / exception)
+            self.metrics["rollbacks_on_return"] += 1
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self.metrics["broken"] += 1
+                self._discard(conn)
+                return
+
+        if time.monotonic() - info["created_at"] > self.max_lifetime:
+            self.metrics["recycled"] += 1
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append((conn, info["created_at"], time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn = self._idle.pop()[0]
+                conn.close()
+                self._size -= 1
+            self._cond.notify_all()
+
+    def _watch_leaks(self):
+        interval = max(1.0, self.leak_threshold / 2)
+        while not self._closed:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._cond:
+                leaked = [info for info in self._in_use.values()
+                          if not info["reported"] and now - info["checked_out_at"] > self.leak_threshold]
+                for info in leaked:
+                    info["reported"] = True
+            for info in leaked:
+                self.metrics["leaks_detected"] += 1
+                held = now - info["checked_out_at"]
+                stack = "".join(traceback.format_list(info["stack"])) if info["stack"] else "(no stack)"
+                print(f"⚠️ DB connection held for {held:.1f}s by thread {info['thread']}, checked out at:\n{stack}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self.metrics)
+            stats.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiters,
+                "max_size": self.maxconn,
+                "max_waiters": self.max_waiters
+            })
+        checkouts = stats["checkouts"]
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / checkouts, 3) if checkouts else 0.0
+        stats["wait_ms_total"] = round(stats["wait_ms_total"], 3)
+        stats["wait_ms_max"] = round(stats["wait_ms_max"], 3)
+        return stats
@@ -0,0 +1,88 @@
+"""
+Registry named prepared statement untuk query hot path.
+
+Setiap statement didaftarkan sekali (nama + SQL dengan placeholder %s), lalu
+di-PREPARE per koneksi pool saat pertama dipakai dan selanjutnya dijalankan
+dengan EXECUTE, sehingga Postgres tidak mem-parse (dan setelah beberapa kali
+eksekusi, tidak merencanakan ulang) SQL yang sama setiap turn.
+
+Prepared statement hidup per koneksi; koneksi baru (recycle / reconnect)
+otomatis mem-PREPARE ulang. Nonaktifkan (DB_PREPARED_STATEMENTS=false) jika
+berada di belakang PgBouncer mode transaction.
+"""
+
+import itertools
+import re
+import threading
+import weakref
+from typing import Dict, Optional, Sequence
+
+from app.core.config import get_settings
+
+# None = ikut Settings DB_PREPARED_STATEMENTS (dibaca saat dipakai); test & benchmark boleh menimpa
+ENABLED: Optional[bool] = None
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+
+class Statement:
+    """SQL + bentuk PREPARE/EXECUTE-nya"""
+    __slots__ = ("name", "sql", "param_count", "prepare_sql", "execute_sql")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+
+        counter = itertools.count(1)
+        body = _PLACEHOLDER_RE.sub(lambda _: f"${next(counter)}", sql)
+        self.param_count = sql.count("%s")
+        self.prepare_sql = f"PREPARE {name} AS {body}"
+        placeholders = ", ".join(["%s"] * self.param_count)
+        self.execute_sql = f"EXECUTE {name} ({placeholders})" if self.param_count else f"EXECUTE {name}"
+
+
+_registry: Dict[str, Statement] = {}
+_registry_lock = threading.Lock()
+
+# koneksi -> nama statement yang sudah di-PREPARE di koneksi itu
+_prepared: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def statement(name: str, sql: str) -> Statement:
+    """Daftarkan (atau ambil) statement; nama yang sama harus untuk SQL yang sama"""
+    with _registry_lock:
+        existing = _registry.get(name)
+        if existing is not None:
+            if existing.sql != sql:
+                raise ValueError(f"Prepared statement {name} already registered with different SQL")
+            return existing
+        stmt = Statement(name, sql)
+        _registry[name] = stmt
+        return stmt
+
+
+def execute(cursor, stmt: Statement, params: Sequence = ()):
+    """Jalankan statement di cursor; PREPARE dulu jika koneksi ini belum punya"""
+    enabled = get_settings().DB_PREPARED_STATEMENTS if ENABLED is None else ENABLED
+    if not enabled:
+        cursor.execute(stmt.sql, params)
+        return
+
+    conn = cursor.connection
+    with _prepared_lock:
+        names = _prepared.get(conn)
+        if names is None:
+            names = set()
+            _prepared[conn] = names
+
+    if stmt.name not in names:
+        cursor.execute(stmt.prepare_sql)
+        names.add(stmt.name)
+    cursor.execute(stmt.execute_sql, params)
+
+
+def registered() -> Dict[str, str]:
+    """Nama -> SQL semua statement yang terdaftar (untuk benchmark / debugging)"""
+    with _registry_lock:
+        return {name: stmt.sql for name, stmt in _registry.items()}
@@ -0,0 +1,40 @@
+"""
+Katalog game_presets di memori.
+
+game_presets adalah data statis (diisi oleh init.sql), jadi dimuat sekali saat
+startup lalu di-index per (category, value). ETag dihitung dari isi katalog
+sehingga hanya berubah jika data preset benar-benar berubah.
+"""
+
+import hashlib
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.etag import make_etag
+
+CATEGORIES = ("RACE", "CLASS", "BACKGROUND")
+
+
+class PresetCatalog:
+    """Preset terindex; dibuat ulang utuh saat reload (tidak pernah dimutasi)"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self._by_key: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._by_category: Dict[str, List[Dict[str, Any]]] = {category: [] for category in CATEGORIES}
+        for row in rows:
+            self._by_key[(row["category"], row["value"])] = row
+            self._by_category.setdefault(row["category"], []).append(row)
+
+        digest = hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        self.etag = make_etag("presets", digest[:16])
+
+    def get(self, category: str, value: str) -> Optional[Dict[str, Any]]:
+        row = self._by_key.get((category, value))
+        return dict(row) if row else None
+
+    def by_category(self, category: str) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._by_category.get(category, [])]
+
+    def grouped(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {category: self.by_category(category) for category in CATEGORIES}
@@ -0,0 +1,76 @@
+"""
+Storage backend untuk fungsi database yang dipakai main.py & services.
+
+Backend (Settings STORAGE_BACKEND):
+- postgres: implementasi asli di app.db.database (psycopg2, pool, session
+            cache + LISTEN/NOTIFY, migrasi). Default.
+- sqlite:   satu file SQLITE_PATH (WAL, JSON1); untuk deployment satu node,
+            tanpa server database
+- memory:   dict di dalam proses; untuk test, demo dan benchmark (data
+            hilang saat proses berhenti, tidak dibagi antar worker)
+
+Jika STORAGE_BACKEND bukan postgres, fungsi-fungsi di OPERATIONS pada
+app.db.database didelegasikan ke backend terpilih, sehingga pemanggil tetap
+memakai database.get_session(...), database.commit_turn(...), dst. Fungsi
+khusus Postgres lainnya (idempotency, rate limit postgres, ...) raise
+RuntimeError; backend embedded tidak membutuhkan psycopg2 sama sekali.
+Backend dibuat saat pertama dipakai (import modul ini tidak memuat sqlite3).
+"""
+
+import threading
+
+# Fungsi app.db.database yang menjadi bagian interface (lihat base.StorageBackend)
+OPERATIONS = (
+    # Lifecycle & stats
+    "wait_for_database", "check_database", "close_connection_pool", "start_cache_listener",
+    "get_pool_stats", "get_cache_stats", "get_turn_lock_stats",
+    # Session
+    "create_session", "get_session", "get_session_version", "update_session", "commit_turn",
+    "save_snapshot", "restore_last_snapshot", "count_idle_sessions", "purge_idle_sessions",
+    # Chat history
+    "get_messages", "get_all_messages", "get_chat_history", "get_all_chat_history",
+    "get_message_count", "archive_old_messages", "iter_archived_messages",
+    # Lore, world state, long-term memory, summaries
+    "create_story_card", "get_story_cards", "get_story_cards_version", "search_story_cards_by_keyword",
+    "get_world_state_map", "set_world_states",
+    "add_memory_vectors", "get_memory_vectors",
+    "upsert_story_summary", "get_last_story_summary", "get_story_summaries",
+    # Presets
+    "load_preset_catalog", "get_preset_catalog",
+    # Warm pool
+    "add_pooled_session", "claim_pooled_session", "count_pooled_sessions", "try_advisory_lock",
+    "try_lease",
+)
+
+BACKENDS = ("postgres", "sqlite", "memory")
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(name: str, **options):
+    """Backend baru berdasarkan nama; options diteruskan ke constructor (mis. path untuk sqlite)"""
+    if name == "postgres":
+        from app.db.storage.postgres import PostgresStorage
+        return PostgresStorage()
+    if name == "sqlite":
+        from app.db.storage.sqlite import SQLiteStorage
+        if "path" not in options:
+            from app.core.config import get_settings
+            options["path"] = get_settings().SQLITE_PATH
+        return SQLiteStorage(**options)
+    if name == "memory":
+        from app.db.storage.memory import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {name!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def get_storage():
+    """Backend sesuai STORAGE_BACKEND (satu per proses)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                from app.core.config import get_settings
+                _storage = create_storage(get_settings().STORAGE_BACKEND)
+    return _storage
@@ -0,0 +1,304 @@
+"""
+Interface storage backend + logika bersama backend embedded (sqlite, memory).
+
+Setiap method punya nama, signature dan format hasil yang sama dengan fungsi
+di app.db.database (lihat app.db.storage.OPERATIONS), termasuk
+SessionConflict untuk turn yang kalah dan format pesan "legacy".
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from app.db import database
+from app.db.presets import PresetCatalog
+
+INIT_SQL = os.path.join(os.path.dirname(os.path.dirname(__file__)), "init.sql")
+
+# Satu baris VALUES game_presets di init.sql: ('RACE', 'Human', 'human', '...', '{...}', 'user')
+_PRESET_ROW_RE = re.compile(r"\(\s*" + r",\s*".join([r"'((?:[^']|'')*)'"] * 6) + r"\s*\)")
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def load_seed_presets() -> List[Dict[str, Any]]:
+    """
+    Baris game_presets dari INSERT di init.sql (sumber data yang sama dengan
+    Postgres), urut (category, id) seperti load_preset_catalog sehingga ETag
+    /presets sama di semua backend.
+    """
+    with open(INIT_SQL, encoding="utf-8") as f:
+        sql = f.read()
+    rows = []
+    for match in _PRESET_ROW_RE.finditer(sql):
+        category, label, value, description, base_stats, icon_key = (
+            field.replace("''", "'") for field in match.groups())
+        rows.append({
+            "id": len(rows) + 1,
+            "category": category,
+            "label": label,
+            "value": value,
+            "description": description,
+            "base_stats": json.loads(base_stats),
+            "icon_key": icon_key
+        })
+    return sorted(rows, key=lambda row: (row["category"], row["id"]))
+
+
+def split_updates(changes: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, int]]:
+    """
+    kwargs update_session / commit_turn -> (field session, field character,
+    inventory diff), dengan key format lama. Key lain (mis. location) diabaikan,
+    sama seperti di Postgres.
+    """
+    session = {key: changes[key] for key, _ in database.SESSION_UPDATE_COLUMNS if key in changes}
+    character = {column: changes[column] for column in database.CHARACTER_UPDATE_COLUMNS if column in changes}
+    return session, character, dict(changes.get("inventory_diff") or {})
+
+
+def apply_inventory_diff(inventory: Dict[str, int], diff: Dict[str, int]):
+    """{item: quantity baru}; quantity <= 0 menghapus item (in-place)"""
+    for name, quantity in diff.items():
+        if quantity > 0:
+            inventory[name] = quantity
+        else:
+            inventory.pop(name, None)
+
+
+class StorageBackend(ABC):
+    """
+    Interface storage. Method abstract wajib diimplementasikan setiap backend
+    (backend yang belum lengkap gagal saat dibuat, bukan di tengah request);
+    method yang tidak di-override backend embedded (snapshot, cache, preset
+    catalog, advisory lock per proses) diisi di sini.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.turn_metrics = {"commits": 0, "lock_busy": 0, "version_conflicts": 0}
+        self._metrics_lock = threading.Lock()
+        self._preset_catalog: Optional[PresetCatalog] = None
+        self._advisory_locks: Dict[int, threading.Lock] = {}
+        self._leases: Dict[str, tuple] = {}
+        self._lease_lock = threading.Lock()
+
+    # ==================== LIFECYCLE & STATS ====================
+
+    def wait_for_database(self, timeout: float):
+        """Startup: buka storage (buat skema jika perlu)"""
+        return self
+
+    def check_database(self, timeout: float = 1.0) -> bool:
+        return True
+
+    def close_connection_pool(self):
+        pass
+
+    def start_cache_listener(self):
+        """Backend embedded tidak memakai session cache (baca sudah dalam proses)"""
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return {"enabled": False, "backend": self.name}
+
+    def _count_turn(self, outcome: str):
+        with self._metrics_lock:
+            self.turn_metrics[outcome] += 1
+
+    def get_turn_lock_stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            stats = dict(self.turn_metrics)
+        attempts = stats["commits"] + stats["lock_busy"] + stats["version_conflicts"]
+        stats["lock_busy_rate"] = round(stats["lock_busy"] / attempts, 4) if attempts else 0.0
+        stats["conflict_rate"] = round(stats["version_conflicts"] / attempts, 4) if attempts else 0.0
+        return stats
+
+    # ==================== SESSION ====================
+
+    @abstractmethod
+    def create_session(self, session_id: str, location: str = "Dark Cave Entrance",
+                       inventory: Dict[str, int] = None, character: Dict[str, Any] = None,
+                       opening: str = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_session_version(self, session_id: str) -> Optional[tuple]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_session(self, session_id: str, expected_version: int = None, **kwargs) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def commit_turn(self, session_id: str, expected_version: int, action: str, narrative: str,
+                    **changes) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def save_snapshot(self, session_id: str) -> bool:
+        # Snapshot belum diimplementasikan di skema baru (sama seperti Postgres)
+        return True
+
+    def restore_last_snapshot(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    @abstractmethod
+    def count_idle_sessions(self, ttl_hours: float) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def purge_idle_sessions(self, ttl_hours: float, batch_size: int) -> List[str]:
+        raise NotImplementedError
+
+    # ==================== CHAT HISTORY ====================
+
+    @abstractmethod
+    def get_chat_history(self, session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_messages(self, session_id: str, limit: int = 15) -> List[Dict[str, Any]]:
+        return [database._to_legacy_message(msg) for msg in self.get_chat_history(session_id, limit)]
+
+    def get_all_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        return [database._to_legacy_message(msg) for msg in self.get_all_chat_history(session_id)]
+
+    @abstractmethod
+    def get_message_count(self, session_id: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def archive_old_messages(self, session_id: str, keep_last: int = 10,
+                             max_turn_order: Optional[int] = None) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_archived_messages(self, session_id: str, after_turn_order: int = 0,
+                               batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    # ==================== LORE & WORLD STATE ====================
+
+    @abstractmethod
+    def create_story_card(self, session_id: str, title: str, card_type: str,
+                          description: str, keys: List[str] = None,
+                          once_only: bool = False) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_story_cards(self, session_id: str, card_type: str = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_story_cards_version(self, session_id: str) -> tuple:
+        raise NotImplementedError
+
+    @abstractmethod
+    def search_story_cards_by_keyword(self, session_id: str, keyword: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_world_state_map(self, session_id: str) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_world_states(self, session_id: str, states: Dict[str, Dict],
+                         related_card_ids: Dict[str, str] = None) -> int:
+        raise NotImplementedError
+
+    # ==================== MEMORY & SUMMARIES ====================
+
+    @abstractmethod
+    def add_memory_vectors(self, session_id: str, rows: List[tuple]) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_memory_vectors(self, session_id: str, after_turn_order: int = 0) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_story_summary(self, session_id: str, level: str, idx: int, content: str,
+                             child_count: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_last_story_summary(self, session_id: str, level: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_story_summaries(self, session_id: str, level: str, min_idx: int,
+                            max_idx: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    # ==================== PRESETS ====================
+
+    def _load_presets(self) -> List[Dict[str, Any]]:
+        return load_seed_presets()
+
+    def load_preset_catalog(self) -> PresetCatalog:
+        self._preset_catalog = PresetCatalog(self._load_presets())
+        print(f"✅ Preset catalog loaded ({len(self._preset_catalog.rows)} presets, {self.name})")
+        return self._preset_catalog
+
+    def get_preset_catalog(self) -> PresetCatalog:
+        return self._preset_catalog or self.load_preset_catalog()
+
+    # ==================== WARM POOL ====================
+
+    @abstractmethod
+    def add_pooled_session(self, session_id: str, pool_key: str, inventory: Dict[str, int],
+                           character: Dict[str, Any], opening: str, payload: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_pooled_session(self, pool_key: str, player_name: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_pooled_sessions(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    @contextmanager
+    def try_advisory_lock(self, key: int) -> Iterator[bool]:
+        """Lock non-blocking per proses; yield True jika lock didapat"""
+        lock = self._advisory_locks.setdefault(key, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+    @contextmanager
+    def try_lease(self, key: str, ttl_seconds: float) -> Iterator[bool]:
+        """Lease non-blocking per proses (kedaluwarsa setelah ttl_seconds); yield True jika didapat"""
+        token = object()
+        with self._lease_lock:
+            lease = self._leases.get(key)
+            acquired = lease is None or lease[0] <= time.monotonic()
+            if acquired:
+                self._leases[key] = (time.monotonic() + ttl_seconds, token)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with self._lease_lock:
+                    if self._leases.get(key, (None, None))[1] is token:
+                        del self._leases[key]
@@ -0,0 +1,353 @@
+"""
+Storage backend in-memory: semua data di dict dalam proses, satu RLock.
+
+Untuk test, demo dan benchmark: tidak butuh server database, latency per
+operasi dalam orde mikrodetik. Data hilang saat proses berhenti dan tidak
+dibagi antar worker (jalankan dengan SERVER_WORKERS=1).
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional, List, Dict, Any, Iterator
+from uuid import uuid4
+
+from app.db import database
+from app.db.storage.base import StorageBackend, split_updates, apply_inventory_diff, utcnow
+
+CHARACTER_FIELDS = ["name", "race", "job_class", "background"]
+
+
+class MemoryStorage(StorageBackend):
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        # session_id -> {"state": format get_session, "character": {...}, "created_at": datetime}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._messages: Dict[str, List[Dict[str, Any]]] = {}
+        self._archive: Dict[str, List[Dict[str, Any]]] = {}
+        self._cards: Dict[str, List[Dict[str, Any]]] = {}
+        self._world: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._vectors: Dict[str, List[Dict[str, Any]]] = {}
+        self._summaries: Dict[str, Dict[tuple, Dict[str, Any]]] = {}
+        self._pool: Dict[str, "OrderedDict[str, Any]"] = {}  # pool_key -> {session_id: payload}
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.name, "sessions": len(self._sessions),
+                    "messages": sum(len(rows) for rows in self._messages.values())}
+
+    # ==================== SESSION ====================
+
+    @staticmethod
+    def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Salinan state agar pemanggil tidak bisa mengubah data tersimpan"""
+        session = dict(state)
+        session["inventory"] = dict(state["inventory"])
+        session["game_variables"] = copy.deepcopy(state["game_variables"])
+        session["active_quests"] = list(state["active_quests"])
+        session["completed_quests"] = list(state["completed_quests"])
+        return session
+
+    def _insert_session(self, session_id: str, inventory: Dict[str, int],
+                        character: Dict[str, Any], opening: Optional[str]) -> Dict[str, Any]:
+        if session_id in self._sessions:
+            raise ValueError(f"Session {session_id} already exists")
+        now = utcnow()
+        state = database.new_session_state(session_id, inventory, character)
+        state["updated_at"] = now
+        stats = character.get("stats") or {}
+        details = {field: character.get(field) for field in CHARACTER_FIELDS}
+        details["name"] = details["name"] or "Adventurer"
+        details.update({column: stats[column] for column in database.CHARACTER_STAT_COLUMNS if column in stats})
+        self._sessions[session_id] = {"state": state, "character": details, "created_at": now}
+        self._messages[session_id] = []
+        if opening is not None:
+            self._append_message(session_id, "assistant", opening, now)
+        return state
+
+    def create_session(self, session_id: str, location: str = "Dark Cave Entrance",
+                       inventory: Dict[str, int] = None, character: Dict[str, Any] = None,
+                       opening: str = None) -> Dict[str, Any]:
+        inventory = {name: qty for name, qty in (inventory or {"Rusty Sword": 1}).items() if qty > 0}
+        with self._lock:
+            state = self._insert_session(session_id, inventory, character or {}, opening)
+            return self._copy_state(state)
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._sessions.get(session_id)
+            return self._copy_state(record["state"]) if record else None
+
+    def get_session_version(self, session_id: str) -> Optional[tuple]:
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return None
+            messages = self._messages.get(session_id)
+            last_seq = messages[-1]["turn_order"] if messages else 0
+            return (record["state"]["turn_count"], record["state"]["updated_at"], last_seq)
+
+    def _apply_updates(self, session_id: str, changes: Dict[str, Any],
+                       expected_version: Optional[int]):
+        """Sama seperti database._apply_session_updates (dipanggil dengan self._lock); True jika berubah"""
+        session_changes, character_changes, inventory_changes = split_updates(changes)
+        record = self._sessions.get(session_id)
+        versioned = expected_version is not None
+        if versioned and (record is None or record["state"]["version"] != expected_version):
+            self._count_turn("version_conflicts")
+            raise database.SessionConflict("Session was modified by another action, reload and try again")
+        if record is None or not (session_changes or character_changes or inventory_changes or versioned):
+            return False
+
+        state = record["state"]
+        if "game_variables" in session_changes:
+            session_changes["game_variables"] = copy.deepcopy(session_changes["game_variables"])
+        state.update(session_changes)
+        state.update(character_changes)
+        record["character"].update(character_changes)
+        apply_inventory_diff(state["inventory"], inventory_changes)
+        state["updated_at"] = utcnow()
+        if versioned:
+            state["version"] += 1
+        return True
+
+    def update_session(self, session_id: str, expected_version: int = None, **kwargs) -> bool:
+        with self._lock:
+            return self._apply_updates(session_id, kwargs, expected_version)
+
+    def commit_turn(self, session_id: str, expected_version: int, action: str, narrative: str,
+                    **changes) -> Dict[str, int]:
+        with self._lock:
+            self._apply_updates(session_id, changes, expected_version)
+            now = utcnow()
+            user = self._append_message(session_id, "user", action, now)
+            assistant = self._append_message(session_id, "assistant", narrative, now)
+            version = self._sessions[session_id]["state"]["version"]
+        self._count_turn("commits")
+        return {"user_seq": user["turn_order"], "assistant_seq": assistant["turn_order"],
+                "version": version}
+
+    def _idle_sessions(self, ttl_hours: float) -> List[tuple]:
+        cutoff = utcnow() - timedelta(hours=ttl_hours)
+        return sorted((record["state"]["updated_at"], session_id)
+                      for session_id, record in self._sessions.items()
+                      if record["state"]["updated_at"] < cutoff)
+
+    def count_idle_sessions(self, ttl_hours: float) -> Dict[str, Any]:
+        with self._lock:
+            idle = self._idle_sessions(ttl_hours)
+        return {"idle_sessions": len(idle), "oldest_updated_at": idle[0][0] if idle else None}
+
+    def purge_idle_sessions(self, ttl_hours: float, batch_size: int) -> List[str]:
+        with self._lock:
+            purged = [session_id for _, session_id in self._idle_sessions(ttl_hours)[:batch_size]]
+            for session_id in purged:
+                self._delete_session(session_id)
+        return purged
+
+    def _delete_session(self, session_id: str):
+        """Hapus session beserta semua data turunannya (seperti ON DELETE CASCADE)"""
+        self._sessions.pop(session_id, None)
+        for table in (self._messages, self._archive, self._cards, self._world,
+                      self._vectors, self._summaries):
+            table.pop(session_id, None)
+        for pooled in self._pool.values():
+            pooled.pop(session_id, None)
+
+    # ==================== CHAT HISTORY ====================
+
+    def _append_message(self, session_id: str, role: str, content: str, created_at) -> Dict[str, Any]:
+        messages = self._messages.setdefault(session_id, [])
+        message = {
+            "id": str(uuid4()),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "created_at": created_at,
+            "turn_order": (messages[-1]["turn_order"] if messages else 0) + 1
+        }
+        messages.append(message)
+        return message
+
+    def get_chat_history(self, session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            messages = self._messages.get(session_id) or []
+            return [dict(msg) for msg in messages[-limit:]] if limit > 0 else []
+
+    def get_all_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(msg) for msg in self._messages.get(session_id) or []]
+
+    def get_all_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [database._to_legacy_message(msg) for msg in self._messages.get(session_id) or []]
+
+    def get_message_count(self, session_id: str) -> int:
+        with self._lock:
+            return len(self._messages.get(session_id) or [])
+
+    def archive_old_messages(self, session_id: str, keep_last: int = 10,
+                             max_turn_order: Optional[int] = None) -> int:
+        with self._lock:
+            messages = self._messages.get(session_id) or []
+            cut = len(messages) - max(keep_last, 0)
+            if max_turn_order is not None:
+                cut = min(cut, sum(1 for msg in messages if msg["turn_order"] <= max_turn_order))
+            if cut <= 0:
+                return 0
+            archived_at = utcnow()
+            moved = [dict(msg, archived_at=archived_at) for msg in messages[:cut]]
+            self._archive.setdefault(session_id, []).extend(moved)
+            del messages[:cut]
+            # ETag (turn_count, updated_at, last seq) harus berubah saat pesan diarsipkan
+            record = self._sessions.get(session_id)
+            if record is not None:
+                record["state"]["updated_at"] = archived_at
+            return len(moved)
+
+    def iter_archived_messages(self, session_id: str, after_turn_order: int = 0,
+                               batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            rows = [msg for msg in self._archive.get(session_id) or [] if msg["turn_order"] > after_turn_order]
+        for row in sorted(rows, key=lambda msg: msg["turn_order"]):
+            yield database._to_legacy_message(row)
+
+    # ==================== LORE & WORLD STATE ====================
+
+    def create_story_card(self, session_id: str, title: str, card_type: str,
+                          description: str, keys: List[str] = None,
+                          once_only: bool = False) -> Dict[str, Any]:
+        card = {
+            "id": str(uuid4()),
+            "session_id": session_id,
+            "title": title,
+            "type": card_type,
+            "description": description,
+            "keys": list(keys or []),
+            "once_only": once_only,
+            "is_active": True,
+            "created_at": utcnow()
+        }
+        with self._lock:
+            self._cards.setdefault(session_id, []).append(card)
+        return dict(card, keys=list(card["keys"]))
+
+    def _active_cards(self, session_id: str) -> List[Dict[str, Any]]:
+        return [card for card in self._cards.get(session_id) or [] if card["is_active"]]
+
+    def get_story_cards(self, session_id: str, card_type: str = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(card, keys=list(card["keys"])) for card in self._active_cards(session_id)
+                    if card_type is None or card["type"] == card_type]
+
+    def get_story_cards_version(self, session_id: str) -> tuple:
+        with self._lock:
+            cards = self._active_cards(session_id)
+            return (len(cards), max((card["created_at"] for card in cards), default=None))
+
+    def search_story_cards_by_keyword(self, session_id: str, keyword: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(card, keys=list(card["keys"])) for card in self._active_cards(session_id)
+                    if keyword in card["keys"]]
+
+    def get_world_state_map(self, session_id: str) -> Dict[str, Dict]:
+        with self._lock:
+            return {key: copy.deepcopy(row["current_state"])
+                    for key, row in (self._world.get(session_id) or {}).items()}
+
+    def set_world_states(self, session_id: str, states: Dict[str, Dict],
+                         related_card_ids: Dict[str, str] = None) -> int:
+        if not states:
+            return 0
+        related_card_ids = related_card_ids or {}
+        now = utcnow()
+        with self._lock:
+            world = self._world.setdefault(session_id, {})
+            for key, state in states.items():
+                previous = world.get(key) or {}
+                world[key] = {
+                    "current_state": copy.deepcopy(state),
+                    "related_card_id": related_card_ids.get(key) or previous.get("related_card_id"),
+                    "updated_at": now
+                }
+        return len(states)
+
+    # ==================== MEMORY & SUMMARIES ====================
+
+    def add_memory_vectors(self, session_id: str, rows: List[tuple]) -> int:
+        if not rows:
+            return 0
+        with self._lock:
+            vectors = self._vectors.setdefault(session_id, [])
+            # Satu embedding per turn, seperti ON CONFLICT DO NOTHING di Postgres/SQLite
+            seen = {row["turn_order"] for row in vectors}
+            added = 0
+            for turn_order, role, content, embedding in rows:
+                if turn_order not in seen:
+                    seen.add(turn_order)
+                    vectors.append({"turn_order": turn_order, "role": role, "content": content,
+                                    "embedding": bytes(embedding)})
+                    added += 1
+        return added
+
+    def get_memory_vectors(self, session_id: str, after_turn_order: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [dict(row) for row in self._vectors.get(session_id) or []
+                    if row["turn_order"] > after_turn_order]
+        return sorted(rows, key=lambda row: row["turn_order"])
+
+    def upsert_story_summary(self, session_id: str, level: str, idx: int, content: str,
+                             child_count: int) -> None:
+        with self._lock:
+            summaries = self._summaries.setdefault(session_id, {})
+            previous = summaries.get((level, idx))
+            summaries[(level, idx)] = {
+                "id": previous["id"] if previous else str(uuid4()),
+                "session_id": session_id,
+                "level": level,
+                "idx": idx,
+                "content": content,
+                "child_count": child_count,
+                "updated_at": utcnow()
+            }
+
+    def get_last_story_summary(self, session_id: str, level: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rows = [row for (row_level, _), row in (self._summaries.get(session_id) or {}).items()
+                    if row_level == level]
+            return dict(max(rows, key=lambda row: row["idx"])) if rows else None
+
+    def get_story_summaries(self, session_id: str, level: str, min_idx: int,
+                            max_idx: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [dict(row) for (row_level, idx), row in (self._summaries.get(session_id) or {}).items()
+                    if row_level == level and min_idx <= idx <= max_idx]
+        return sorted(rows, key=lambda row: row["idx"])
+
+    # ==================== WARM POOL ====================
+
+    def add_pooled_session(self, session_id: str, pool_key: str, inventory: Dict[str, int],
+                           character: Dict[str, Any], opening: str, payload: Dict[str, Any]):
+        with self._lock:
+            self._insert_session(session_id, inventory, character, opening)
+            self._pool.setdefault(pool_key, OrderedDict())[session_id] = copy.deepcopy(payload)
+
+    def claim_pooled_session(self, pool_key: str, player_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            pooled = self._pool.get(pool_key)
+            if not pooled:
+                return None
+            session_id, payload = pooled.popitem(last=False)
+            record = self._sessions[session_id]
+            record["character"]["name"] = player_name or "Adventurer"
+            record["created_at"] = record["state"]["updated_at"] = utcnow()
+            return payload
+
+    def count_pooled_sessions(self) -> Dict[str, int]:
+        with self._lock:
+            return {key: len(pooled) for key, pooled in self._pool.items() if pooled}
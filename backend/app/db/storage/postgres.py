@@ -0,0 +1,32 @@
+"""
+Storage backend Postgres: fungsi asli app.db.database di balik interface
+StorageBackend (dipakai benchmark perbandingan backend; aplikasi tetap
+memanggil app.db.database langsung saat STORAGE_BACKEND=postgres).
+"""
+
+import abc
+
+from app.db import database
+from app.db.storage import OPERATIONS
+from app.db.storage.base import StorageBackend
+
+
+def _bind_database_functions(cls):
+    """Setiap operation = fungsi app.db.database (staticmethod), termasuk method abstract"""
+    for operation in OPERATIONS:
+        setattr(cls, operation, staticmethod(getattr(database, operation)))
+    abc.update_abstractmethods(cls)
+    return cls
+
+
+@_bind_database_functions
+class PostgresStorage(StorageBackend):
+
+    name = "postgres"
+
+    def __init__(self):
+        super().__init__()
+        if database.storage_backend() != "postgres":
+            raise RuntimeError("PostgresStorage requires STORAGE_BACKEND=postgres "
+                               f"(database functions are delegated to {database.storage_backend()})")
+        self.turn_metrics = database.turn_metrics
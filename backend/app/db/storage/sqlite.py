@@ -0,0 +1,750 @@
+"""
+Storage backend SQLite: satu file database, tanpa server.
+
+- WAL + synchronous=NORMAL: pembaca tidak memblok penulis, commit tanpa fsync
+  per transaksi (tetap aman dari crash aplikasi)
+- Satu koneksi per thread; statement di-cache oleh modul sqlite3 (setara
+  prepared statement), sehingga hot path tidak mem-parse SQL ulang
+- Transaksi tulis memakai BEGIN IMMEDIATE: write lock diambil di awal, jadi
+  commit_turn antar thread/worker terserialisasi; version check tetap
+  menentukan pemenang. Lock yang tidak didapat dalam SQLITE_BUSY_TIMEOUT ->
+  PoolTimeout (HTTP 503), sama seperti pool Postgres yang penuh
+- Kolom JSON (game_variables, keys, current_state, base_stats) disimpan
+  sebagai teks yang divalidasi JSON1 (json_valid / json()); pencarian keyword
+  story card memakai json_each
+
+Beberapa worker boleh berbagi satu file (WAL), tetapi semuanya harus berada di
+host yang sama; untuk multi-node tetap gunakan Postgres.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Iterator
+from uuid import uuid4
+
+from app.db import database
+from app.db.pool import PoolTimeout
+from app.db.storage.base import StorageBackend, split_updates, load_seed_presets
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS game_sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    summary TEXT,
+    last_event_trigger TEXT,
+    game_variables TEXT NOT NULL DEFAULT '{}' CHECK (json_valid(game_variables)),
+    turn_count INTEGER NOT NULL DEFAULT 0,
+    is_game_over INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_game_sessions_updated_at ON game_sessions (updated_at);
+
+-- Satu karakter per session (jalur game tidak pernah membuat lebih dari satu)
+CREATE TABLE IF NOT EXISTS characters (
+    session_id TEXT PRIMARY KEY REFERENCES game_sessions(id) ON DELETE CASCADE,
+    name TEXT NOT NULL DEFAULT 'Adventurer',
+    race TEXT,
+    job_class TEXT,
+    background TEXT,
+    level INTEGER DEFAULT 1,
+    exp INTEGER DEFAULT 0,
+    hp INTEGER DEFAULT 100,
+    max_hp INTEGER DEFAULT 100,
+    mana INTEGER DEFAULT 50,
+    max_mana INTEGER DEFAULT 50,
+    gold INTEGER DEFAULT 0,
+    str INTEGER DEFAULT 10,
+    dex INTEGER DEFAULT 10,
+    con INTEGER DEFAULT 10,
+    "int" INTEGER DEFAULT 10,
+    wis INTEGER DEFAULT 10,
+    cha INTEGER DEFAULT 10
+) WITHOUT ROWID;
+
+-- rowid = urutan item ditambahkan (ON CONFLICT DO UPDATE mempertahankannya)
+CREATE TABLE IF NOT EXISTS inventory_items (
+    session_id TEXT NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    item_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (session_id, item_name)
+);
+
+CREATE TABLE IF NOT EXISTS quests (
+    session_id TEXT NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    started_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quests_session ON quests (session_id, status);
+
+CREATE TABLE IF NOT EXISTS chat_history (
+    session_id TEXT NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    turn_order INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, turn_order)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS chat_history_archive (
+    session_id TEXT NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    turn_order INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL,
+    archived_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_history_archive_session ON chat_history_archive (session_id, turn_order);
+
+CREATE TABLE IF NOT EXISTS story_cards (
+    id TEXT PRIMARY KEY,
+    session_id TEXT REFERENCES game_sessions(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    type TEXT,
+    description TEXT NOT NULL,
+    keys TEXT NOT NULL DEFAULT '[]' CHECK (json_valid(keys)),
+    once_only INTEGER NOT NULL DEFAULT 0,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_story_cards_session ON story_cards (session_id) WHERE is_active = 1;
+
+CREATE TABLE IF NOT EXISTS world_state (
+    session_id TEXT NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    entity_key TEXT NOT NULL,
+    related_card_id TEXT,
+    current_state TEXT NOT NULL CHECK (json_valid(current_state)),
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (session_id, entity_key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS memory_vectors (
+    session_id TEXT NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    turn_order INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+-- Satu embedding per turn (lihat migrasi Postgres 0010); file lama dibersihkan dulu
+DELETE FROM memory_vectors WHERE rowid NOT IN (
+    SELECT MIN(rowid) FROM memory_vectors GROUP BY session_id, turn_order
+);
+DROP INDEX IF EXISTS idx_memory_vectors_session;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_memory_vectors_turn ON memory_vectors (session_id, turn_order);
+
+CREATE TABLE IF NOT EXISTS story_summaries (
+    session_id TEXT NOT NULL REFERENCES game_sessions(id) ON DELETE CASCADE,
+    level TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    content TEXT NOT NULL,
+    child_count INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (session_id, level, idx)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS game_presets (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    label TEXT NOT NULL,
+    value TEXT NOT NULL,
+    description TEXT,
+    base_stats TEXT NOT NULL DEFAULT '{}' CHECK (json_valid(base_stats)),
+    icon_key TEXT
+);
+
+CREATE TABLE IF NOT EXISTS session_pool (
+    session_id TEXT PRIMARY KEY REFERENCES game_sessions(id) ON DELETE CASCADE,
+    pool_key TEXT NOT NULL,
+    payload TEXT NOT NULL CHECK (json_valid(payload)),
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_pool_key ON session_pool (pool_key, created_at);
+
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+SESSION_COLUMNS = dict(database.SESSION_UPDATE_COLUMNS)
+
+
+def _dt(ts: Optional[float]) -> Optional[datetime]:
+    """Epoch (REAL) -> datetime UTC, format yang sama dengan TIMESTAMPTZ dari psycopg2"""
+    return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else None
+
+
+def _row_dict(row: sqlite3.Row, *timestamps: str) -> Dict[str, Any]:
+    data = dict(row)
+    for column in timestamps:
+        data[column] = _dt(data[column])
+    return data
+
+
+class SQLiteStorage(StorageBackend):
+
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        super().__init__()
+        if path == ":memory:":
+            raise ValueError('SQLite ":memory:" is per connection, use STORAGE_BACKEND=memory instead')
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self.metrics = {"transactions": 0, "busy_timeouts": 0}
+
+    # ==================== CONNECTION ====================
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=check_same_thread, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Koneksi milik thread ini (dibuat + skema disiapkan saat pertama dipakai)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not self._initialized:
+                self.wait_for_database(self.busy_timeout)
+            conn = self._connect()
+            self._local.conn = conn
+            with self._init_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transaksi tulis (BEGIN IMMEDIATE); write lock sibuk terlalu lama -> PoolTimeout"""
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            self.metrics["busy_timeouts"] += 1
+            raise PoolTimeout(f"SQLite database is busy: {e}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self.metrics["transactions"] += 1
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[sqlite3.Connection]:
+        """Read transaction: beberapa SELECT melihat snapshot yang sama"""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    # ==================== LIFECYCLE & STATS ====================
+
+    def wait_for_database(self, timeout: float):
+        """Startup: buat skema + isi game_presets dari init.sql (idempotent)"""
+        with self._init_lock:
+            if self._initialized:
+                return self
+            conn = self._connect()
+            try:
+                conn.executescript(SCHEMA)
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT COUNT(*) FROM game_presets").fetchone()[0] == 0:
+                    conn.executemany("""
+                        INSERT INTO game_presets (id, category, label, value, description, base_stats, icon_key)
+                        VALUES (?, ?, ?, ?, ?, json(?), ?)
+                    """, [(row["id"], row["category"], row["label"], row["value"], row["description"],
+                           json.dumps(row["base_stats"]), row["icon_key"]) for row in load_seed_presets()])
+                conn.execute("COMMIT")
+                version = sqlite3.sqlite_version
+            finally:
+                conn.close()
+            self._initialized = True
+        print(f"✅ SQLite storage ready at {self.path} (SQLite {version}, WAL)")
+        return self
+
+    def check_database(self, timeout: float = 1.0) -> bool:
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close_connection_pool(self):
+        with self._init_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # Milik thread lain; ditutup saat thread/proses selesai
+        self._local = threading.local()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "connections": len(self._connections),
+            **self.metrics
+        }
+
+    # ==================== SESSION ====================
+
+    def _insert_session(self, conn: sqlite3.Connection, session_id: str, inventory: Dict[str, int],
+                        character: Dict[str, Any], opening: Optional[str]) -> float:
+        now = time.time()
+        conn.execute("""
+            INSERT INTO game_sessions (id, created_at, updated_at, summary) VALUES (?, ?, ?, ?)
+        """, (session_id, now, now, database.NEW_SESSION_SUMMARY))
+
+        stats = character.get("stats") or {}
+        columns = ["session_id", "name", "race", "job_class", "background"]
+        values = [session_id, character.get("name") or "Adventurer", character.get("race"),
+                  character.get("job_class"), character.get("background")]
+        for column in database.CHARACTER_STAT_COLUMNS:
+            if column in stats:
+                columns.append(f'"{column}"')
+                values.append(stats[column])
+        conn.execute(f"INSERT INTO characters ({', '.join(columns)}) VALUES ({', '.join('?' * len(values))})",
+                     values)
+
+        conn.executemany("INSERT INTO inventory_items (session_id, item_name, quantity) VALUES (?, ?, ?)",
+                         [(session_id, name, quantity) for name, quantity in inventory.items()])
+        if opening is not None:
+            conn.execute("""
+                INSERT INTO chat_history (session_id, turn_order, id, role, content, created_at)
+                VALUES (?, 1, ?, 'assistant', ?, ?)
+            """, (session_id, str(uuid4()), opening, now))
+        return now
+
+    def create_session(self, session_id: str, location: str = "Dark Cave Entrance",
+                       inventory: Dict[str, int] = None, character: Dict[str, Any] = None,
+                       opening: str = None) -> Dict[str, Any]:
+        inventory = {name: qty for name, qty in (inventory or {"Rusty Sword": 1}).items() if qty > 0}
+        character = character or {}
+        with self._transaction() as conn:
+            updated_at = self._insert_session(conn, session_id, inventory, character, opening)
+        session = database.new_session_state(session_id, inventory, character)
+        session["updated_at"] = _dt(updated_at)
+        return session
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._snapshot() as conn:
+            row = conn.execute("""
+                SELECT s.id, s.turn_count, s.game_variables, s.summary, s.last_event_trigger,
+                       s.is_game_over, s.version, s.updated_at, c.hp, c.max_hp, c.level, c.exp
+                FROM game_sessions s LEFT JOIN characters c ON c.session_id = s.id
+                WHERE s.id = ?
+            """, (session_id,)).fetchone()
+            if row is None:
+                return None
+            inventory = dict(conn.execute("""
+                SELECT item_name, quantity FROM inventory_items
+                WHERE session_id = ? AND quantity > 0 ORDER BY rowid
+            """, (session_id,)).fetchall())
+            quests = conn.execute("""
+                SELECT title, status FROM quests
+                WHERE session_id = ? AND status IN ('active', 'completed') ORDER BY started_at
+            """, (session_id,)).fetchall()
+
+        has_character = row["hp"] is not None
+        return {
+            "id": row["id"],
+            "hp": row["hp"] if has_character else 100,
+            "max_hp": row["max_hp"] if has_character else 100,
+            "inventory": inventory,
+            "location": "Unknown",  # Not in new schema
+            "level": row["level"] if has_character else 1,
+            "exp": row["exp"] if has_character else 0,
+            "turn_count": row["turn_count"],
+            "game_variables": json.loads(row["game_variables"]) if row["game_variables"] else {},
+            "active_quests": [quest["title"] for quest in quests if quest["status"] == "active"],
+            "completed_quests": [quest["title"] for quest in quests if quest["status"] == "completed"],
+            "summary": row["summary"],
+            "last_event_trigger": row["last_event_trigger"],
+            "game_over": bool(row["is_game_over"]),
+            "version": row["version"],
+            "updated_at": _dt(row["updated_at"])
+        }
+
+    def get_session_version(self, session_id: str) -> Optional[tuple]:
+        row = self._connection().execute("""
+            SELECT s.turn_count, s.updated_at,
+                   COALESCE((SELECT MAX(turn_order) FROM chat_history c WHERE c.session_id = s.id), 0)
+            FROM game_sessions s WHERE s.id = ?
+        """, (session_id,)).fetchone()
+        return (row[0], _dt(row[1]), row[2]) if row else None
+
+    def _apply_updates(self, conn: sqlite3.Connection, session_id: str, changes: Dict[str, Any],
+                       expected_version: Optional[int]) -> Optional[int]:
+        """Sama seperti database._apply_session_updates (dalam transaksi pemanggil); return version"""
+        session_changes, character_changes, inventory_changes = split_updates(changes)
+        versioned = expected_version is not None
+        if not (session_changes or character_changes or inventory_changes or versioned):
+            return None
+
+        sets, values = [], []
+        for key, value in session_changes.items():
+            column = SESSION_COLUMNS[key]
+            if isinstance(value, dict):
+                sets.append(f"{column} = json(?)")
+                values.append(json.dumps(value))
+            else:
+                sets.append(f"{column} = ?")
+                values.append(value)
+        sets.append("updated_at = ?")
+        values.append(time.time())
+        condition = "id = ?"
+        values.append(session_id)
+        if versioned:
+            sets.append("version = version + 1")
+            condition += " AND version = ?"
+            values.append(expected_version)
+
+        cursor = conn.execute(f"UPDATE game_sessions SET {', '.join(sets)} WHERE {condition}", values)
+        if cursor.rowcount == 0:
+            if versioned:
+                raise database.SessionConflict("Session was modified by another action, reload and try again")
+            return None
+
+        if character_changes:
+            conn.execute(f"UPDATE characters SET {', '.join(f'{column} = ?' for column in character_changes)} "
+                         f"WHERE session_id = ?", [*character_changes.values(), session_id])
+
+        if inventory_changes:
+            conn.executemany("""
+                INSERT INTO inventory_items (session_id, item_name, quantity) VALUES (?, ?, ?)
+                ON CONFLICT (session_id, item_name) DO UPDATE SET quantity = excluded.quantity
+            """, [(session_id, name, quantity) for name, quantity in inventory_changes.items() if quantity > 0])
+            conn.executemany("DELETE FROM inventory_items WHERE session_id = ? AND item_name = ?",
+                             [(session_id, name) for name, quantity in inventory_changes.items() if quantity <= 0])
+
+        row = conn.execute("SELECT version FROM game_sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def update_session(self, session_id: str, expected_version: int = None, **kwargs) -> bool:
+        try:
+            with self._transaction() as conn:
+                version = self._apply_updates(conn, session_id, kwargs, expected_version)
+        except database.SessionConflict:
+            self._count_turn("version_conflicts")
+            raise
+        return version is not None
+
+    def commit_turn(self, session_id: str, expected_version: int, action: str, narrative: str,
+                    **changes) -> Dict[str, int]:
+        try:
+            with self._transaction() as conn:
+                version = self._apply_updates(conn, session_id, changes, expected_version)
+                last = conn.execute("SELECT COALESCE(MAX(turn_order), 0) FROM chat_history WHERE session_id = ?",
+                                    (session_id,)).fetchone()[0]
+                now = time.time()
+                conn.executemany("""
+                    INSERT INTO chat_history (session_id, turn_order, id, role, content, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [(session_id, last + 1, str(uuid4()), "user", action, now),
+                      (session_id, last + 2, str(uuid4()), "assistant", narrative, now)])
+        except database.SessionConflict:
+            self._count_turn("version_conflicts")
+            raise
+        self._count_turn("commits")
+        return {"user_seq": last + 1, "assistant_seq": last + 2, "version": version}
+
+    def count_idle_sessions(self, ttl_hours: float) -> Dict[str, Any]:
+        count, oldest = self._connection().execute("""
+            SELECT COUNT(*), MIN(updated_at) FROM game_sessions WHERE updated_at < ?
+        """, (time.time() - ttl_hours * 3600,)).fetchone()
+        return {"idle_sessions": count, "oldest_updated_at": _dt(oldest)}
+
+    def purge_idle_sessions(self, ttl_hours: float, batch_size: int) -> List[str]:
+        with self._transaction() as conn:
+            purged = [row[0] for row in conn.execute("""
+                SELECT id FROM game_sessions WHERE updated_at < ? ORDER BY updated_at LIMIT ?
+            """, (time.time() - ttl_hours * 3600, batch_size)).fetchall()]
+            conn.executemany("DELETE FROM game_sessions WHERE id = ?", [(session_id,) for session_id in purged])
+        return purged
+
+    # ==================== CHAT HISTORY ====================
+
+    def get_chat_history(self, session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self._connection().execute("""
+            SELECT id, session_id, role, content, created_at, turn_order FROM chat_history
+            WHERE session_id = ? ORDER BY turn_order DESC LIMIT ?
+        """, (session_id, limit)).fetchall()
+        return [_row_dict(row, "created_at") for row in reversed(rows)]
+
+    def get_all_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
+        rows = self._connection().execute("""
+            SELECT id, session_id, role, content, created_at, turn_order FROM chat_history
+            WHERE session_id = ? ORDER BY turn_order ASC
+        """, (session_id,)).fetchall()
+        return [_row_dict(row, "created_at") for row in rows]
+
+    def get_all_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        rows = self._connection().execute("""
+            SELECT turn_order, role, content FROM chat_history WHERE session_id = ? ORDER BY turn_order ASC
+        """, (session_id,)).fetchall()
+        return [database._to_legacy_message(row) for row in rows]
+
+    def get_message_count(self, session_id: str) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM chat_history WHERE session_id = ?",
+                                          (session_id,)).fetchone()[0]
+
+    def archive_old_messages(self, session_id: str, keep_last: int = 10,
+                             max_turn_order: Optional[int] = None) -> int:
+        with self._transaction() as conn:
+            threshold = conn.execute("""
+                SELECT turn_order FROM chat_history WHERE session_id = ?
+                ORDER BY turn_order DESC LIMIT 1 OFFSET ?
+            """, (session_id, keep_last)).fetchone()
+            if threshold is None:
+                return 0
+            threshold = threshold[0] if max_turn_order is None else min(threshold[0], max_turn_order)
+            now = time.time()
+            conn.execute("""
+                INSERT INTO chat_history_archive (session_id, turn_order, id, role, content, created_at, archived_at)
+                SELECT session_id, turn_order, id, role, content, created_at, ? FROM chat_history
+                WHERE session_id = ? AND turn_order <= ?
+            """, (now, session_id, threshold))
+            archived = conn.execute("DELETE FROM chat_history WHERE session_id = ? AND turn_order <= ?",
+                                    (session_id, threshold)).rowcount
+            # ETag (turn_count, updated_at, last seq) harus berubah saat pesan diarsipkan
+            conn.execute("UPDATE game_sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+            return archived
+
+    def iter_archived_messages(self, session_id: str, after_turn_order: int = 0,
+                               batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        # Koneksi sendiri: StreamingResponse bisa melanjutkan generator dari thread lain
+        conn = self._connect(check_same_thread=False)
+        try:
+            cursor = conn.execute("""
+                SELECT role, content, turn_order FROM chat_history_archive
+                WHERE session_id = ? AND turn_order > ? ORDER BY turn_order ASC
+            """, (session_id, after_turn_order))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield database._to_legacy_message(row)
+        finally:
+            conn.close()
+
+    # ==================== LORE & WORLD STATE ====================
+
+    @staticmethod
+    def _card(row: sqlite3.Row) -> Dict[str, Any]:
+        card = _row_dict(row, "created_at")
+        card["keys"] = json.loads(card["keys"])
+        card["once_only"] = bool(card["once_only"])
+        card["is_active"] = bool(card["is_active"])
+        return card
+
+    def create_story_card(self, session_id: str, title: str, card_type: str,
+                          description: str, keys: List[str] = None,
+                          once_only: bool = False) -> Dict[str, Any]:
+        card_id = str(uuid4())
+        with self._transaction() as conn:
+            conn.execute("""
+                INSERT INTO story_cards (id, session_id, title, type, description, keys, once_only, created_at)
+                VALUES (?, ?, ?, ?, ?, json(?), ?, ?)
+            """, (card_id, session_id, title, card_type, description, json.dumps(keys or []),
+                  int(once_only), time.time()))
+            row = conn.execute("SELECT * FROM story_cards WHERE id = ?", (card_id,)).fetchone()
+        return self._card(row)
+
+    def get_story_cards(self, session_id: str, card_type: str = None) -> List[Dict[str, Any]]:
+        if card_type:
+            rows = self._connection().execute("""
+                SELECT * FROM story_cards WHERE session_id = ? AND type = ? AND is_active = 1
+            """, (session_id, card_type)).fetchall()
+        else:
+            rows = self._connection().execute("""
+                SELECT * FROM story_cards WHERE session_id = ? AND is_active = 1
+            """, (session_id,)).fetchall()
+        return [self._card(row) for row in rows]
+
+    def get_story_cards_version(self, session_id: str) -> tuple:
+        count, latest = self._connection().execute("""
+            SELECT COUNT(*), MAX(created_at) FROM story_cards WHERE session_id = ? AND is_active = 1
+        """, (session_id,)).fetchone()
+        return (count, _dt(latest))
+
+    def search_story_cards_by_keyword(self, session_id: str, keyword: str) -> List[Dict[str, Any]]:
+        rows = self._connection().execute("""
+            SELECT * FROM story_cards
+            WHERE session_id = ? AND is_active = 1
+              AND EXISTS (SELECT 1 FROM json_each(story_cards.keys) WHERE json_each.value = ?)
+        """, (session_id, keyword)).fetchall()
+        return [self._card(row) for row in rows]
+
+    def get_world_state_map(self, session_id: str) -> Dict[str, Dict]:
+        rows = self._connection().execute("""
+            SELECT entity_key, current_state FROM world_state WHERE session_id = ?
+        """, (session_id,)).fetchall()
+        return {key: json.loads(state) for key, state in rows}
+
+    def set_world_states(self, session_id: str, states: Dict[str, Dict],
+                         related_card_ids: Dict[str, str] = None) -> int:
+        if not states:
+            return 0
+        related_card_ids = related_card_ids or {}
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("""
+                INSERT INTO world_state (session_id, entity_key, current_state, related_card_id, updated_at)
+                VALUES (?, ?, json(?), ?, ?)
+                ON CONFLICT (session_id, entity_key)
+                DO UPDATE SET current_state = excluded.current_state,
+                              related_card_id = COALESCE(excluded.related_card_id, world_state.related_card_id),
+                              updated_at = excluded.updated_at
+            """, [(session_id, key, json.dumps(state), related_card_ids.get(key), now)
+                  for key, state in states.items()])
+        return len(states)
+
+    # ==================== MEMORY & SUMMARIES ====================
+
+    def add_memory_vectors(self, session_id: str, rows: List[tuple]) -> int:
+        if not rows:
+            return 0
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.executemany("""
+                INSERT INTO memory_vectors (session_id, turn_order, role, content, embedding, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (session_id, turn_order) DO NOTHING
+            """, [(session_id, turn_order, role, content, bytes(embedding), now)
+                  for turn_order, role, content, embedding in rows])
+        return cursor.rowcount
+
+    def get_memory_vectors(self, session_id: str, after_turn_order: int = 0) -> List[Dict[str, Any]]:
+        rows = self._connection().execute("""
+            SELECT turn_order, role, content, embedding FROM memory_vectors
+            WHERE session_id = ? AND turn_order > ? ORDER BY turn_order ASC
+        """, (session_id, after_turn_order)).fetchall()
+        return [dict(row) for row in rows]
+
+    def upsert_story_summary(self, session_id: str, level: str, idx: int, content: str,
+                             child_count: int) -> None:
+        with self._transaction() as conn:
+            conn.execute("""
+                INSERT INTO story_summaries (session_id, level, idx, id, content, child_count, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (session_id, level, idx)
+                DO UPDATE SET content = excluded.content, child_count = excluded.child_count,
+                              updated_at = excluded.updated_at
+            """, (session_id, level, idx, str(uuid4()), content, child_count, time.time()))
+
+    def get_last_story_summary(self, session_id: str, level: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("""
+            SELECT * FROM story_summaries WHERE session_id = ? AND level = ?
+            ORDER BY idx DESC LIMIT 1
+        """, (session_id, level)).fetchone()
+        return _row_dict(row, "updated_at") if row else None
+
+    def get_story_summaries(self, session_id: str, level: str, min_idx: int,
+                            max_idx: int) -> List[Dict[str, Any]]:
+        rows = self._connection().execute("""
+            SELECT * FROM story_summaries
+            WHERE session_id = ? AND level = ? AND idx BETWEEN ? AND ?
+            ORDER BY idx ASC
+        """, (session_id, level, min_idx, max_idx)).fetchall()
+        return [_row_dict(row, "updated_at") for row in rows]
+
+    # ==================== PRESETS ====================
+
+    def _load_presets(self) -> List[Dict[str, Any]]:
+        rows = self._connection().execute("SELECT * FROM game_presets ORDER BY category, id").fetchall()
+        return [dict(row, base_stats=json.loads(row["base_stats"])) for row in rows]
+
+    # ==================== WARM POOL ====================
+
+    def add_pooled_session(self, session_id: str, pool_key: str, inventory: Dict[str, int],
+                           character: Dict[str, Any], opening: str, payload: Dict[str, Any]):
+        with self._transaction() as conn:
+            now = self._insert_session(conn, session_id, inventory, character, opening)
+            conn.execute("""
+                INSERT INTO session_pool (session_id, pool_key, payload, created_at) VALUES (?, ?, json(?), ?)
+            """, (session_id, pool_key, json.dumps(payload), now))
+
+    def claim_pooled_session(self, pool_key: str, player_name: str) -> Optional[Dict[str, Any]]:
+        with self._transaction() as conn:
+            row = conn.execute("""
+                SELECT session_id, payload FROM session_pool WHERE pool_key = ?
+                ORDER BY created_at LIMIT 1
+            """, (pool_key,)).fetchone()
+            if row is None:
+                return None
+            session_id = row["session_id"]
+            now = time.time()
+            conn.execute("DELETE FROM session_pool WHERE session_id = ?", (session_id,))
+            conn.execute("UPDATE characters SET name = ? WHERE session_id = ?",
+                         (player_name or "Adventurer", session_id))
+            conn.execute("UPDATE game_sessions SET created_at = ?, updated_at = ? WHERE id = ?",
+                         (now, now, session_id))
+        return json.loads(row["payload"])
+
+    def count_pooled_sessions(self) -> Dict[str, int]:
+        rows = self._connection().execute(
+            "SELECT pool_key, COUNT(*) FROM session_pool GROUP BY pool_key").fetchall()
+        return {key: count for key, count in rows}
+
+    @contextmanager
+    def try_advisory_lock(self, key: int) -> Iterator[bool]:
+        """Lock non-blocking antar worker di host yang sama (flock pada file di samping database)"""
+        try:
+            import fcntl
+        except ImportError:  # Non-POSIX: cukup lock per proses
+            with super().try_advisory_lock(key) as acquired:
+                yield acquired
+            return
+
+        with open(f"{self.path}.lock-{key}", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+            except BlockingIOError:
+                acquired = False
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def try_lease(self, key: str, ttl_seconds: float) -> Iterator[bool]:
+        """Lease antar worker lewat tabel leases (sama seperti Postgres)"""
+        holder = uuid4().hex
+        with self._transaction() as conn:
+            now = time.time()
+            acquired = bool(conn.execute("""
+                INSERT INTO leases (key, holder, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leases.expires_at < ?
+                RETURNING holder
+            """, (key, holder, now + ttl_seconds, now)).fetchall())
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with self._transaction() as conn:
+                    conn.execute("DELETE FROM leases WHERE key = ? AND holder = ?", (key, holder))
@@ -1,18 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
+import orjson
 import uuid
 
 from app.models.game_state import (
-    Session, Message, NewGameRequest, ActionRequest, ActionResponse, UndoRequest
+    Session, NewGameRequest, ActionRequest, ActionResponse, UndoRequest
 )
+from app.models.serialization import session_payload, action_payload, last_choices, json_response
 from app.db import database
+from app.db.migrate import apply_migrations
+from app.db.pool import PoolTimeout
+from app.core import lifecycle
+from app.core.config import get_settings
+from app.core.etag import make_etag, etag_matches
+from app.core.rate_limit import RateLimitMiddleware, get_rate_limit_stats
+from app.services.character import build_character
+from app.services.turn import run_turn, maybe_summarize, TurnError, turn_stats
+from app.services.idempotency import get_action_store, IdempotencyMismatch, IdempotencyInProgress
+from app.services.game_channel import GameChannel
+from app.services.session_gc import start_session_gc, run_gc, get_gc_stats
 from app.services.game_engine import (
-    process_action, calculate_new_hp, apply_inventory_changes, 
-    calculate_level_up, generate_summary
+    generate_opening, get_llm_stats, get_degradation_stats, get_llm_circuit, warm_up as warm_up_llm
+)
+from app.services.warm_pool import (
+    STARTING_INVENTORY, pool_key, claim as claim_pooled_session, start_warm_pool, get_pool_stats
 )
 
 app = FastAPI(title="AI Driven Dungeon Backend")
 
+# Rate limiting (didaftarkan sebelum CORS agar response 429 tetap membawa header CORS);
+# RATE_LIMIT_ENABLED dibaca middleware saat request pertama, bukan saat import
+app.add_middleware(RateLimitMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -20,13 +40,59 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed", "Retry-After"],
 )
 
 
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Database sedang penuh: minta client mencoba lagi, bukan 500"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
 @app.on_event("startup")
 def startup_event():
-    # Tables are created by init.sql, just test connection
-    database.test_connection()
+    # Worker baru menerima traffic setelah semua ini selesai (lihat serve.py)
+    database.wait_for_database(get_settings().DB_STARTUP_TIMEOUT)
+    # Base tables are created by init.sql; later schema changes are versioned migrations
+    apply_migrations()
+    database.load_preset_catalog()
+    database.start_cache_listener()
+    warm_up_llm()
+    start_session_gc()
+    start_warm_pool()
+    lifecycle.mark_ready()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # SIGTERM: uvicorn sudah berhenti menerima koneksi; tunggu turn LLM yang masih berjalan
+    remaining = lifecycle.drain(get_settings().SHUTDOWN_GRACE_SECONDS)
+    if remaining:
+        print(f"⚠️ Shutting down with {remaining} turn(s) still in flight")
+    else:
+        print("✅ All in-flight turns finished")
+    database.close_connection_pool()
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: proses hidup dan event loop merespons (tanpa cek dependency)"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: startup selesai, tidak sedang drain, database bisa dipakai, circuit LLM tidak terbuka"""
+    checks = {
+        "started": lifecycle.is_ready(),
+        "draining": lifecycle.is_draining(),
+        "database": database.check_database(),
+        "llm_circuit": get_llm_circuit().state
+    }
+    ready = checks["started"] and checks["database"] and checks["llm_circuit"] != "open"
+    return JSONResponse(status_code=200 if ready else 503,
+                        content={"status": "ready" if ready else "not_ready", "checks": checks})
 
 
 @app.get("/")
@@ -34,162 +100,189 @@ def read_root():
     return {
         "message": "AI Driven Dungeon API",
         "endpoints": {
+            "GET /healthz": "Liveness probe",
+            "GET /readyz": "Readiness probe (database + LLM circuit)",
+            "GET /presets": "Race, class & background presets",
             "POST /game/new": "Start new game",
             "POST /game/action": "Process action",
             "GET /game/{id}": "Get session",
-            "POST /game/undo": "Undo last action"
+            "WS /game/{id}/ws": "Persistent game channel",
+            "GET /game/{id}/history/archive": "Stream archived (summarized) turns",
+            "POST /game/undo": "Undo last action",
+            "GET /stats/cache": "Session cache statistics",
+            "GET /stats/db": "Connection pool size & checkout wait metrics",
+            "GET /stats/replica": "Read replica routing, lag & primary fallbacks",
+            "GET /stats/gc": "Session garbage collector metrics",
+            "GET /stats/pool": "Warm pool metrics",
+            "GET /stats/ratelimit": "Rate limit budgets, allowed/limited counts & check cost",
+            "GET /stats/turns": "Turn commits, lock-busy & version-conflict rates",
+            "GET /stats/idempotency": "Action dedupe (single-flight / replay) metrics",
+            "GET /stats/llm": "LLM token usage & provider prompt-cache hit ratio",
+            "GET /stats/degradation": "Adaptive max_tokens level, LLM p95 latency & queue depth",
+            "POST /admin/gc": "Run session GC now (dry_run=true by default)"
         }
     }
 
 
+@app.get("/stats/cache")
+def get_cache_stats():
+    """Session cache hit ratio & memory usage"""
+    return database.get_cache_stats()
+
+
+@app.get("/stats/db")
+def get_db_pool_stats():
+    """Ukuran pool, antrean, waktu tunggu checkout, rollback-on-return, leak"""
+    return database.get_pool_stats()
+
+
+@app.get("/stats/replica")
+def get_replica_stats():
+    """Pembacaan dari replica vs primary, lag replica, fallback karena watermark/lag"""
+    return database.get_replica_stats()
+
+
+@app.get("/stats/gc")
+def get_session_gc_stats():
+    """Metrics garbage collector session"""
+    return get_gc_stats()
+
+
+@app.get("/stats/turns")
+def get_turn_stats():
+    """Serialisasi turn per session: commit, lock busy, version conflict, turn in-flight ditolak"""
+    return dict(database.get_turn_lock_stats(), **turn_stats)
+
+
+@app.get("/stats/idempotency")
+def get_idempotency_stats():
+    """Dedupe /game/action: executed, joined (in-flight), replayed"""
+    return get_action_store().stats()
+
+
+@app.get("/stats/llm")
+def get_llm_usage_stats():
+    """Token narrative call: prompt, completion, dan prompt token yang kena cache provider"""
+    return get_llm_stats()
+
+
+@app.get("/stats/degradation")
+def get_llm_degradation_stats():
+    """Level degradasi narrative call saat ini (0 = normal), max_tokens efektif, p95, antrean"""
+    return get_degradation_stats()
+
+
+@app.get("/stats/ratelimit")
+def get_ratelimit_stats():
+    """Budget token bucket, jumlah request lolos/ditolak per kelas, biaya cek rata-rata"""
+    return get_rate_limit_stats()
+
+
+@app.get("/stats/pool")
+def get_warm_pool_stats():
+    """Metrics & stok warm pool /game/new"""
+    return get_pool_stats()
+
+
+@app.post("/admin/gc")
+def trigger_session_gc(dry_run: bool = True):
+    """Jalankan GC sekarang; default hanya laporan (dry run)"""
+    return run_gc(dry_run=dry_run)
+
+
+@app.get("/presets")
+def get_presets(request: Request):
+    """Semua preset per kategori; data statis, jadi boleh di-cache lama oleh client"""
+    catalog = database.get_preset_catalog()
+    headers = {"ETag": catalog.etag, "Cache-Control": "public, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), catalog.etag):
+        return Response(status_code=304, headers=headers)
+    return json_response(catalog.grouped(), headers=headers)
+
+
 @app.post("/game/new", response_model=Session)
 def create_new_game(request: NewGameRequest):
     """Start a new game session"""
     session_id = str(uuid.uuid4())
     
-    # Create session in database
-    database.create_session(
-        session_id=session_id,
-        location="Dark Cave Entrance",
-        inventory=["Rusty Sword", "Torch", "3 Rations"]
-    )
+    try:
+        character = build_character(request.player_name, request.race,
+                                    request.job_class, request.background)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Add initial AI message
-    initial_narrative = f"{request.starting_scenario} The air is damp and cold. You grip your rusty sword tightly."
-    initial_choices = ["Look around carefully", "Check your inventory", "Walk deeper into the cave"]
+    # Skenario/preset umum: ambil session siap pakai dari warm pool
+    scenario = request.starting_scenario or ""
+    key = pool_key(scenario, request.race, request.job_class, request.background)
+    payload = claim_pooled_session(key, character["name"])
+    if payload is not None:
+        return json_response(payload)
     
-    database.add_message(
+    # Skenario custom (atau pool kosong): narasi pembuka dari LLM
+    opening = generate_opening(scenario, character)
+    
+    # Create session + opening message in database (satu statement)
+    session = database.create_session(
         session_id=session_id,
-        role="assistant",
-        content=initial_narrative,
-        choices_options=initial_choices
+        location="Dark Cave Entrance",
+        inventory=STARTING_INVENTORY,
+        character=character,
+        opening=opening["narrative"]
     )
+    messages = [{"role": "assistant", "content": opening["narrative"], "choices_options": None}]
     
-    # Get full session
-    session = database.get_session(session_id)
-    messages = database.get_all_messages(session_id)
-    
-    return Session(
-        id=session["id"],
-        hp=session["hp"],
-        max_hp=session["max_hp"],
-        inventory=session["inventory"],
-        location=session["location"],
-        level=session["level"],
-        exp=session["exp"],
-        turn_count=session["turn_count"],
-        game_variables=session["game_variables"],
-        active_quests=session["active_quests"],
-        summary=session["summary"],
-        game_over=session["game_over"],
-        messages=[Message(
-            role=m["role"],
-            content=m["content"],
-            choices_options=m["choices_options"]
-        ) for m in messages],
-        choices=initial_choices
-    )
+    return json_response(session_payload(session, messages, opening["choices"]))
 
 
 @app.post("/game/action", response_model=ActionResponse)
-def process_player_action(request: ActionRequest):
-    """Process a player action"""
-    
-    # Get current session
-    session = database.get_session(request.session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    if session["game_over"]:
-        raise HTTPException(status_code=400, detail="Game is over")
-    
-    # Save snapshot BEFORE processing (for undo)
-    database.save_snapshot(request.session_id)
-    
-    # Add user message to history
-    database.add_message(
-        session_id=request.session_id,
-        role="user",
-        content=request.action,
-        chosen_option=request.action
-    )
-    
-    # Get recent messages for context (sliding window)
-    recent_messages = database.get_messages(request.session_id, limit=15)
-    
-    # Process with AI
-    ai_result = process_action(request.action, session, recent_messages)
-    
-    # Calculate new state (Python logic, not AI)
-    new_hp = calculate_new_hp(
-        session["hp"], session["max_hp"],
-        ai_result["damage"], ai_result["heal"]
-    )
+def process_player_action(request: ActionRequest, http_request: Request):
+    """
+    Process a player action.
+    Idempotency-Key header (atau field turn) membuat retry aman: duplikat yang
+    masih diproses ikut menunggu, yang sudah selesai diputar ulang.
+    """
     
-    new_inventory = apply_inventory_changes(
-        session["inventory"],
-        ai_result["gain_item"],
-        ai_result["lose_item"]
-    )
-    
-    new_level, new_exp = calculate_level_up(
-        session["level"], session["exp"], ai_result["exp_gain"]
-    )
+    idempotency_key = http_request.headers.get("idempotency-key")
+    if idempotency_key:
+        key = f"{request.session_id}:key:{idempotency_key}"
+    elif request.turn is not None:
+        key = f"{request.session_id}:turn:{request.turn}"
+    else:
+        return json_response(_play_action(request))
     
-    new_location = ai_result["new_location"] or session["location"]
-    game_over = ai_result["game_over"] or new_hp <= 0
-    
-    # Add AI response to history
-    database.add_message(
-        session_id=request.session_id,
-        role="assistant",
-        content=ai_result["narrative"],
-        choices_options=ai_result["choices"],
-        tokens_used=ai_result.get("tokens_used"),
-        model_name=ai_result.get("model_name"),
-        latency_ms=ai_result.get("latency_ms")
-    )
-    
-    # Update session
-    database.update_session(
-        request.session_id,
-        hp=new_hp,
-        inventory=new_inventory,
-        location=new_location,
-        level=new_level,
-        exp=new_exp,
-        turn_count=session["turn_count"] + 1,
-        last_event_trigger=ai_result.get("event_trigger"),
-        game_over=game_over
-    )
+    try:
+        payload, replayed = get_action_store().run(key, request.action, lambda: _play_action(request))
+    except IdempotencyMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return json_response(payload, headers=headers)
+
+
+def _play_action(request: ActionRequest) -> dict:
+    try:
+        result = run_turn(request.session_id, request.action, expected_turn=request.turn)
+    except TurnError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
-    # Auto-summarize if too many messages
-    message_count = database.get_message_count(request.session_id)
-    if message_count > 20:
-        old_messages = database.get_messages(request.session_id, limit=message_count)[:10]
-        new_summary = generate_summary(old_messages)
-        database.update_session(request.session_id, summary=new_summary)
-        database.delete_old_messages(request.session_id, keep_last=10)
+    maybe_summarize(request.session_id)
     
     # Get all messages for response
     all_messages = database.get_all_messages(request.session_id)
     
-    return ActionResponse(
-        narrative=ai_result["narrative"],
-        hp=new_hp,
-        hp_change=-ai_result["damage"] + ai_result["heal"],
-        inventory=new_inventory,
-        location=new_location,
-        choices=ai_result["choices"],
-        game_over=game_over,
-        messages=[Message(
-            role=m["role"],
-            content=m["content"],
-            choices_options=m["choices_options"]
-        ) for m in all_messages],
-        level=new_level,
-        exp=new_exp,
-        turn_count=session["turn_count"] + 1
+    return action_payload(
+        narrative=result["narrative"],
+        hp=result["hp"],
+        hp_change=result["hp_change"],
+        inventory=result["inventory"],
+        location=result["location"],
+        choices=result["choices"],
+        game_over=result["game_over"],
+        messages=all_messages,
+        level=result["level"],
+        exp=result["exp"],
+        turn_count=result["turn_count"]
     )
 
 
@@ -203,38 +296,20 @@ def undo_last_action(request: UndoRequest):
     
     messages = database.get_all_messages(request.session_id)
     
-    # Get last choices from last assistant message
-    last_choices = ["Continue", "Look around", "Rest"]
-    for m in reversed(messages):
-        if m["role"] == "assistant" and m["choices_options"]:
-            last_choices = m["choices_options"]
-            break
-    
-    return Session(
-        id=restored["id"],
-        hp=restored["hp"],
-        max_hp=restored["max_hp"],
-        inventory=restored["inventory"],
-        location=restored["location"],
-        level=restored["level"],
-        exp=restored["exp"],
-        turn_count=restored["turn_count"],
-        game_variables=restored["game_variables"],
-        active_quests=restored["active_quests"],
-        summary=restored["summary"],
-        game_over=restored["game_over"],
-        messages=[Message(
-            role=m["role"],
-            content=m["content"],
-            choices_options=m["choices_options"]
-        ) for m in messages],
-        choices=last_choices
-    )
+    return json_response(session_payload(restored, messages, last_choices(messages)))
 
 
 @app.get("/game/{session_id}", response_model=Session)
-def get_game(session_id: str):
-    """Get current game session"""
+def get_game(session_id: str, request: Request):
+    """Get current game session (mendukung If-None-Match -> 304)"""
+    
+    version = database.get_session_version(session_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    etag = make_etag(*version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
     
     session = database.get_session(session_id)
     if not session:
@@ -242,30 +317,36 @@ def get_game(session_id: str):
     
     messages = database.get_all_messages(session_id)
     
-    # Get last choices
-    last_choices = ["Continue", "Look around", "Rest"]
-    for m in reversed(messages):
-        if m["role"] == "assistant" and m["choices_options"]:
-            last_choices = m["choices_options"]
-            break
-    
-    return Session(
-        id=session["id"],
-        hp=session["hp"],
-        max_hp=session["max_hp"],
-        inventory=session["inventory"],
-        location=session["location"],
-        level=session["level"],
-        exp=session["exp"],
-        turn_count=session["turn_count"],
-        game_variables=session["game_variables"],
-        active_quests=session["active_quests"],
-        summary=session["summary"],
-        game_over=session["game_over"],
-        messages=[Message(
-            role=m["role"],
-            content=m["content"],
-            choices_options=m["choices_options"]
-        ) for m in messages],
-        choices=last_choices
+    return json_response(
+        session_payload(session, messages, last_choices(messages)),
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
     )
+
+
+@app.get("/game/{session_id}/history/archive")
+def get_archived_history(session_id: str, request: Request, after: int = 0):
+    """Stream pesan yang sudah diarsipkan (NDJSON, satu pesan per baris), mulai setelah turn_order `after`"""
+    
+    version = database.get_session_version(session_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    etag = make_etag("archive", after, *version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    def stream():
+        for message in database.iter_archived_messages(session_id, after_turn_order=after):
+            yield orjson.dumps(message) + b"\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
+
+
+@app.websocket("/game/{session_id}/ws")
+async def game_channel(websocket: WebSocket, session_id: str):
+    """
+    Persistent game channel: aksi, narrative streaming, state delta,
+    event dari server (summary), heartbeat, dan resume via ?last_seq=N
+    """
+    await GameChannel(websocket, session_id).run()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 
 
@@ -15,7 +15,7 @@ class Session(BaseModel):
     id: str
     hp: int
     max_hp: int
-    inventory: List[str]
+    inventory: Dict[str, int]  # {item_name: quantity}
     location: str
     level: int
     exp: int
@@ -32,12 +32,20 @@ class NewGameRequest(BaseModel):
     """Request to start a new game"""
     starting_scenario: Optional[str] = "You wake up in a dark cave with only a rusty sword in your hand."
     player_name: Optional[str] = "Adventurer"
+    # Value dari /presets (mis. "elf", "wizard", "scholar"); "class" diterima sebagai alias
+    race: Optional[str] = None
+    job_class: Optional[str] = Field(None, alias="class")
+    background: Optional[str] = None
+
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class ActionRequest(BaseModel):
     """Request to perform an action"""
     session_id: str
     action: str
+    # Opsional: nomor turn yang akan dibuat aksi ini (turn_count + 1), untuk dedupe retry
+    turn: Optional[int] = None
 
 
 class ActionResponse(BaseModel):
@@ -45,7 +53,7 @@ class ActionResponse(BaseModel):
     narrative: str
     hp: int
     hp_change: int
-    inventory: List[str]
+    inventory: Dict[str, int]
     location: str
     choices: List[str]
     game_over: bool
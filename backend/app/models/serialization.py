@@ -0,0 +1,83 @@
+"""
+Fast serialization path untuk response Session / ActionResponse.
+
+Payload dibangun sekali sebagai dict biasa dengan bentuk yang sama persis
+dengan model pydantic di game_state.py (valid by construction, karena semua
+field berasal dari database layer yang tipenya sudah pasti), lalu langsung
+di-encode dengan orjson. Route mengembalikan ORJSONResponse sehingga FastAPI
+tidak memvalidasi ulang lewat response_model (response_model tetap dipakai
+untuk dokumentasi OpenAPI).
+"""
+
+from typing import Any, Dict, List, Optional
+
+from fastapi.responses import ORJSONResponse
+
+
+def message_payload(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Satu pesan dalam format Message"""
+    return {
+        "role": message["role"],
+        "content": message["content"],
+        "choices_options": message["choices_options"],
+        "chosen_option": message.get("chosen_option")
+    }
+
+
+def messages_payload(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [message_payload(m) for m in messages]
+
+
+def session_payload(session: Dict[str, Any], messages: List[Dict[str, Any]],
+                    choices: List[str]) -> Dict[str, Any]:
+    """Payload dengan bentuk model Session"""
+    return {
+        "id": str(session["id"]),
+        "hp": session["hp"],
+        "max_hp": session["max_hp"],
+        "inventory": session["inventory"],
+        "location": session["location"],
+        "level": session["level"],
+        "exp": session["exp"],
+        "turn_count": session["turn_count"],
+        "game_variables": session["game_variables"],
+        "active_quests": session["active_quests"],
+        "summary": session["summary"] or "",
+        "game_over": session["game_over"],
+        "messages": messages_payload(messages),
+        "choices": list(choices)
+    }
+
+
+def action_payload(narrative: str, hp: int, hp_change: int, inventory: Any,
+                   location: str, choices: List[str], game_over: bool,
+                   messages: List[Dict[str, Any]], level: int, exp: int,
+                   turn_count: int) -> Dict[str, Any]:
+    """Payload dengan bentuk model ActionResponse"""
+    return {
+        "narrative": narrative,
+        "hp": hp,
+        "hp_change": hp_change,
+        "inventory": inventory,
+        "location": location,
+        "choices": list(choices),
+        "game_over": game_over,
+        "messages": messages_payload(messages),
+        "level": level,
+        "exp": exp,
+        "turn_count": turn_count
+    }
+
+
+def last_choices(messages: List[Dict[str, Any]]) -> List[str]:
+    """Get last choices from last assistant message"""
+    for m in reversed(messages):
+        if m["role"] == "assistant" and m["choices_options"]:
+            return m["choices_options"]
+    return ["Continue", "Look around", "Rest"]
+
+
+def json_response(payload: Any, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """Encode payload langsung dengan orjson (tanpa validasi response_model)"""
+    return ORJSONResponse(payload, status_code=status_code, headers=headers)
@@ -0,0 +1,71 @@
+"""
+Character builder: race + class + background -> stats awal karakter.
+
+Dihitung di memori dari base_stats katalog preset (tanpa query per preset).
+CLASS menentukan pool HP/mana (nilai absolut); bonus lain dijumlahkan.
+"""
+
+from typing import Dict, Any, List, Optional
+
+from app.db import database
+
+# Default kolom characters (lihat init.sql)
+DEFAULT_STATS = {
+    "hp": 100, "max_hp": 100, "mana": 50, "max_mana": 50, "gold": 0,
+    "str": 10, "dex": 10, "con": 10, "int": 10, "wis": 10, "cha": 10,
+}
+
+# Stat pool milik CLASS (absolut)
+CLASS_POOL_STATS = ("hp", "max_hp", "mana", "max_mana")
+
+# Bonus "hp"/"mana" dari race/background menaikkan nilai sekarang + maksimumnya
+POOL_BONUS = {"hp": "max_hp", "mana": "max_mana"}
+
+
+def compute_stats(presets: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Gabungkan base_stats preset menjadi stats akhir (CLASS diterapkan lebih dulu)"""
+    stats = dict(DEFAULT_STATS)
+    ordered = sorted(presets, key=lambda preset: preset["category"] != "CLASS")
+
+    for preset in ordered:
+        base_stats = preset.get("base_stats") or {}
+        for key, value in base_stats.items():
+            if key not in stats:
+                continue
+            if preset["category"] == "CLASS" and key in CLASS_POOL_STATS:
+                stats[key] = value
+            elif key in POOL_BONUS:
+                stats[key] += value
+                stats[POOL_BONUS[key]] += value
+            else:
+                stats[key] += value
+
+    for key in ("str", "dex", "con", "int", "wis", "cha"):
+        stats[key] = max(1, stats[key])
+    return stats
+
+
+def build_character(name: Optional[str] = None, race: Optional[str] = None,
+                    job_class: Optional[str] = None,
+                    background: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Validasi pilihan preset dan hitung stats. Raise ValueError jika value
+    tidak ada di katalog. Return format yang diterima database.create_session.
+    """
+    catalog = database.get_preset_catalog()
+    presets = []
+    for category, value in (("RACE", race), ("CLASS", job_class), ("BACKGROUND", background)):
+        if not value:
+            continue
+        preset = catalog.get(category, value)
+        if preset is None:
+            raise ValueError(f"Unknown {category.lower()}: {value}")
+        presets.append(preset)
+
+    return {
+        "name": name or "Adventurer",
+        "race": race,
+        "job_class": job_class,
+        "background": background,
+        "stats": compute_stats(presets),
+    }
@@ -0,0 +1,72 @@
+"""
+Circuit breaker untuk panggilan LLM.
+
+closed    -> panggilan normal; N kegagalan berturut-turut membuka circuit
+open      -> panggilan langsung memakai fallback (tanpa menunggu timeout
+             provider) dan /readyz melaporkan worker tidak siap
+half_open -> setelah reset_timeout satu panggilan percobaan diizinkan;
+             sukses menutup circuit, gagal membukanya lagi
+"""
+
+import threading
+import time
+from typing import Dict, Any
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.metrics = {"failures": 0, "opened": 0, "short_circuited": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        """True jika panggilan boleh dilakukan sekarang"""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._probe_in_flight:
+                self._state = "half_open"
+                self._probe_in_flight = True
+                return True
+            self.metrics["short_circuited"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                print("✅ LLM circuit closed")
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.metrics["failures"] += 1
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self.metrics["opened"] += 1
+                    print(f"⚠️ LLM circuit opened after {self._failures} consecutive failures")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            stats = dict(self.metrics)
+            stats.update({"state": state, "consecutive_failures": self._failures})
+        return stats
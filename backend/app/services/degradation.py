@@ -0,0 +1,139 @@
+"""
+Controller degradasi untuk narrative call (load shedding adaptif).
+
+Memantau p95 latency LLM (jendela sampel terakhir) dan jumlah narrative call
+yang sedang berjalan. Saat melewati SLO, level naik satu: max_tokens dikecilkan
+dan mulai LLM_SHORT_PROMPT_LEVEL prompt narasi pendek dipakai. Level turun
+lagi hanya jika p95 dan antrean di bawah SLO x LLM_RECOVER_RATIO (hysteresis),
+dan setiap perubahan level dibatasi cooldown agar tidak berosilasi.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from app.core.config import get_settings
+
+MIN_SAMPLES = 5  # sampel minimum sebelum p95 dipakai untuk keputusan
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class DegradationController:
+
+    def __init__(self, base_max_tokens: int, token_factors: List[float], short_prompt_level: int,
+                 slo_p95_ms: float, slo_queue_depth: int, recover_ratio: float,
+                 cooldown: float, window: int, enabled: bool = True):
+        self.base_max_tokens = base_max_tokens
+        self.token_factors = token_factors or [1.0]
+        self.short_prompt_level = short_prompt_level
+        self.slo_p95_ms = slo_p95_ms
+        self.slo_queue_depth = slo_queue_depth
+        self.recover_ratio = recover_ratio
+        self.cooldown = cooldown
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self._level = 0
+        self._in_flight = 0
+        self._changed_at = time.monotonic()
+
+        self.metrics = {
+            "calls": 0,
+            "degrade_events": 0,
+            "recover_events": 0,
+            "calls_per_level": [0] * len(self.token_factors)
+        }
+
+    @property
+    def max_level(self) -> int:
+        return len(self.token_factors) - 1
+
+    def _settings_for(self, level: int) -> Dict[str, Any]:
+        return {
+            "level": level,
+            "max_tokens": max(1, int(self.base_max_tokens * self.token_factors[level])),
+            "short_prompt": level >= self.short_prompt_level
+        }
+
+    def _evaluate(self, now: float):
+        """Naik/turun satu level sesuai SLO (dipanggil dengan lock dipegang)"""
+        if not self.enabled or now - self._changed_at < self.cooldown:
+            return
+
+        p95 = _percentile(self._samples, 0.95) if len(self._samples) >= MIN_SAMPLES else None
+        overloaded = self._in_flight > self.slo_queue_depth or (p95 is not None and p95 > self.slo_p95_ms)
+        calm = (p95 is not None and p95 <= self.slo_p95_ms * self.recover_ratio
+                and self._in_flight <= self.slo_queue_depth * self.recover_ratio)
+
+        if overloaded and self._level < self.max_level:
+            self._level += 1
+            self.metrics["degrade_events"] += 1
+            print(f"⚠️ LLM degraded to level {self._level} "
+                  f"(p95 {p95 or 0:.0f}ms, in flight {self._in_flight})")
+        elif calm and self._level > 0:
+            self._level -= 1
+            self.metrics["recover_events"] += 1
+            print(f"✅ LLM recovered to level {self._level} (p95 {p95:.0f}ms, in flight {self._in_flight})")
+        else:
+            return
+
+        # Sampel lama diukur pada level sebelumnya: keputusan berikutnya pakai sampel baru
+        self._samples.clear()
+        self._changed_at = now
+
+    def acquire(self) -> Dict[str, Any]:
+        """Mulai satu narrative call; return {"level", "max_tokens", "short_prompt"}"""
+        with self._lock:
+            self._in_flight += 1
+            self._evaluate(time.monotonic())
+            self.metrics["calls"] += 1
+            self.metrics["calls_per_level"][self._level] += 1
+            return self._settings_for(self._level)
+
+    def release(self, latency_ms: Optional[float]):
+        """Selesai (sukses atau gagal); latency gagal tetap dihitung sebagai tekanan"""
+        with self._lock:
+            self._in_flight -= 1
+            if latency_ms is not None:
+                self._samples.append(latency_ms)
+            self._evaluate(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+            stats = dict(self.metrics)
+            stats["calls_per_level"] = list(self.metrics["calls_per_level"])
+            stats.update(self._settings_for(self._level))
+            stats.update({
+                "enabled": self.enabled,
+                "max_level": self.max_level,
+                "in_flight": self._in_flight,
+                "samples": len(samples),
+                "p50_ms": round(_percentile(samples, 0.5), 1) if samples else None,
+                "p95_ms": round(_percentile(samples, 0.95), 1) if samples else None,
+                "level_age_seconds": round(time.monotonic() - self._changed_at, 1),
+                "slo_p95_ms": self.slo_p95_ms,
+                "slo_queue_depth": self.slo_queue_depth
+            })
+        return stats
+
+
+def create_controller() -> DegradationController:
+    settings = get_settings()
+    return DegradationController(
+        base_max_tokens=settings.MAX_TOKENS,
+        token_factors=settings.LLM_DEGRADE_TOKEN_FACTORS,
+        short_prompt_level=settings.LLM_SHORT_PROMPT_LEVEL,
+        slo_p95_ms=settings.LLM_SLO_P95_MS,
+        slo_queue_depth=settings.LLM_SLO_QUEUE_DEPTH,
+        recover_ratio=settings.LLM_RECOVER_RATIO,
+        cooldown=settings.LLM_DEGRADE_COOLDOWN_SECONDS,
+        window=settings.LLM_LATENCY_WINDOW,
+        enabled=settings.LLM_ADAPTIVE_ENABLED
+    )
@@ -0,0 +1,268 @@
+"""
+WebSocket game channel (/game/{session_id}/ws).
+
+Protocol (JSON per frame):
+  client -> server
+    {"type": "action", "action": "...", "turn": N}   kirim aksi pemain (turn opsional)
+    {"type": "ack", "seq": N}             pesan sampai sequence N sudah diterima
+    {"type": "resume", "last_seq": N}     minta ulang pesan setelah sequence N
+                                          (tanpa last_seq: setelah ack terakhir)
+    {"type": "ping"} / {"type": "pong"}
+  server -> client
+    {"type": "snapshot", ...}             state + pesan (penuh, atau sejak last_seq)
+    {"type": "chunk", "text": "..."}      potongan narrative selama LLM menulis
+    {"type": "delta", ...}                hp_change, inventory diff ({item: qty}), exp, dst.
+    {"type": "event", "event": "..."}     event dari server (mis. summary_ready)
+    {"type": "error", "status": N, "detail": "..."}   (429: + "retry_after" detik)
+    {"type": "ping", "ts": ...} / {"type": "pong"}
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, Any, Optional
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.core.rate_limit import get_rate_limiter, client_ip
+from app.db import database
+from app.models.serialization import session_payload, message_payload, last_choices
+from app.services.turn import run_turn, maybe_summarize, TurnError
+
+
+class GameChannel:
+    """Satu koneksi WebSocket untuk satu session"""
+
+    def __init__(self, websocket: WebSocket, session_id: str):
+        settings = get_settings()
+        self.ws = websocket
+        self.session_id = session_id
+        self.heartbeat_interval = settings.WS_HEARTBEAT_INTERVAL
+        self.heartbeat_timeout = settings.WS_HEARTBEAT_TIMEOUT
+        self.send_timeout = settings.WS_SEND_TIMEOUT
+
+        # Backpressure: antrean keluar terbatas per koneksi
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self._pending_chunk = ""
+
+        self.last_seen = time.monotonic()
+        self.last_ack = 0
+        self.turn_task: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self._closed = False
+
+    # ---------- lifecycle ----------
+
+    async def run(self):
+        session = await run_in_threadpool(database.get_session, self.session_id)
+        if not session:
+            await self.ws.close(code=4404)
+            return
+
+        await self.ws.accept()
+        last_seq = _parse_int(self.ws.query_params.get("last_seq"))
+
+        sender = asyncio.create_task(self._sender())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await self._send_snapshot(session, last_seq)
+            await self._receiver()
+        except (WebSocketDisconnect, ConnectionError, RuntimeError):
+            # RuntimeError: receive setelah server menutup koneksi
+            pass
+        finally:
+            self._closed = True
+            sender.cancel()
+            heartbeat.cancel()
+            # Turn yang sedang berjalan tetap selesai di thread-nya; hasilnya
+            # tersimpan di database dan dikirim ulang saat client resume.
+            for task in self._tasks:
+                task.cancel()
+
+    async def _close(self, code: int):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.ws.close(code=code)
+        except RuntimeError:
+            pass
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ---------- outbound (backpressure) ----------
+
+    async def _sender(self):
+        while True:
+            message = await self.queue.get()
+            await self.ws.send_text(orjson.dumps(message).decode())
+            self.queue.task_done()
+
+    async def _send(self, message: Dict[str, Any]):
+        """Kirim pesan penting; client yang terlalu lambat diputus"""
+        try:
+            await asyncio.wait_for(self.queue.put(message), timeout=self.send_timeout)
+        except asyncio.TimeoutError:
+            await self._close(1013)
+            raise ConnectionError("Slow consumer")
+
+    async def _send_error_and_close(self, status: int, detail: str, code: int):
+        """Error frame terakhir dikirim (antrean dikosongkan) sebelum koneksi ditutup"""
+        await self._send({"type": "error", "status": status, "detail": detail})
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.send_timeout)
+        except asyncio.TimeoutError:
+            pass
+        await self._close(code)
+
+    def _send_nowait(self, message: Dict[str, Any]) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _push_chunk(self, text: str):
+        """Potongan narrative boleh digabung saat antrean penuh (tidak pernah memblok LLM)"""
+        text = self._pending_chunk + text
+        if self._send_nowait({"type": "chunk", "text": text}):
+            self._pending_chunk = ""
+        else:
+            self._pending_chunk = text
+
+    async def _flush_chunks(self):
+        if self._pending_chunk:
+            text, self._pending_chunk = self._pending_chunk, ""
+            await self._send({"type": "chunk", "text": text})
+
+    # ---------- heartbeat ----------
+
+    async def _heartbeat(self):
+        while not self._closed:
+            await asyncio.sleep(self.heartbeat_interval)
+            if time.monotonic() - self.last_seen > self.heartbeat_timeout:
+                await self._close(1001)
+                return
+            # Jika antrean penuh, client memang sedang tertinggal; ping dilewati
+            self._send_nowait({"type": "ping", "ts": time.time()})
+
+    # ---------- inbound ----------
+
+    async def _receiver(self):
+        while not self._closed:
+            raw = await self.ws.receive_text()
+            self.last_seen = time.monotonic()
+
+            try:
+                message = json.loads(raw)
+                kind = message.get("type")
+            except (ValueError, AttributeError):
+                await self._send({"type": "error", "status": 400, "detail": "Invalid message"})
+                continue
+
+            if kind == "ping":
+                self._send_nowait({"type": "pong"})
+            elif kind == "pong":
+                continue
+            elif kind == "ack":
+                self.last_ack = max(self.last_ack, _parse_int(message.get("seq")))
+            elif kind == "resume":
+                session = await run_in_threadpool(database.get_session, self.session_id)
+                if session is None:
+                    # Session dihapus (GC / DELETE) selama koneksi terbuka
+                    await self._send_error_and_close(404, "Session not found", 4404)
+                    return
+                last_seq = message.get("last_seq")
+                await self._send_snapshot(session, self.last_ack if last_seq is None else _parse_int(last_seq))
+            elif kind == "action":
+                await self._start_turn(message.get("action"), message.get("turn"))
+            else:
+                await self._send({"type": "error", "status": 400, "detail": f"Unknown message type: {kind}"})
+
+    async def _start_turn(self, action: Any, turn: Any = None):
+        if not isinstance(action, str) or not action.strip():
+            await self._send({"type": "error", "status": 400, "detail": "Action must be a non-empty string"})
+            return
+        # Satu turn per koneksi; aksi berikutnya harus menunggu delta
+        if self.turn_task is not None and not self.turn_task.done():
+            await self._send({"type": "error", "status": 409, "detail": "Turn already in progress"})
+            return
+        # Budget LLM yang sama dengan POST /game/action (per session + per IP)
+        retry_after = await get_rate_limiter().check_async("llm", client_ip(self.ws.scope), self.session_id)
+        if retry_after:
+            await self._send({"type": "error", "status": 429, "detail": "Rate limit exceeded, slow down",
+                              "retry_after": max(1, int(retry_after + 0.999))})
+            return
+        expected_turn = _parse_int(turn) if turn is not None else None
+        self.turn_task = self._spawn(self._play(action, expected_turn))
+
+    # ---------- game ----------
+
+    async def _send_snapshot(self, session: Dict[str, Any], last_seq: int):
+        messages = await run_in_threadpool(database.get_all_messages, self.session_id)
+
+        # Resume hanya jika pesan setelah last_seq masih lengkap di history
+        resumable = last_seq > 0 and (not messages or messages[0]["sequence"] <= last_seq + 1)
+        replay = [m for m in messages if m["sequence"] > last_seq] if resumable else messages
+
+        payload = session_payload(session, [], last_choices(messages))
+        payload["messages"] = [dict(message_payload(m), sequence=m["sequence"]) for m in replay]
+        payload["type"] = "snapshot"
+        payload["reset"] = not resumable
+        await self._send(payload)
+
+    async def _play(self, action: str, expected_turn: Optional[int] = None):
+        loop = asyncio.get_running_loop()
+
+        def on_chunk(text: str):
+            loop.call_soon_threadsafe(self._push_chunk, text)
+
+        try:
+            result = await run_in_threadpool(run_turn, self.session_id, action, on_chunk, expected_turn)
+        except TurnError as e:
+            await self._send({"type": "error", "status": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            print(f"❌ WebSocket turn failed: {e}")
+            await self._send({"type": "error", "status": 500, "detail": "Turn failed"})
+            return
+
+        await self._flush_chunks()
+        await self._send({
+            "type": "delta",
+            "seq": result["assistant_seq"],
+            "user_seq": result["user_seq"],
+            "turn_count": result["turn_count"],
+            "narrative": result["narrative"],
+            "hp": result["hp"],
+            "hp_change": result["hp_change"],
+            "inventory": result["inventory_diff"],
+            "exp": result["exp"],
+            "exp_gain": result["exp_gain"],
+            "level": result["level"],
+            "location": result["location"],
+            "choices": result["choices"],
+            "game_over": result["game_over"]
+        })
+
+        # Summary berjalan di background; client diberi tahu lewat event
+        self._spawn(self._summarize())
+
+    async def _summarize(self):
+        summary = await run_in_threadpool(maybe_summarize, self.session_id)
+        if summary is not None and not self._closed:
+            await self._send({"type": "event", "event": "summary_ready", "summary": summary})
+
+
+def _parse_int(value: Any) -> int:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
@@ -1,16 +1,58 @@
 import json
+import threading
 import time
-from openai import OpenAI
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional
 from app.core.config import get_settings
+from app.services.degradation import create_controller
+from app.services.circuit import CircuitBreaker
+
+# Dibuat saat pertama dipakai (warm_up di startup worker), bukan saat import:
+# import modul ini murah dan tidak butuh .env / API key
+_client = None
+_controller = None
+_llm_circuit = None
+_init_lock = threading.Lock()
+
+
+def get_client():
+    """OpenAI client (lazy); import openai (httpx + model types) ditunda sampai dibutuhkan"""
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                from openai import OpenAI
+                settings = get_settings()
+                _client = OpenAI(
+                    api_key=settings.OPENAI_API_KEY.get_secret_value(),
+                    base_url=settings.OPENAI_BASE_URL
+                )
+    return _client
+
+
+def get_controller():
+    """Level degradasi narrative call (max_tokens + varian prompt) mengikuti latency & antrean"""
+    global _controller
+    if _controller is None:
+        with _init_lock:
+            if _controller is None:
+                _controller = create_controller()
+    return _controller
 
-settings = get_settings()
-client = OpenAI(
-    api_key=settings.OPENAI_API_KEY.get_secret_value(),
-    base_url=settings.OPENAI_BASE_URL
-)
 
-# Strict System Prompt - JSON only, no hallucination
+def get_llm_circuit() -> CircuitBreaker:
+    """Provider LLM yang terus gagal: pakai fallback langsung, /readyz melaporkan tidak siap"""
+    global _llm_circuit
+    if _llm_circuit is None:
+        with _init_lock:
+            if _llm_circuit is None:
+                settings = get_settings()
+                _llm_circuit = CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                                              settings.LLM_CIRCUIT_RESET_SECONDS)
+    return _llm_circuit
+
+# Strict System Prompt - JSON only, no hallucination.
+# HARUS statis (tanpa .format / state): byte yang identik di setiap turn dan
+# session membuat prompt caching provider bisa dipakai untuk prefix ini.
 SYSTEM_PROMPT = """
 
 ### ROLE
@@ -37,7 +79,7 @@ You are NOT a helpful assistant. You are a narrator who controls the story.
    - Choices must flow logically from your detailed narrative.
 
 ### JSON OUTPUT FORMAT
-{{
+{
   "narrative": "String. What happens (2-3 sentences).",
   "damage": Integer. Damage to player (positive number or 0),
   "heal": Integer. Healing for player (positive number or 0),
@@ -48,34 +90,69 @@ You are NOT a helpful assistant. You are a narrator who controls the story.
   "game_over": Boolean. True only if player dies or wins.,
   "exp_gain": Integer. Experience points gained (0-50).,
   "event_trigger": "String or null. Special event code like BOSS_DEFEATED, QUEST_COMPLETE."
-}}
+}
+
+"""
+
+# Varian saat LLM lambat (lihat services.degradation): narasi pendek agar muat
+# di max_tokens yang dikecilkan. Juga statis, jadi tetap bisa di-cache provider
+# (harus berbeda dari SYSTEM_PROMPT, dicek di test_prompt_prefix.py).
+SHORT_SYSTEM_PROMPT = SYSTEM_PROMPT.replace(
+    "   - LENGTH: The narrative MUST be at least 3 paragraphs long (approx. 50-200 words).\n",
+    "   - LENGTH: Keep the narrative SHORT: one vivid paragraph (approx. 30-70 words).\n"
+)
 
-### CURRENT STATE
+# State yang berubah setiap turn: dikirim SETELAH prefix statis
+STATE_PROMPT = """### CURRENT STATE
 - Player HP: {hp}/{max_hp}
 - Level: {level} (EXP: {exp})
 - Inventory: {inventory}
 - Location: {location}
 - Story Summary: {summary}
-
 """
 
+# Token prompt yang dilayani dari cache provider (usage.prompt_tokens_details.cached_tokens)
+llm_metrics = {
+    "calls": 0,
+    "prompt_tokens": 0,
+    "cached_tokens": 0,
+    "completion_tokens": 0
+}
+_llm_metrics_lock = threading.Lock()
+
 
-def build_context(session: Dict[str, Any], messages: List[Dict], action: str) -> List[Dict]:
-    """Build context for AI with sliding window + summary"""
+def build_context(session: Dict[str, Any], messages: List[Dict], action: str,
+                  lore: Optional[str] = None, memories: Optional[str] = None,
+                  short: bool = False) -> List[Dict]:
+    """
+    Build context for AI with sliding window + summary
+    (+ lore dari story card, + memori relevan dari turn yang diarsipkan).
+    Urutan: system prompt statis (prefix yang bisa di-cache provider), lalu
+    state + lore + memori, lalu history dan aksi. short: varian narasi pendek.
+    """
     
-    # Format system prompt with current state
-    system_content = SYSTEM_PROMPT.format(
+    # State saat ini (dinamis, setelah prefix statis)
+    state_content = STATE_PROMPT.format(
         hp=session["hp"],
         max_hp=session["max_hp"],
         level=session["level"],
         exp=session["exp"],
-        inventory=", ".join(session["inventory"]) if session["inventory"] else "Empty",
+        inventory=format_inventory(session["inventory"]),
         location=session["location"],
         summary=session["summary"] or "You just started your adventure."
     )
     
+    if lore:
+        state_content += f"\n### RELEVANT LORE\n{lore}\n"
+    
+    if memories:
+        state_content += f"\n### RECALLED MEMORIES (older turns)\n{memories}\n"
+    
     # Build conversation history (sliding window - last N messages)
-    conversation = [{"role": "system", "content": system_content}]
+    conversation = [
+        {"role": "system", "content": SHORT_SYSTEM_PROMPT if short else SYSTEM_PROMPT},
+        {"role": "system", "content": state_content}
+    ]
     
     for msg in messages:
         conversation.append({
@@ -89,73 +166,299 @@ def build_context(session: Dict[str, Any], messages: List[Dict], action: str) ->
     return conversation
 
 
+class NarrativeStreamParser:
+    """
+    Ekstrak isi field "narrative" dari JSON yang di-stream sebagian demi sebagian.
+    Setiap potongan teks narrative yang sudah ter-decode diteruskan ke callback,
+    sehingga client bisa menampilkan cerita sebelum JSON lengkap diterima.
+    """
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, on_chunk: Callable[[str], None]):
+        self.on_chunk = on_chunk
+        self._raw = ""
+        self._pos = 0
+        self._state = "search"  # search -> in_string -> done
+        self._escape = None      # None, "\\" atau "\\uXXXX" sebagian
+
+    def feed(self, text: str):
+        self._raw += text
+        if self._state == "search":
+            marker = self._raw.find('"narrative"')
+            if marker == -1:
+                return
+            colon = self._raw.find(":", marker + len('"narrative"'))
+            if colon == -1:
+                return
+            quote = self._raw.find('"', colon + 1)
+            if quote == -1:
+                return
+            self._pos = quote + 1
+            self._state = "in_string"
+
+        if self._state != "in_string":
+            return
+
+        out = []
+        while self._pos < len(self._raw):
+            char = self._raw[self._pos]
+            self._pos += 1
+            if self._escape is not None:
+                self._escape += char
+                if self._escape == "\\u" or (self._escape.startswith("\\u") and len(self._escape) < 6):
+                    continue
+                if self._escape.startswith("\\u"):
+                    out.append(chr(int(self._escape[2:], 16)))
+                else:
+                    out.append(self._ESCAPES.get(char, char))
+                self._escape = None
+            elif char == "\\":
+                self._escape = "\\"
+            elif char == '"':
+                self._state = "done"
+                break
+            else:
+                out.append(char)
+
+        if out:
+            self.on_chunk("".join(out))
+
+
+def _normalize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and set defaults"""
+    result.setdefault("narrative", "Something mysterious happens...")
+    result.setdefault("damage", 0)
+    result.setdefault("heal", 0)
+    result.setdefault("gain_item", None)
+    result.setdefault("lose_item", None)
+    result.setdefault("new_location", None)
+    result.setdefault("game_over", False)
+    result.setdefault("exp_gain", 0)
+    result.setdefault("event_trigger", None)
+    
+    # Ensure choices is valid
+    if not isinstance(result.get("choices"), list) or len(result.get("choices", [])) != 3:
+        result["choices"] = ["Continue exploring", "Look around", "Rest"]
+    
+    return result
+
+
+def _record_usage(usage) -> tuple:
+    """Catat usage ke llm_metrics; returns (total_tokens, cached_tokens)"""
+    if usage is None:
+        return None, None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+    with _llm_metrics_lock:
+        llm_metrics["calls"] += 1
+        llm_metrics["prompt_tokens"] += usage.prompt_tokens or 0
+        llm_metrics["cached_tokens"] += cached
+        llm_metrics["completion_tokens"] += usage.completion_tokens or 0
+    return usage.total_tokens, cached
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Token usage narrative call + rasio prompt token yang kena cache provider + status circuit"""
+    with _llm_metrics_lock:
+        stats = dict(llm_metrics)
+    prompt = stats["prompt_tokens"]
+    stats["cached_ratio"] = round(stats["cached_tokens"] / prompt, 4) if prompt else 0.0
+    stats["circuit"] = get_llm_circuit().stats()
+    return stats
+
+
+def warm_up():
+    """
+    Startup worker: buka koneksi HTTP (DNS + TLS) ke provider LLM sebelum
+    menerima traffic, agar turn pertama tidak menanggung biaya handshake.
+    """
+    settings = get_settings()
+    get_controller()
+    get_llm_circuit()
+    if not settings.LLM_WARMUP_ENABLED:
+        return
+    start = time.time()
+    try:
+        get_client().with_options(timeout=5.0, max_retries=0).models.list()
+        print(f"✅ LLM client warmed up in {int((time.time() - start) * 1000)}ms")
+    except Exception as e:
+        print(f"⚠️ LLM client warm-up failed: {e}")
+
+
+def get_degradation_stats() -> Dict[str, Any]:
+    """Level degradasi saat ini, max_tokens efektif, p50/p95 latency, antrean"""
+    return get_controller().stats()
+
+
+def _stream_completion(messages: List[Dict], on_chunk: Callable[[str], None], max_tokens: int) -> tuple:
+    """Streaming call; returns (full_output, total_tokens, cached_tokens)"""
+    settings = get_settings()
+    parser = NarrativeStreamParser(on_chunk)
+    parts = []
+    tokens_used = cached_tokens = None
+    
+    stream = get_client().chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=messages,
+        temperature=settings.TEMPERATURE,
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"},
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    for chunk in stream:
+        if chunk.usage:
+            tokens_used, cached_tokens = _record_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            parser.feed(delta)
+    
+    return "".join(parts), tokens_used, cached_tokens
+
+
 def process_action(action: str, session: Dict[str, Any], 
-                   recent_messages: List[Dict]) -> Dict[str, Any]:
-    """Process player action with LLM and return structured result"""
+                   recent_messages: List[Dict],
+                   on_chunk: Optional[Callable[[str], None]] = None,
+                   lore: Optional[str] = None,
+                   memories: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Process player action with LLM and return structured result.
+    Jika on_chunk diberikan, response di-stream dan potongan narrative
+    diteruskan ke on_chunk selama LLM masih menulis.
+    """
+    
+    settings = get_settings()
+    controller = get_controller()
+    llm_circuit = get_llm_circuit()
+    
+    # Circuit terbuka: jangan tunggu timeout provider
+    if not llm_circuit.allow():
+        return _fallback_result()
+    
+    # Level degradasi saat ini menentukan max_tokens & varian prompt
+    mode = controller.acquire()
     
     # Build context with sliding window
-    messages = build_context(session, recent_messages, action)
+    messages = build_context(session, recent_messages, action, lore=lore, memories=memories,
+                             short=mode["short_prompt"])
     
     start_time = time.time()
     
     try:
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=messages,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS,
-            response_format={"type": "json_object"}
-        )
+        if on_chunk is not None:
+            llm_output, tokens_used, cached_tokens = _stream_completion(messages, on_chunk, mode["max_tokens"])
+        else:
+            response = get_client().chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=messages,
+                temperature=settings.TEMPERATURE,
+                max_tokens=mode["max_tokens"],
+                response_format={"type": "json_object"}
+            )
+            tokens_used, cached_tokens = _record_usage(response.usage)
+            llm_output = response.choices[0].message.content
         
         latency_ms = int((time.time() - start_time) * 1000)
-        tokens_used = response.usage.total_tokens if response.usage else None
+        controller.release(latency_ms)
+        mode = None
+        llm_circuit.record_success()
         
         # Parse response
-        llm_output = response.choices[0].message.content
-        result = json.loads(llm_output)
-        
-        # Validate and set defaults
-        result.setdefault("narrative", "Something mysterious happens...")
-        result.setdefault("damage", 0)
-        result.setdefault("heal", 0)
-        result.setdefault("gain_item", None)
-        result.setdefault("lose_item", None)
-        result.setdefault("new_location", None)
-        result.setdefault("game_over", False)
-        result.setdefault("exp_gain", 0)
-        result.setdefault("event_trigger", None)
-        
-        # Ensure choices is valid
-        if not isinstance(result.get("choices"), list) or len(result.get("choices", [])) != 3:
-            result["choices"] = ["Continue exploring", "Look around", "Rest"]
+        result = _normalize_result(json.loads(llm_output))
         
         # Add metadata
         result["latency_ms"] = latency_ms
         result["tokens_used"] = tokens_used
+        result["cached_tokens"] = cached_tokens
         result["model_name"] = settings.OPENAI_MODEL
         
         return result
         
     except Exception as e:
         print(f"Error calling LLM: {e}")
+        if mode is not None:
+            # Gagal/timeout juga tanda tekanan: hitung waktu yang terpakai
+            controller.release((time.time() - start_time) * 1000)
+            llm_circuit.record_failure()
+        return _fallback_result()
+
+
+def _fallback_result() -> Dict[str, Any]:
+    """Hasil turn saat LLM gagal / circuit terbuka"""
+    return {
+        "narrative": "The world flickers... Something went wrong.",
+        "damage": 0,
+        "heal": 0,
+        "gain_item": None,
+        "lose_item": None,
+        "new_location": None,
+        "choices": ["Try again", "Look around", "Wait"],
+        "game_over": False,
+        "exp_gain": 0,
+        "event_trigger": None,
+        "latency_ms": 0,
+        "tokens_used": 0,
+        "cached_tokens": 0,
+        "model_name": get_settings().OPENAI_MODEL
+    }
+
+
+OPENING_PROMPT = """You are the narrator of a dark fantasy text RPG called "AI Dungeon".
+Write the OPENING scene of a new adventure from the scenario and character below.
+Immersive and sensory, 2 short paragraphs separated by '\\n\\n'. End at a moment that invites action.
+Output ONLY valid JSON: {"narrative": "...", "choices": ["Bold choice", "Cautious choice", "Risky choice"]}
+Choices must be short (1-3 words)."""
+
+DEFAULT_OPENING_CHOICES = ["Look around carefully", "Check your inventory", "Walk deeper into the cave"]
+
+
+def generate_opening(scenario: str, character: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Narasi pembuka + 3 pilihan untuk session baru (fallback ke teks statis jika LLM gagal)"""
+    settings = get_settings()
+    character = character or {}
+    identity = " ".join(filter(None, [character.get("race"), character.get("job_class")])) or "adventurer"
+    details = f"Scenario: {scenario}\nCharacter: {character.get('name') or 'Adventurer'}, a {identity}"
+    if character.get("background"):
+        details += f" with a {character['background']} background"
+    
+    try:
+        response = get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": OPENING_PROMPT},
+                {"role": "user", "content": details}
+            ],
+            temperature=max(settings.TEMPERATURE, 0.7),  # stok pool tidak boleh identik
+            max_tokens=settings.MAX_TOKENS,
+            response_format={"type": "json_object"}
+        )
+        data = json.loads(response.choices[0].message.content)
+        choices = [str(c) for c in data.get("choices") or []][:3]
         return {
-            "narrative": "The world flickers... Something went wrong.",
-            "damage": 0,
-            "heal": 0,
-            "gain_item": None,
-            "lose_item": None,
-            "new_location": None,
-            "choices": ["Try again", "Look around", "Wait"],
-            "game_over": False,
-            "exp_gain": 0,
-            "event_trigger": None,
-            "latency_ms": 0,
-            "tokens_used": 0,
-            "model_name": settings.OPENAI_MODEL
+            "narrative": str(data["narrative"]),
+            "choices": choices if len(choices) == 3 else DEFAULT_OPENING_CHOICES
+        }
+    except Exception as e:
+        print(f"Error generating opening: {e}")
+        return {
+            "narrative": f"{scenario} The air is damp and cold. You grip your rusty sword tightly.",
+            "choices": DEFAULT_OPENING_CHOICES
         }
 
 
-def generate_summary(messages: List[Dict]) -> str:
+def _bound_text(text: str, max_tokens: int) -> str:
+    """Potong teks ke perkiraan max_tokens (~4 karakter per token)"""
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "..."
+
+
+def generate_summary(messages: List[Dict], max_tokens: int = 150) -> str:
     """Generate a summary of old messages for long-term memory"""
     
     summary_prompt = """Summarize this RPG conversation history in 2-3 sentences. 
@@ -168,37 +471,82 @@ def generate_summary(messages: List[Dict]) -> str:
     ]
     
     try:
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
+        response = get_client().chat.completions.create(
+            model=get_settings().OPENAI_MODEL,
             messages=conversation,
             temperature=0.3,
-            max_tokens=150
+            max_tokens=max_tokens
         )
-        return response.choices[0].message.content.strip()
+        return _bound_text(response.choices[0].message.content.strip(), max_tokens)
     except Exception as e:
         print(f"Error generating summary: {e}")
         return "The adventure continues..."
 
 
+def merge_summaries(summaries: List[str], scope: str, max_tokens: int) -> str:
+    """
+    Gabungkan beberapa rangkuman (urut kronologis) menjadi satu rangkuman
+    level yang lebih tinggi (scope: "chapter" atau "saga").
+    """
+    
+    merge_prompt = f"""You maintain the {scope} summary of an RPG story.
+    Merge the following summaries (in chronological order) into ONE coherent {scope} summary.
+    Keep: major events, important NPCs and places, items that still matter, open quests.
+    Drop minor details. Stay under {max_tokens * 3 // 4} words. Output plain text only, no JSON."""
+    
+    conversation = [
+        {"role": "system", "content": merge_prompt},
+        {"role": "user", "content": "\n\n".join(f"[{i + 1}] {text}" for i, text in enumerate(summaries))}
+    ]
+    
+    try:
+        response = get_client().chat.completions.create(
+            model=get_settings().OPENAI_MODEL,
+            messages=conversation,
+            temperature=0.3,
+            max_tokens=max_tokens
+        )
+        return _bound_text(response.choices[0].message.content.strip(), max_tokens)
+    except Exception as e:
+        print(f"Error merging summaries: {e}")
+        return _bound_text(" ".join(summaries), max_tokens)
+
+
 def calculate_new_hp(current_hp: int, max_hp: int, damage: int, heal: int) -> int:
     """Calculate new HP with clamping"""
     new_hp = current_hp - damage + heal
     return max(0, min(max_hp, new_hp))
 
 
-def apply_inventory_changes(inventory: List[str], gain: str = None, lose: str = None) -> List[str]:
-    """Apply inventory changes"""
-    new_inventory = inventory.copy()
+def format_inventory(inventory: Dict[str, int]) -> str:
+    """Inventory untuk prompt, mis. "Rusty Sword, Arrow x20" """
+    if not inventory:
+        return "Empty"
+    return ", ".join(name if qty == 1 else f"{name} x{qty}" for name, qty in inventory.items())
+
+
+def apply_inventory_changes(inventory: Dict[str, int], gain: str = None, lose: str = None) -> Dict[str, int]:
+    """Apply inventory changes ({item: quantity}; item dengan quantity 0 dihapus)"""
+    new_inventory = dict(inventory)
     
     if gain:
-        new_inventory.append(gain)
+        new_inventory[gain] = new_inventory.get(gain, 0) + 1
     
     if lose and lose in new_inventory:
-        new_inventory.remove(lose)
+        new_inventory[lose] -= 1
+        if new_inventory[lose] <= 0:
+            del new_inventory[lose]
     
     return new_inventory
 
 
+def inventory_diff(old: Dict[str, int], new: Dict[str, int]) -> Dict[str, int]:
+    """Item yang berubah: {item: quantity baru}, 0 berarti item dihapus"""
+    diff = {name: qty for name, qty in new.items() if old.get(name) != qty}
+    diff.update({name: 0 for name in old if name not in new})
+    return diff
+
+
 def calculate_level_up(current_level: int, current_exp: int, exp_gain: int) -> tuple:
     """Calculate level progression. Returns (new_level, new_exp)"""
     new_exp = current_exp + exp_gain
@@ -0,0 +1,166 @@
+"""
+Idempotency untuk POST /game/action.
+
+Request dengan Idempotency-Key (atau nomor turn dari client) yang sama:
+- masih diproses  -> ikut menunggu hasil komputasi yang sama (single-flight)
+- sudah selesai   -> response yang tersimpan diputar ulang (TTL pendek)
+Duplikat tidak memanggil LLM dan tidak menulis apa pun ke database.
+Request yang gagal tidak disimpan sehingga boleh diulang.
+
+Dengan STORAGE_BACKEND=postgres, key diklaim di tabel idempotency_keys
+sehingga retry yang mendarat di worker lain juga diputar ulang; single-flight
+di memori tetap menjadi jalur cepat untuk duplikat di worker yang sama.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+import orjson
+
+from app.core.config import get_settings
+
+
+class IdempotencyMismatch(Exception):
+    """Key yang sama dipakai untuk request yang berbeda (HTTP 422)"""
+
+
+class IdempotencyInProgress(Exception):
+    """Request dengan key yang sama masih diproses worker lain terlalu lama (HTTP 409)"""
+
+
+class IdempotencyStore:
+    """Single-flight + replay store di memori, opsional dibagi antar worker lewat Postgres"""
+
+    # Klaim pending di Postgres: lebih lama dari turn LLM terlama
+    PENDING_SECONDS = 120.0
+    POLL_INTERVAL = 0.25
+    PURGE_INTERVAL = 600.0
+
+    def __init__(self, ttl_seconds: float, max_entries: int, shared: bool = False):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Entry yang sudah selesai urut deadline (TTL sama -> urutan selesai)
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+        self.metrics = {"executed": 0, "joined": 0, "replayed": 0, "mismatched": 0,
+                        "shared_joined": 0, "shared_replayed": 0}
+
+    def _purge(self, now: float):
+        """Buang entry kedaluwarsa dari depan antrean; entry yang masih diproses tidak ada di antrean"""
+        while self._expiry:
+            key, deadline = next(iter(self._expiry.items()))
+            if deadline > now and len(self._expiry) <= self.max_entries:
+                break
+            del self._expiry[key]
+            del self._entries[key]
+
+    def run(self, key: str, fingerprint: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (hasil, replayed). replayed True jika hasil berasal dari request lain."""
+        with self._lock:
+            self._purge(time.monotonic())
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = {"fingerprint": fingerprint, "done": threading.Event(),
+                         "result": None, "error": None, "replayed": False}
+                self._entries[key] = entry
+            elif entry["fingerprint"] != fingerprint:
+                self.metrics["mismatched"] += 1
+                raise IdempotencyMismatch("Idempotency key was already used for a different action")
+
+        if not owner:
+            self.metrics["replayed" if entry["done"].is_set() else "joined"] += 1
+            entry["done"].wait()
+            if entry["error"] is not None:
+                raise entry["error"]
+            return entry["result"], True
+
+        try:
+            if self.shared:
+                result, replayed = self._run_shared(key, fingerprint, compute)
+            else:
+                result, replayed = self._compute(compute), False
+        except Exception as e:
+            with self._lock:
+                entry["error"] = e
+                self._entries.pop(key, None)
+            entry["done"].set()
+            raise
+
+        with self._lock:
+            entry["result"] = result
+            entry["replayed"] = replayed
+            self._expiry[key] = time.monotonic() + self.ttl
+        entry["done"].set()
+        return result, replayed
+
+    def _compute(self, compute: Callable[[], Any]) -> Any:
+        self.metrics["executed"] += 1
+        return compute()
+
+    def _run_shared(self, key: str, fingerprint: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Klaim key di Postgres; worker lain yang memegang klaim ditunggu (polling)"""
+        from app.db import database
+        self._maybe_purge_shared()
+        deadline = time.monotonic() + self.PENDING_SECONDS
+        waited = False
+        while True:
+            claimed, stored_fingerprint, response = database.claim_idempotency_key(
+                key, fingerprint, self.PENDING_SECONDS)
+            if claimed:
+                try:
+                    result = self._compute(compute)
+                except Exception:
+                    database.release_idempotency_key(key)
+                    raise
+                database.complete_idempotency_key(key, orjson.dumps(result).decode(), self.ttl)
+                return result, False
+
+            if stored_fingerprint is not None and stored_fingerprint != fingerprint:
+                self.metrics["mismatched"] += 1
+                raise IdempotencyMismatch("Idempotency key was already used for a different action")
+            if response is not None:
+                self.metrics["shared_joined" if waited else "shared_replayed"] += 1
+                return orjson.loads(response), True
+            if time.monotonic() > deadline:
+                raise IdempotencyInProgress("Request with this idempotency key is still being processed")
+            waited = True
+            time.sleep(self.POLL_INTERVAL)
+
+    def _maybe_purge_shared(self):
+        from app.db import database
+        now = time.monotonic()
+        if now - self._last_purge > self.PURGE_INTERVAL:
+            self._last_purge = now
+            threading.Thread(target=database.purge_idempotency_keys, name="idempotency-purge",
+                             daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+            in_flight = size - len(self._expiry)
+        return dict(self.metrics, entries=size, in_flight=in_flight, ttl_seconds=self.ttl,
+                    shared=self.shared)
+
+
+_action_store: Optional[IdempotencyStore] = None
+_action_store_lock = threading.Lock()
+
+
+def get_action_store() -> IdempotencyStore:
+    """Store untuk POST /game/action, dibuat saat pertama dipakai (import modul ini tidak membaca Settings)"""
+    global _action_store
+    if _action_store is None:
+        with _action_store_lock:
+            if _action_store is None:
+                settings = get_settings()
+                # Tabel idempotency_keys hanya tersedia jika storage-nya Postgres
+                _action_store = IdempotencyStore(settings.IDEMPOTENCY_TTL_SECONDS,
+                                                 settings.IDEMPOTENCY_MAX_ENTRIES,
+                                                 shared=settings.STORAGE_BACKEND == "postgres")
+    return _action_store
@@ -0,0 +1,198 @@
+"""
+Story-card lore injection.
+
+Setiap turn, aksi pemain + narrative terakhir di-scan terhadap trigger keywords
+(story_cards.keys) memakai Aho-Corasick matcher per session. Matcher dikompilasi
+sekali, lalu diperbarui secara incremental saat card bertambah; hanya perubahan
+atau penghapusan card yang memicu rebuild penuh.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Set, Tuple, Optional
+
+from app.core.config import get_settings
+from app.db import database
+from app.services.world_state import WorldState
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton (case-insensitive, whole-word match)"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]  # (panjang pattern, card_id)
+        self._dirty = False
+
+    def add(self, keyword: str, card_id: str):
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(keyword), card_id))
+        self._dirty = True
+
+    def build(self):
+        """Hitung ulang failure links (BFS); trie yang ada tidak dibangun ulang"""
+        if not self._dirty:
+            return
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+        self._dirty = False
+
+    def search(self, text: str) -> Dict[str, int]:
+        """Return {card_id: jumlah kemunculan} untuk keyword yang muncul sebagai kata utuh"""
+        self.build()
+        text = text.lower()
+        hits: Dict[str, int] = {}
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            probe = node
+            while probe:
+                for length, card_id in self._out[probe]:
+                    start = index - length + 1
+                    before_ok = start == 0 or not text[start - 1].isalnum()
+                    after_ok = index + 1 == len(text) or not text[index + 1].isalnum()
+                    if before_ok and after_ok:
+                        hits[card_id] = hits.get(card_id, 0) + 1
+                probe = self._fail[probe]
+        return hits
+
+
+class LoreIndex:
+    """Card aktif + matcher untuk satu session"""
+
+    def __init__(self):
+        self.version = None
+        self.cards: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, Tuple[str, ...]] = {}
+        self.matcher = KeywordMatcher()
+        self.lock = threading.Lock()
+
+    def sync(self, cards: List[Dict[str, Any]], version: Any):
+        incoming = {str(card["id"]): card for card in cards}
+        incoming_keys = {cid: tuple(card.get("keys") or []) for cid, card in incoming.items()}
+
+        removed_or_changed = any(
+            cid not in incoming_keys or incoming_keys[cid] != keys
+            for cid, keys in self._keys.items()
+        )
+        if removed_or_changed:
+            self.matcher = KeywordMatcher()
+            added = incoming_keys
+        else:
+            added = {cid: keys for cid, keys in incoming_keys.items() if cid not in self._keys}
+
+        for cid, keys in added.items():
+            for keyword in keys:
+                self.matcher.add(keyword, cid)
+        self.matcher.build()
+
+        self.cards = incoming
+        self._keys = incoming_keys
+        self.version = version
+
+
+_indexes: "OrderedDict[str, LoreIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _get_index(session_id: str) -> LoreIndex:
+    max_indexes = get_settings().LORE_INDEX_CACHE_SIZE
+    with _indexes_lock:
+        index = _indexes.get(session_id)
+        if index is None:
+            index = LoreIndex()
+            _indexes[session_id] = index
+            while len(_indexes) > max_indexes:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(session_id)
+        return index
+
+
+def _estimate_tokens(text: str) -> int:
+    # Perkiraan kasar ~4 karakter per token
+    return len(text) // 4 + 1
+
+
+def select_lore(session_id: str, action: str, recent_messages: List[Dict],
+                world: Optional[WorldState] = None) -> List[Dict[str, Any]]:
+    """
+    Pilih story card yang ter-trigger oleh aksi + narrative terakhir.
+    once_only card dicatat di world_state ("seen_card_<id>") dan tidak diulang;
+    penanda ditulis ke `world` (di-flush oleh pemanggil) atau langsung jika None.
+    Total deskripsi dibatasi LORE_TOKEN_BUDGET.
+    """
+    settings = get_settings()
+    index = _get_index(session_id)
+
+    with index.lock:
+        version = database.get_story_cards_version(session_id)
+        if version != index.version:
+            # Versi dihitung dari card yang benar-benar dimuat (bisa dari read
+            # replica yang tertinggal), sehingga index yang basi disinkron ulang
+            cards = database.get_story_cards(session_id)
+            index.sync(cards, (len(cards), max((card["created_at"] for card in cards), default=None)))
+        if not index.cards:
+            return []
+
+        narrative = [m["content"] for m in recent_messages if m["role"] == "assistant"][-2:]
+        hits = index.matcher.search("\n".join(narrative + [action]))
+        cards = index.cards
+
+    # Card yang paling sering disebut didahulukan
+    ranked = sorted(hits.items(), key=lambda item: -item[1])
+
+    own_world = world is None
+    if own_world:
+        world = WorldState(session_id)
+
+    selected = []
+    budget = settings.LORE_TOKEN_BUDGET
+    for card_id, _ in ranked:
+        card = cards[card_id]
+        if card.get("once_only") and f"seen_card_{card_id}" in world:
+            continue
+        cost = _estimate_tokens(card["description"])
+        if cost > budget:
+            continue
+        budget -= cost
+        selected.append(card)
+
+    for card in selected:
+        if card.get("once_only"):
+            world.set(f"seen_card_{card['id']}", {"seen": True}, related_card_id=str(card["id"]))
+    if own_world:
+        world.flush()
+    return selected
+
+
+def format_lore(cards: List[Dict[str, Any]]) -> Optional[str]:
+    """Blok lore untuk system prompt"""
+    if not cards:
+        return None
+    lines = [f"- {card['title']} ({card.get('type') or 'LORE'}): {card['description']}" for card in cards]
+    return "\n".join(lines)
@@ -0,0 +1,138 @@
+"""
+Long-term memory berbasis embedding lokal (CPU-only).
+
+Turn yang diarsipkan saat auto-summarize di-embed dengan hashing vectorizer
+(tanpa model/network), disimpan di tabel memory_vectors, dan dimuat ke index
+NumPy per session. Setiap turn, aksi pemain dipakai sebagai query untuk
+mengambil top-k memori paling relevan (cosine similarity, vectorized).
+"""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict, Counter
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.db import database
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def embed(text: str, dim: int) -> np.ndarray:
+    """
+    Hashing embedder: unigram + bigram di-hash (crc32, stabil antar proses)
+    ke `dim` bucket dengan tanda +/-, bobot 1 + log(tf), lalu L2-normalized.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, count in features.items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vector[h % dim] += sign * (1.0 + np.log(count))
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class MemoryIndex:
+    """Matrix embedding (n x dim) untuk satu session; tumbuh secara incremental"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.size = 0
+        self.entries: List[Dict[str, Any]] = []
+        self.last_turn_order = 0
+        self.lock = threading.Lock()
+
+    def add(self, vectors: np.ndarray, entries: List[Dict[str, Any]]):
+        needed = self.size + len(entries)
+        if needed > len(self.matrix):
+            # Kapasitas digandakan agar append tidak menyalin matrix setiap turn
+            grown = np.zeros((max(needed, 2 * len(self.matrix), 16), self.dim), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+        self.matrix[self.size:needed] = vectors
+        self.size = needed
+        self.entries.extend(entries)
+        self.last_turn_order = max(self.last_turn_order, max(e["turn_order"] for e in entries))
+
+    def search(self, query: np.ndarray, k: int, min_score: float) -> List[Dict[str, Any]]:
+        if self.size == 0 or k <= 0:
+            return []
+        scores = self.matrix[:self.size] @ query
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.entries[i], score=float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+_indexes: "OrderedDict[str, MemoryIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _get_index(session_id: str) -> MemoryIndex:
+    settings = get_settings()
+    with _indexes_lock:
+        index = _indexes.get(session_id)
+        if index is None:
+            index = MemoryIndex(settings.MEMORY_EMBED_DIM)
+            _indexes[session_id] = index
+            while len(_indexes) > settings.MEMORY_INDEX_CACHE_SIZE:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(session_id)
+        return index
+
+
+def _refresh(session_id: str, index: MemoryIndex):
+    """Muat embedding baru dari database (mis. diarsipkan oleh worker lain)"""
+    rows = database.get_memory_vectors(session_id, after_turn_order=index.last_turn_order)
+    if not rows:
+        return
+    vectors = np.stack([
+        np.frombuffer(bytes(row["embedding"]), dtype=np.float16).astype(np.float32)
+        for row in rows
+    ])
+    index.add(vectors, [{"turn_order": row["turn_order"], "role": row["role"],
+                         "content": row["content"]} for row in rows])
+
+
+def archive_messages(session_id: str, messages: List[Dict[str, Any]]) -> int:
+    """Embed pesan yang akan dihapus dari sliding window dan simpan ke long-term memory"""
+    if not messages:
+        return 0
+    dim = get_settings().MEMORY_EMBED_DIM
+    vectors = np.stack([embed(m["content"], dim) for m in messages])
+
+    rows = [(m["sequence"], m["role"], m["content"], vector.astype(np.float16).tobytes())
+            for m, vector in zip(messages, vectors)]
+    return database.add_memory_vectors(session_id, rows)
+
+
+def recall(session_id: str, query_text: str) -> List[Dict[str, Any]]:
+    """Top-k memori paling relevan untuk query (biasanya aksi pemain)"""
+    settings = get_settings()
+    if settings.MEMORY_TOP_K <= 0:
+        return []
+
+    index = _get_index(session_id)
+    with index.lock:
+        _refresh(session_id, index)
+        return index.search(embed(query_text, index.dim), settings.MEMORY_TOP_K,
+                            settings.MEMORY_MIN_SCORE)
+
+
+def format_memories(memories: List[Dict[str, Any]]) -> Optional[str]:
+    """Blok memori untuk system prompt (urut kronologis)"""
+    if not memories:
+        return None
+    ordered = sorted(memories, key=lambda m: m["turn_order"])
+    return "\n".join(f"- [{m['role']}] {m['content']}" for m in ordered)
@@ -0,0 +1,97 @@
+"""
+Garbage collector untuk session yang ditinggalkan.
+
+Setiap /game/new membuat baris di game_sessions, characters, inventory_items,
+chat history, dst. GC ini menghapus session yang idle melewati SESSION_TTL_HOURS
+(berdasarkan updated_at) dalam batch kecil; data turunan ikut terhapus lewat
+ON DELETE CASCADE. Jumlah batch per putaran dibatasi agar tidak membebani DB.
+"""
+
+import threading
+import time
+from typing import Dict, Any
+
+from app.core.config import get_settings
+from app.db import database
+
+gc_metrics = {
+    "runs": 0,
+    "batches": 0,
+    "sessions_purged": 0,
+    "last_run_at": None,
+    "last_run_purged": 0,
+    "last_duration_ms": 0,
+    "last_error": None
+}
+_gc_lock = threading.Lock()
+_gc_thread = None
+
+
+def run_gc(dry_run: bool = False) -> Dict[str, Any]:
+    """Satu putaran GC. dry_run hanya melaporkan apa yang akan dihapus."""
+    settings = get_settings()
+    report = database.count_idle_sessions(settings.SESSION_TTL_HOURS)
+    report.update({
+        "dry_run": dry_run,
+        "ttl_hours": settings.SESSION_TTL_HOURS,
+        "max_per_run": settings.SESSION_GC_BATCH_SIZE * settings.SESSION_GC_MAX_BATCHES
+    })
+    if dry_run:
+        return report
+
+    # Satu putaran per worker pada satu waktu
+    if not _gc_lock.acquire(blocking=False):
+        report["skipped"] = "GC already running"
+        return report
+
+    start = time.time()
+    purged = 0
+    try:
+        for batch in range(settings.SESSION_GC_MAX_BATCHES):
+            ids = database.purge_idle_sessions(settings.SESSION_TTL_HOURS, settings.SESSION_GC_BATCH_SIZE)
+            gc_metrics["batches"] += 1
+            purged += len(ids)
+            if len(ids) < settings.SESSION_GC_BATCH_SIZE:
+                break
+            time.sleep(settings.SESSION_GC_BATCH_PAUSE)
+        gc_metrics["last_error"] = None
+    except Exception as e:
+        gc_metrics["last_error"] = str(e)
+        raise
+    finally:
+        gc_metrics["runs"] += 1
+        gc_metrics["sessions_purged"] += purged
+        gc_metrics["last_run_at"] = time.time()
+        gc_metrics["last_run_purged"] = purged
+        gc_metrics["last_duration_ms"] = int((time.time() - start) * 1000)
+        _gc_lock.release()
+
+    report["purged"] = purged
+    return report
+
+
+def _gc_loop():
+    interval = get_settings().SESSION_GC_INTERVAL_SECONDS
+    while True:
+        time.sleep(interval)
+        try:
+            report = run_gc()
+            if report.get("purged"):
+                print(f"🧹 Session GC purged {report['purged']} idle sessions")
+        except Exception as e:
+            print(f"❌ Session GC failed: {e}")
+
+
+def start_session_gc():
+    """Start background thread GC (sekali per worker)"""
+    global _gc_thread
+    if not get_settings().SESSION_GC_ENABLED or _gc_thread is not None:
+        return
+    _gc_thread = threading.Thread(target=_gc_loop, name="session-gc", daemon=True)
+    _gc_thread.start()
+
+
+def get_gc_stats() -> Dict[str, Any]:
+    stats = dict(gc_metrics)
+    stats["enabled"] = get_settings().SESSION_GC_ENABLED
+    return stats
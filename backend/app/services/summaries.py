@@ -0,0 +1,71 @@
+"""
+Hierarchical rolling summaries: chunk -> chapter -> saga.
+
+- chunk:   rangkuman 10 pesan tertua yang keluar dari sliding window
+- chapter: gabungan maksimal SUMMARY_CHUNKS_PER_CHAPTER chunk; dihitung ulang
+           hanya saat chunk di dalamnya bertambah
+- saga:    gabungan incremental (saga lama + chapter yang baru ditutup);
+           dihitung ulang hanya saat sebuah chapter ditutup
+
+Setiap level dibatasi ukurannya, sehingga blok memori di prompt berukuran tetap
+berapa pun panjang session. Blok gabungan disimpan di game_sessions.summary.
+"""
+
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.db import database
+from app.services.game_engine import generate_summary, merge_summaries
+
+
+def add_chunk(session_id: str, messages: List[Dict]) -> str:
+    """Rangkum pesan menjadi chunk baru, perbarui level di atasnya, return blok memori"""
+    settings = get_settings()
+    per_chapter = settings.SUMMARY_CHUNKS_PER_CHAPTER
+
+    last_chunk = database.get_last_story_summary(session_id, "chunk")
+    chunk_idx = last_chunk["idx"] + 1 if last_chunk else 0
+    chunk_text = generate_summary(messages, max_tokens=settings.SUMMARY_CHUNK_TOKENS)
+    database.upsert_story_summary(session_id, "chunk", chunk_idx, chunk_text, len(messages))
+
+    # Chapter yang berisi chunk ini berubah -> hitung ulang dari chunk-nya saja
+    chapter_idx = chunk_idx // per_chapter
+    chunks = database.get_story_summaries(
+        session_id, "chunk", chapter_idx * per_chapter, chunk_idx
+    )
+    if len(chunks) == 1:
+        chapter_text = chunk_text
+    else:
+        chapter_text = merge_summaries([c["content"] for c in chunks], "chapter",
+                                       settings.SUMMARY_CHAPTER_TOKENS)
+    database.upsert_story_summary(session_id, "chapter", chapter_idx, chapter_text, len(chunks))
+
+    saga = database.get_last_story_summary(session_id, "saga")
+    chapter_closed = len(chunks) == per_chapter
+    if chapter_closed:
+        # Saga hanya berubah saat chapter ditutup: saga lama + chapter tersebut
+        if saga:
+            saga_text = merge_summaries([saga["content"], chapter_text], "saga",
+                                        settings.SUMMARY_SAGA_TOKENS)
+        else:
+            saga_text = chapter_text
+        database.upsert_story_summary(session_id, "saga", 0, saga_text, chapter_idx + 1)
+        saga = {"content": saga_text}
+
+    return compose_memory(
+        saga["content"] if saga else None,
+        None if chapter_closed else chapter_text,
+        chunk_text if len(chunks) > 1 else None
+    )
+
+
+def compose_memory(saga: Optional[str], chapter: Optional[str], latest: Optional[str]) -> str:
+    """Blok memori multi-resolusi untuk prompt (saga -> chapter berjalan -> kejadian terakhir)"""
+    parts = []
+    if saga:
+        parts.append(f"[Saga so far] {saga}")
+    if chapter:
+        parts.append(f"[Current chapter] {chapter}")
+    if latest:
+        parts.append(f"[Most recent] {latest}")
+    return "\n".join(parts) or "The adventure continues..."
@@ -0,0 +1,191 @@
+"""
+Satu giliran (turn) permainan: dipakai bersama oleh POST /game/action
+dan WebSocket /game/{id}/ws.
+"""
+
+from typing import Dict, Any, Callable, Optional
+
+from app.core import lifecycle
+from app.db import database
+from app.services.lore import select_lore, format_lore
+from app.services.world_state import WorldState
+from app.services.memory import recall, format_memories, archive_messages
+from app.services.summaries import add_chunk
+from app.services.game_engine import (
+    process_action, calculate_new_hp, apply_inventory_changes,
+    inventory_diff, calculate_level_up
+)
+
+
+# Lease turn per session: aksi kedua ditolak (409) sebelum LLM dipanggil.
+# Lebih lama dari turn LLM terlama; commit_turn tetap mengecek lock + version.
+TURN_LEASE_SECONDS = 120.0
+
+turn_stats = {"in_flight_rejected": 0}
+
+# Lease summary per session: cukup lama untuk panggilan LLM summary; hanya
+# berpengaruh jika worker pemegang lease crash sebelum melepasnya
+SUMMARIZE_LEASE_SECONDS = 300.0
+
+
+class TurnError(Exception):
+    """Error yang diteruskan ke client (status_code mengikuti HTTP)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def run_turn(session_id: str, action: str,
+             on_chunk: Optional[Callable[[str], None]] = None,
+             expected_turn: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Jalankan satu turn (lihat _play_turn). Saat worker drain (SIGTERM) turn
+    baru ditolak dengan 503; turn yang sudah berjalan ditunggu sampai selesai.
+    Turn lain yang sedang berjalan untuk session ini (worker mana pun) -> 409
+    tanpa panggilan LLM.
+    """
+    try:
+        with lifecycle.track_turn():
+            with database.try_lease(f"turn:{session_id}", TURN_LEASE_SECONDS) as acquired:
+                if not acquired:
+                    turn_stats["in_flight_rejected"] += 1
+                    raise TurnError(409, "Another action for this session is in progress")
+                return _play_turn(session_id, action, on_chunk, expected_turn)
+    except lifecycle.ShuttingDown as e:
+        raise TurnError(503, str(e))
+
+
+def _play_turn(session_id: str, action: str,
+               on_chunk: Optional[Callable[[str], None]] = None,
+               expected_turn: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Proses satu aksi pemain: panggil LLM, hitung state baru, lalu simpan
+    pesan user + response AI + state dalam satu transaksi (commit_turn).
+    Aksi paralel pada session yang sama -> TurnError 409, bukan lost update.
+    Return state baru + delta-nya (inventory_diff: {item: quantity baru}, 0 = dihapus).
+    expected_turn (nomor turn dari client) yang tidak cocok -> TurnError 409
+    sebelum LLM dipanggil.
+    """
+
+    # Get current session
+    session = database.get_session(session_id)
+    if not session:
+        raise TurnError(404, "Session not found")
+
+    if session["game_over"]:
+        raise TurnError(400, "Game is over")
+
+    # Retry dari turn yang sudah diproses (mis. oleh worker lain): tanpa LLM, tanpa write
+    if expected_turn is not None and expected_turn != session["turn_count"] + 1:
+        raise TurnError(409, f"Turn {expected_turn} does not match next turn {session['turn_count'] + 1}")
+
+    # Get recent messages for context (sliding window); aksi ini ditambahkan oleh build_context
+    recent_messages = database.get_messages(session_id, limit=15)
+
+    # Flag dunia untuk turn ini (dimuat sekali, ditulis sekali di akhir turn)
+    world = WorldState(session_id)
+
+    # Story card yang ter-trigger oleh aksi / narrative terakhir
+    lore = format_lore(select_lore(session_id, action, recent_messages, world=world))
+
+    # Memori jangka panjang yang relevan dengan aksi ini
+    memories = format_memories(recall(session_id, action))
+
+    # Process with AI
+    ai_result = process_action(action, session, recent_messages, on_chunk=on_chunk,
+                               lore=lore, memories=memories)
+
+    # Calculate new state (Python logic, not AI)
+    new_hp = calculate_new_hp(
+        session["hp"], session["max_hp"],
+        ai_result["damage"], ai_result["heal"]
+    )
+
+    new_inventory = apply_inventory_changes(
+        session["inventory"],
+        ai_result["gain_item"],
+        ai_result["lose_item"]
+    )
+
+    inventory_changes = inventory_diff(session["inventory"], new_inventory)
+
+    new_level, new_exp = calculate_level_up(
+        session["level"], session["exp"], ai_result["exp_gain"]
+    )
+
+    new_location = ai_result["new_location"] or session["location"]
+    game_over = ai_result["game_over"] or new_hp <= 0
+
+    # Save user action + AI response + new state (atomic, version-checked)
+    try:
+        saved = database.commit_turn(
+            session_id,
+            session["version"],
+            action,
+            ai_result["narrative"],
+            hp=new_hp,
+            inventory_diff=inventory_changes,
+            location=new_location,
+            level=new_level,
+            exp=new_exp,
+            turn_count=session["turn_count"] + 1,
+            last_event_trigger=ai_result.get("event_trigger"),
+            game_over=game_over
+        )
+    except database.SessionConflict as e:
+        raise TurnError(409, str(e))
+    world.flush()
+
+    return {
+        "narrative": ai_result["narrative"],
+        "hp": new_hp,
+        "hp_change": -ai_result["damage"] + ai_result["heal"],
+        "inventory": new_inventory,
+        "inventory_diff": inventory_changes,
+        "location": new_location,
+        "choices": ai_result["choices"],
+        "game_over": game_over,
+        "level": new_level,
+        "exp": new_exp,
+        "exp_gain": ai_result["exp_gain"],
+        "turn_count": session["turn_count"] + 1,
+        "user_seq": saved["user_seq"],
+        "assistant_seq": saved["assistant_seq"]
+    }
+
+
+def maybe_summarize(session_id: str) -> Optional[str]:
+    """
+    Auto-summarize if too many messages. Return summary baru, None jika tidak
+    perlu atau summary session ini sedang dibuat (POST / WebSocket lain).
+    """
+    if database.get_message_count(session_id) <= 20:
+        return None
+
+    # Dua summary paralel membaca pesan yang sama -> chunk & memory vector ganda
+    with database.try_lease(f"summarize:{session_id}", SUMMARIZE_LEASE_SECONDS) as acquired:
+        if not acquired:
+            return None
+        return _summarize(session_id)
+
+
+def _summarize(session_id: str) -> Optional[str]:
+    # Dihitung ulang di dalam lease: summary sebelumnya mungkin baru saja mengarsipkan
+    message_count = database.get_message_count(session_id)
+    if message_count <= 20:
+        return None
+
+    all_messages = database.get_messages(session_id, limit=message_count)
+    # Tepat pesan yang akan diarsipkan: tidak ada yang keluar dari history tanpa masuk chunk
+    old_messages = all_messages[:-10]
+    new_summary = add_chunk(session_id, old_messages)
+    database.update_session(session_id, summary=new_summary)
+
+    # Pesan yang keluar dari sliding window tetap bisa di-recall lewat embedding.
+    # Idempoten per turn: crash sebelum archive_old_messages tidak menggandakan memori
+    archive_messages(session_id, old_messages)
+    # Turn yang selesai selama summary dibuat menambah pesan; yang belum dirangkum tidak ikut diarsipkan
+    database.archive_old_messages(session_id, keep_last=10, max_turn_order=old_messages[-1]["sequence"])
+    return new_summary
@@ -0,0 +1,155 @@
+"""
+Warm pool untuk /game/new.
+
+Background thread menjaga stok session siap pakai per (skenario, preset):
+baris game_sessions/characters/inventory + narasi pembuka dari LLM sudah
+dibuat, dan response /game/new sudah dirender di session_pool.payload.
+/game/new cukup mengklaim satu baris (SKIP LOCKED, satu round trip), lalu
+meminta refill secara async hingga WARM_POOL_SIZE per key.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, Tuple
+
+from app.core.config import get_settings
+from app.db import database
+from app.models.serialization import session_payload
+from app.services.character import build_character
+from app.services.game_engine import generate_opening
+
+# Inventory awal setiap session baru
+STARTING_INVENTORY = {"Rusty Sword": 1, "Torch": 1, "Rations": 3}
+
+# Lease (database.try_lease): hanya satu worker yang mengisi pool pada satu
+# waktu, tanpa menahan koneksi pool selama narasi pembuka dibuat oleh LLM.
+# Lease yang kedaluwarsa di tengah refill paling buruk membuat stok sedikit lebih.
+REFILL_LEASE_KEY = "warm_pool:refill"
+REFILL_LEASE_SECONDS = 600.0
+
+pool_metrics = {
+    "claims": 0,
+    "misses": 0,
+    "created": 0,
+    "refill_runs": 0,
+    "last_refill_at": None,
+    "last_refill_ms": 0,
+    "last_error": None
+}
+_refill_event = threading.Event()
+_refill_thread = None
+
+
+def pool_key(scenario: str, race: Optional[str] = None, job_class: Optional[str] = None,
+             background: Optional[str] = None) -> str:
+    digest = hashlib.sha1(scenario.encode("utf-8")).hexdigest()[:16]
+    return f"{race or ''}/{job_class or ''}/{background or ''}/{digest}"
+
+
+def _targets() -> Dict[str, Tuple[str, str, str, str]]:
+    """Semua kombinasi yang distok: {pool_key: (scenario, race, class, background)}"""
+    settings = get_settings()
+    targets = {}
+    for scenario in settings.WARM_POOL_SCENARIOS:
+        for combo in settings.WARM_POOL_CHARACTERS:
+            race, job_class, background = (combo.split("/") + ["", "", ""])[:3]
+            targets[pool_key(scenario, race, job_class, background)] = (scenario, race, job_class, background)
+    return targets
+
+
+def is_pooled(key: str) -> bool:
+    settings = get_settings()
+    return settings.WARM_POOL_ENABLED and settings.WARM_POOL_SIZE > 0 and key in _targets()
+
+
+def claim(key: str, player_name: str) -> Optional[Dict[str, Any]]:
+    """Payload /game/new dari pool, None jika key tidak distok atau pool sedang kosong"""
+    if not is_pooled(key):
+        return None
+    payload = database.claim_pooled_session(key, player_name)
+    if payload is None:
+        pool_metrics["misses"] += 1
+    else:
+        pool_metrics["claims"] += 1
+    request_refill()
+    return payload
+
+
+def _create(key: str, scenario: str, race: str, job_class: str, background: str):
+    character = build_character(None, race or None, job_class or None, background or None)
+    opening = generate_opening(scenario, character)
+
+    session_id = str(uuid.uuid4())
+    session = database.new_session_state(session_id, STARTING_INVENTORY, character)
+    messages = [{"role": "assistant", "content": opening["narrative"], "choices_options": None}]
+    payload = session_payload(session, messages, opening["choices"])
+
+    database.add_pooled_session(session_id, key, STARTING_INVENTORY, character,
+                                opening["narrative"], payload)
+    pool_metrics["created"] += 1
+
+
+def refill() -> int:
+    """Isi pool sampai watermark; return jumlah session yang dibuat"""
+    settings = get_settings()
+    targets = _targets()
+    created = 0
+    start = time.time()
+    with database.try_lease(REFILL_LEASE_KEY, REFILL_LEASE_SECONDS) as acquired:
+        if not acquired:
+            return 0
+        try:
+            for key, (scenario, race, job_class, background) in targets.items():
+                # Dihitung per key: klaim selama refill berjalan ikut terlihat
+                deficit = settings.WARM_POOL_SIZE - database.count_pooled_sessions().get(key, 0)
+                for _ in range(deficit):
+                    _create(key, scenario, race, job_class, background)
+                    created += 1
+            pool_metrics["last_error"] = None
+        except Exception as e:
+            pool_metrics["last_error"] = str(e)
+            raise
+        finally:
+            pool_metrics["refill_runs"] += 1
+            pool_metrics["last_refill_at"] = time.time()
+            pool_metrics["last_refill_ms"] = int((time.time() - start) * 1000)
+    return created
+
+
+def request_refill():
+    """Bangunkan thread refill (tidak memblok request)"""
+    _refill_event.set()
+
+
+def _refill_loop():
+    interval = get_settings().WARM_POOL_REFILL_INTERVAL
+    while True:
+        _refill_event.wait(timeout=interval)
+        _refill_event.clear()
+        try:
+            created = refill()
+            if created:
+                print(f"🔥 Warm pool refilled with {created} sessions")
+        except Exception as e:
+            print(f"❌ Warm pool refill failed: {e}")
+
+
+def start_warm_pool():
+    """Start background thread refill (sekali per worker) dan isi pool segera"""
+    global _refill_thread
+    settings = get_settings()
+    if not settings.WARM_POOL_ENABLED or settings.WARM_POOL_SIZE <= 0 or _refill_thread is not None:
+        return
+    _refill_thread = threading.Thread(target=_refill_loop, name="warm-pool", daemon=True)
+    _refill_thread.start()
+    request_refill()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    stats = dict(pool_metrics)
+    stats["enabled"] = get_settings().WARM_POOL_ENABLED
+    stats["watermark"] = get_settings().WARM_POOL_SIZE
+    stats["available"] = database.count_pooled_sessions()
+    return stats
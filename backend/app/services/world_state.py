@@ -0,0 +1,50 @@
+"""
+World state per turn.
+
+WorldState memuat semua flag session (world_state) sekali saat pertama
+diakses, melayani baca/tulis dari dict di memori, dan mencatat key yang
+berubah. flush() menulis semua perubahan dalam satu multi-row upsert.
+"""
+
+from typing import Dict, Any, Optional
+
+from app.db import database
+
+
+class WorldState:
+    """View {entity_key: state} untuk satu session selama satu turn"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self._states: Optional[Dict[str, Dict]] = None
+        self._dirty: Dict[str, Optional[str]] = {}  # entity_key -> related_card_id
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._states is None:
+            self._states = database.get_world_state_map(self.session_id)
+        return self._states
+
+    def get(self, entity_key: str, default: Any = None) -> Any:
+        return self._load().get(entity_key, default)
+
+    def __contains__(self, entity_key: str) -> bool:
+        return entity_key in self._load()
+
+    def set(self, entity_key: str, state: Dict, related_card_id: str = None):
+        self._load()[entity_key] = state
+        if related_card_id is not None or entity_key not in self._dirty:
+            self._dirty[entity_key] = related_card_id
+
+    @property
+    def dirty_keys(self):
+        return set(self._dirty)
+
+    def flush(self) -> int:
+        """Tulis key yang berubah (satu statement); return jumlah key"""
+        if not self._dirty:
+            return 0
+        states = {key: self._states[key] for key in self._dirty}
+        related = {key: card_id for key, card_id in self._dirty.items() if card_id}
+        count = database.set_world_states(self.session_id, states, related)
+        self._dirty.clear()
+        return count
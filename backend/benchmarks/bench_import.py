@@ -0,0 +1,103 @@
+"""
+Benchmark: import time (cold start) dengan budget.
+
+Menjalankan `python -X importtime -c "import <module>"` di proses baru
+(beberapa kali, diambil yang tercepat), mem-parse outputnya, lalu mencetak
+total waktu import dan package yang paling mahal. Gagal (exit 1) jika total
+melewati budget atau modul yang seharusnya lazy ikut ter-import (openai,
+psycopg2), sehingga bisa dipasang sebagai langkah CI. Proses diukur tanpa
+OPENAI_API_KEY, jadi import yang membaca Settings ikut gagal.
+
+Jalankan dari folder backend:
+    python -m benchmarks.bench_import
+
+Env opsional: IMPORT_BUDGET_MS (app.main, default 1500),
+DATABASE_IMPORT_BUDGET_MS (app.db.database, default 1000),
+ENGINE_IMPORT_BUDGET_MS (game_engine, default 300), IMPORT_RUNS (default 3)
+"""
+
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+RUNS = int(os.environ.get("IMPORT_RUNS", "3"))
+
+# module -> (budget ms, package yang TIDAK boleh ter-import saat import module)
+# Import juga tidak boleh membaca Settings: proses diukur tanpa OPENAI_API_KEY (lihat import_times)
+TARGETS = {
+    "app.main": (float(os.environ.get("IMPORT_BUDGET_MS", "1500")), ["openai", "psycopg2"]),
+    "app.db.database": (float(os.environ.get("DATABASE_IMPORT_BUDGET_MS", "1000")), ["psycopg2"]),
+    "app.services.game_engine": (float(os.environ.get("ENGINE_IMPORT_BUDGET_MS", "300")), ["openai", "psycopg2"]),
+}
+TOP_N = 10
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """[(nama modul, self us, cumulative us)] dari satu proses baru"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Settings mewajibkan OPENAI_API_KEY: tanpa env ini (dan tanpa .env) import yang membaca Settings gagal
+    env = {name: value for name, value in os.environ.items() if name != "OPENAI_API_KEY"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir, capture_output=True, text=True, env=env
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Total self time per top-level package"""
+    totals = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+
+def run_benchmark():
+    print("=" * 60)
+    print(f"IMPORT TIME BENCHMARK (best of {RUNS})")
+    print("=" * 60)
+
+    failures = []
+    for module, (budget_ms, forbidden) in TARGETS.items():
+        best = None
+        for _ in range(RUNS):
+            rows = import_times(module)
+            total_us = sum(self_us for _, self_us, _ in rows)
+            if best is None or total_us < best[0]:
+                best = (total_us, rows)
+        total_us, rows = best
+        total_ms = total_us / 1000
+
+        status = "✅" if total_ms <= budget_ms else "❌"
+        print(f"\n{status} import {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms, {len(rows)} modules)")
+        for package, self_us in sorted(by_package(rows).items(), key=lambda kv: -kv[1])[:TOP_N]:
+            print(f"   {package:<24} {self_us / 1000:>8.1f} ms")
+
+        if total_ms > budget_ms:
+            failures.append(f"import {module} took {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        loaded = {name.split(".")[0] for name, _, _ in rows}
+        for package in forbidden:
+            if package in loaded:
+                failures.append(f"import {module} eagerly imports {package}")
+
+    print("\n" + "=" * 60)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Import time within budget")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,99 @@
+"""
+Benchmark: waktu query per turn dengan vs tanpa named prepared statements.
+
+Menjalankan jalur database satu turn (load session, chat history, commit
+turn dengan perubahan HP + inventory) berulang kali terhadap Postgres lokal,
+sekali dengan prepared statements dan sekali dengan SQL biasa. Session cache
+dimatikan agar setiap turn benar-benar ke database. Di akhir, "Planning Time"
+dari EXPLAIN (SUMMARY) setiap statement satu turn dijumlahkan: itulah biaya
+parse/plan yang dibayar setiap turn tanpa prepared statements.
+
+Jalankan dari folder backend (database dengan skema dari init.sql):
+    docker compose up -d db
+    POSTGRES_SERVER=localhost python -m benchmarks.bench_prepared
+
+Env opsional: BENCH_TURNS (default 500)
+"""
+
+import os
+import time
+import uuid
+
+from app.db import database, prepared
+from app.db.migrate import apply_migrations
+
+TURNS = int(os.environ.get("BENCH_TURNS", "500"))
+
+
+def play_turns(session_id: str, turns: int) -> float:
+    """Return ms per turn"""
+    start = time.perf_counter()
+    for i in range(turns):
+        session = database._load_session(session_id)
+        database.get_chat_history(session_id, limit=20)
+        database.commit_turn(session_id, session["version"], f"action {i}", f"narrative {i}",
+                             hp=100 - i % 10, turn_count=session["turn_count"] + 1,
+                             inventory_diff={"Arrow": i % 20 + 1})
+    return (time.perf_counter() - start) / turns * 1000
+
+
+def record_turn(session_id: str):
+    """Statement + parameter yang dikirim dalam satu turn"""
+    calls = []
+    original = prepared.execute
+
+    def recording(cursor, stmt, params=()):
+        calls.append((stmt, params))
+        return original(cursor, stmt, params)
+
+    prepared.execute = recording
+    try:
+        play_turns(session_id, 1)
+    finally:
+        prepared.execute = original
+    return calls
+
+
+def planning_ms(calls) -> float:
+    """Jumlah Planning Time (server) untuk SQL biasa dari satu turn"""
+    total = 0.0
+    with database.get_db() as conn:
+        cursor = conn.cursor()
+        for stmt, params in calls:
+            sql = cursor.mogrify(stmt.sql, params).decode("utf-8")
+            cursor.execute("EXPLAIN (SUMMARY, FORMAT JSON) " + sql)
+            total += cursor.fetchone()[0][0]["Planning Time"]
+        conn.rollback()
+    return total
+
+
+def run_benchmark():
+    print("=" * 60)
+    print(f"PREPARED STATEMENTS BENCHMARK ({TURNS} turns)")
+    print("=" * 60)
+
+    database.CACHE_ENABLED = False
+    apply_migrations()
+
+    results = {}
+    for enabled in (False, True):
+        prepared.ENABLED = enabled
+        session_id = str(uuid.uuid4())
+        database.create_session(session_id, inventory={"Rusty Sword": 1}, opening="Benchmark start")
+        play_turns(session_id, 10)  # warm-up (koneksi pool + PREPARE)
+        results[enabled] = play_turns(session_id, TURNS)
+
+    calls = record_turn(session_id)
+    plan_ms = planning_ms(calls)
+
+    print(f"{'mode':>10} | {'ms/turn':>10}")
+    print(f"{'plain':>10} | {results[False]:>10.3f}")
+    print(f"{'prepared':>10} | {results[True]:>10.3f}")
+    print(f"\nSpeedup: {results[False] / results[True]:.2f}x "
+          f"({results[False] - results[True]:.3f} ms saved per turn)")
+    print(f"Server planning time per turn (plain SQL, {len(calls)} statements): {plan_ms:.3f} ms")
+    print(f"Registered statements: {len(prepared.registered())}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
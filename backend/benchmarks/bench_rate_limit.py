@@ -0,0 +1,50 @@
+"""
+Benchmark: biaya rate limiter per request (harus jauh di bawah 1 ms).
+
+Mengukur RateLimiter.check (bucket session + IP) untuk backend memory dan,
+jika BENCH_RATE_LIMIT_POSTGRES=1, backend postgres (database lokal dengan
+migrasi terbaru).
+
+Jalankan dari folder backend:
+    python -m benchmarks.bench_rate_limit
+    BENCH_RATE_LIMIT_POSTGRES=1 POSTGRES_SERVER=localhost python -m benchmarks.bench_rate_limit
+"""
+
+import os
+import time
+
+from app.core.rate_limit import RateLimiter, MemoryBackend, PostgresBackend, get_rate_limiter
+
+ITERATIONS = {"memory": 100_000, "postgres": 2_000}
+SESSIONS = 1_000
+IPS = 200
+
+
+def measure(limiter: RateLimiter, iterations: int) -> float:
+    """Return mikrodetik per check"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        limiter.check("read", f"10.0.{i % IPS // 256}.{i % IPS % 256}", f"session-{i % SESSIONS}")
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def run_benchmark():
+    print("=" * 60)
+    print("RATE LIMITER BENCHMARK (us per request, session + IP bucket)")
+    print("=" * 60)
+
+    backends = {"memory": MemoryBackend(max_keys=100_000)}
+    if os.environ.get("BENCH_RATE_LIMIT_POSTGRES") == "1":
+        from app.db.migrate import apply_migrations
+        apply_migrations()
+        backends["postgres"] = PostgresBackend()
+
+    for name, backend in backends.items():
+        limiter = RateLimiter(backend, get_rate_limiter().budgets)
+        measure(limiter, 100)  # warm-up
+        us = measure(limiter, ITERATIONS[name])
+        print(f"{name:>10} | {us:>10.2f} us | {'✅' if us < 1000 else '❌'}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
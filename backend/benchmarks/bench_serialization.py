@@ -0,0 +1,84 @@
+"""
+Benchmark: CPU time per request vs panjang history.
+
+Membandingkan jalur lama (pydantic Session + Message per baris, lalu FastAPI
+memvalidasi ulang lewat response_model dan jsonable_encoder + json.dumps)
+dengan jalur cepat (payload dict + orjson, tanpa validasi ulang).
+
+Jalankan dari folder backend:
+    python -m benchmarks.bench_serialization
+"""
+
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models.game_state import Session, Message
+from app.models.serialization import session_payload, json_response
+
+HISTORY_LENGTHS = [10, 50, 100, 500, 1000, 5000]
+ITERATIONS = 200
+
+
+def make_fixture(history_length: int):
+    session = {
+        "id": "00000000-0000-0000-0000-000000000000",
+        "hp": 87, "max_hp": 100, "inventory": {"Rusty Sword": 1, "Arrow": 20},
+        "location": "Dark Cave", "level": 2, "exp": 40, "turn_count": history_length // 2,
+        "game_variables": {}, "active_quests": ["Find the exit"],
+        "summary": "You entered the cave and fought a goblin.", "game_over": False
+    }
+    messages = [{
+        "id": i, "role": "user" if i % 2 else "assistant",
+        "content": "The torchlight flickers across the wet stone walls. " * 6,
+        "choices_options": None, "chosen_option": None, "sequence": i
+    } for i in range(1, history_length + 1)]
+    return session, messages
+
+
+session_adapter = TypeAdapter(Session)
+
+
+def legacy_path(session, messages):
+    model = Session(
+        id=session["id"], hp=session["hp"], max_hp=session["max_hp"],
+        inventory=session["inventory"], location=session["location"],
+        level=session["level"], exp=session["exp"], turn_count=session["turn_count"],
+        game_variables=session["game_variables"], active_quests=session["active_quests"],
+        summary=session["summary"], game_over=session["game_over"],
+        messages=[Message(role=m["role"], content=m["content"],
+                          choices_options=m["choices_options"]) for m in messages],
+        choices=["Continue", "Look around", "Rest"]
+    )
+    # Meniru serialize_response FastAPI: validasi response_model + encode
+    validated = session_adapter.validate_python(model, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def fast_path(session, messages):
+    return json_response(session_payload(session, messages, ["Continue", "Look around", "Rest"])).body
+
+
+def measure(fn, session, messages) -> float:
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        fn(session, messages)
+    return (time.process_time() - start) / ITERATIONS * 1000
+
+
+def run_benchmark():
+    print("=" * 60)
+    print("SERIALIZATION BENCHMARK (CPU ms per request)")
+    print("=" * 60)
+    print(f"{'history':>8} | {'legacy':>10} | {'fast':>10} | {'speedup':>8}")
+    for length in HISTORY_LENGTHS:
+        session, messages = make_fixture(length)
+        legacy_ms = measure(legacy_path, session, messages)
+        fast_ms = measure(fast_path, session, messages)
+        print(f"{length:>8} | {legacy_ms:>10.3f} | {fast_ms:>10.3f} | {legacy_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,113 @@
+"""
+Benchmark: latency storage backend (memory vs sqlite vs postgres).
+
+Setiap backend menjalankan operasi yang sama seperti satu turn + satu
+GET /game/{id}: get_session_version, get_session, get_all_messages,
+get_world_state_map, get_story_cards_version, commit_turn (dengan diff
+inventory) dan set_world_states, pada SESSIONS session yang digilir.
+Hasil: mikrodetik per operasi (p50 / p95) dan turn per detik.
+
+Jalankan dari folder backend:
+    python -m benchmarks.bench_storage
+    BENCH_STORAGE_POSTGRES=1 POSTGRES_SERVER=localhost python -m benchmarks.bench_storage
+
+Backend postgres memakai database & migrasi lokal (STORAGE_BACKEND harus
+postgres, session benchmark dihapus setelah selesai); sqlite memakai file
+sementara.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+from app.db.storage import create_storage
+
+TURNS = {"memory": 20_000, "sqlite": 2_000, "postgres": 500}
+SESSIONS = 50
+CHARACTER = {"name": "Bench", "race": "elf", "job_class": "wizard", "background": "scholar",
+             "stats": {"hp": 60, "max_hp": 60}}
+
+
+def run_turns(storage, session_ids: List[str], turns: int) -> Dict[str, List[float]]:
+    """Return {operasi: [durasi us]}"""
+    timings = defaultdict(list)
+
+    def timed(name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings[name].append((time.perf_counter() - start) * 1_000_000)
+        return result
+
+    for i in range(turns):
+        session_id = session_ids[i % len(session_ids)]
+        timed("get_session_version", storage.get_session_version, session_id)
+        session = timed("get_session", storage.get_session, session_id)
+        timed("get_all_messages", storage.get_all_messages, session_id)
+        timed("get_world_state_map", storage.get_world_state_map, session_id)
+        timed("get_story_cards_version", storage.get_story_cards_version, session_id)
+        timed("commit_turn", storage.commit_turn, session_id, session["version"],
+              f"action {i}", f"narrative {i}", hp=session["hp"] - 1,
+              inventory_diff={f"Item {i % 5}": i % 3}, turn_count=session["turn_count"] + 1)
+        timed("set_world_states", storage.set_world_states, session_id, {f"flag_{i % 10}": {"turn": i}})
+        if i % 200 == 199:
+            # Seperti maybe_summarize: history panas tetap pendek
+            storage.archive_old_messages(session_id, keep_last=20)
+    return timings
+
+
+def run_backend(name: str, storage, turns: int):
+    storage.wait_for_database(10)
+    session_ids = [str(uuid.uuid4()) for _ in range(SESSIONS)]
+    for session_id in session_ids:
+        storage.create_session(session_id, inventory={"Rusty Sword": 1, "Health Potion": 2},
+                               character=CHARACTER, opening="Your adventure begins.")
+        storage.create_story_card(session_id, "Dark Cave", "LOCATION", "A cave.", keys=["cave"])
+
+    run_turns(storage, session_ids, min(100, turns))  # warm-up
+    start = time.perf_counter()
+    timings = run_turns(storage, session_ids, turns)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{name} ({turns} turns, {turns / elapsed:,.0f} turns/s)")
+    for operation, samples in timings.items():
+        samples.sort()
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"   {operation:<24} p50 {statistics.median(samples):>9.1f} us | p95 {p95:>9.1f} us")
+    return session_ids
+
+
+def run_benchmark():
+    print("=" * 60)
+    print("STORAGE BACKEND BENCHMARK (us per operation)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": lambda: create_storage("memory"),
+            "sqlite": lambda: create_storage("sqlite", path=os.path.join(tmp, "bench.sqlite3")),
+        }
+        if os.environ.get("BENCH_STORAGE_POSTGRES") == "1":
+            def postgres():
+                from app.db.migrate import apply_migrations
+                from app.db import database
+                database.wait_for_database(10)
+                apply_migrations()
+                return create_storage("postgres")
+            backends["postgres"] = postgres
+
+        for name, factory in backends.items():
+            storage = factory()
+            session_ids = run_backend(name, storage, TURNS[name])
+            if name == "postgres":
+                from app.db import database
+                for session_id in session_ids:
+                    database.delete_game_session(session_id)
+            storage.close_connection_pool()
+
+
+if __name__ == "__main__":
+    run_benchmark()
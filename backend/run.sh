@@ -18,5 +18,5 @@ if [ ! -f .env ]; then
     exit 1
 fi
 
-# Run uvicorn
+# Run uvicorn (development, auto reload). Production: python serve.py
 uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
@@ -0,0 +1,76 @@
+"""
+Production entrypoint: uvicorn multi-proses.
+
+- Jumlah worker = SERVER_WORKERS, atau jumlah CPU jika 0
+  (ingat: setiap worker punya pool sendiri, total koneksi DB = worker x DB_POOL_MAX_SIZE)
+- Backend per proses tidak dibagi antar worker: STORAGE_BACKEND=memory
+  dipaksa satu worker (ditolak jika SERVER_WORKERS > 1 diset eksplisit);
+  rate limit memory dan idempotency tanpa Postgres diberi peringatan
+- Setiap worker menjalankan startup (pool DB + koneksi minimum, migrasi,
+  warm-up HTTP client LLM) sebelum mulai menerima request
+- SIGTERM: berhenti menerima koneksi, request yang berjalan diberi waktu
+  SHUTDOWN_GRACE_SECONDS, turn LLM yang berjalan ditunggu di shutdown event
+
+Jalankan dari folder backend:
+    python serve.py
+
+Untuk development (auto reload) tetap gunakan ./run.sh
+"""
+
+import os
+
+import uvicorn
+
+from app.core.config import get_settings
+
+
+def worker_count(configured: int) -> int:
+    """SERVER_WORKERS, atau jumlah CPU yang boleh dipakai proses ini"""
+    if configured > 0:
+        return configured
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def resolve_workers(settings) -> int:
+    """Jumlah worker final setelah memeriksa backend yang state-nya per proses"""
+    workers = worker_count(settings.SERVER_WORKERS)
+    if workers <= 1:
+        return workers
+
+    if settings.STORAGE_BACKEND == "memory":
+        if settings.SERVER_WORKERS > 1:
+            raise SystemExit(f"❌ STORAGE_BACKEND=memory keeps all game data inside one process; "
+                             f"set SERVER_WORKERS=1 or use STORAGE_BACKEND=sqlite/postgres "
+                             f"(SERVER_WORKERS={settings.SERVER_WORKERS})")
+        print(f"⚠️ STORAGE_BACKEND=memory keeps all game data inside one process: "
+              f"starting 1 worker instead of {workers}")
+        return 1
+
+    if settings.RATE_LIMIT_ENABLED and not (settings.RATE_LIMIT_BACKEND == "postgres"
+                                            and settings.STORAGE_BACKEND == "postgres"):
+        print(f"⚠️ Rate limit buckets are per worker: effective limits are {workers}x the configured "
+              f"budgets (use RATE_LIMIT_BACKEND=postgres with STORAGE_BACKEND=postgres)")
+    if settings.STORAGE_BACKEND != "postgres":
+        print(f"⚠️ Idempotency keys are per worker with STORAGE_BACKEND={settings.STORAGE_BACKEND}: "
+              f"a retry that lands on another worker runs the action again")
+    return workers
+
+
+def main():
+    settings = get_settings()
+    workers = resolve_workers(settings)
+    print(f"🚀 Starting {workers} worker(s) on {settings.SERVER_HOST}:{settings.SERVER_PORT}")
+    uvicorn.run(
+        "app.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        proxy_headers=True,
+        timeout_graceful_shutdown=int(settings.SHUTDOWN_GRACE_SECONDS),
+    )
+
+
+if __name__ == "__main__":
+    main()
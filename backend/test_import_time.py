@@ -0,0 +1,71 @@
+"""
+Import Time Budget Test
+
+Cold start worker ditentukan oleh waktu `import app.main`. Test ini menjalankan
+`python -X importtime -c "import <module>"` di proses baru (lihat
+benchmarks/bench_import.py) dan gagal jika total waktu import melewati budget
+atau package yang seharusnya lazy (openai, psycopg2) ikut ter-import, atau
+import membaca Settings (proses diukur tanpa OPENAI_API_KEY), sehingga
+regresi tertangkap di CI.
+
+    python test_import_time.py
+    python -m pytest test_import_time.py
+
+Env opsional: IMPORT_BUDGET_MS (app.main, default 1500),
+DATABASE_IMPORT_BUDGET_MS (app.db.database, default 1000),
+ENGINE_IMPORT_BUDGET_MS (game_engine, default 300), IMPORT_RUNS (default 3)
+"""
+import sys
+
+from benchmarks.bench_import import RUNS, TARGETS, import_times
+
+
+def measure(module):
+    """(total ms terbaik dari RUNS proses, top-level package yang ter-import)"""
+    best = None
+    for _ in range(RUNS):
+        rows = import_times(module)
+        total_us = sum(self_us for _, self_us, _ in rows)
+        if best is None or total_us < best[0]:
+            best = (total_us, rows)
+    total_us, rows = best
+    return total_us / 1000, {name.split(".")[0] for name, _, _ in rows}
+
+
+def check_budgets():
+    """Daftar pelanggaran budget (kosong = lolos)"""
+    failures = []
+    for module, (budget_ms, forbidden) in TARGETS.items():
+        total_ms, loaded = measure(module)
+        print(f"   import {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        if total_ms > budget_ms:
+            failures.append(f"import {module} took {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        for package in forbidden:
+            if package in loaded:
+                failures.append(f"import {module} eagerly imports {package}")
+    return failures
+
+
+def test_import_time_within_budget():
+    failures = check_budgets()
+    assert not failures, "; ".join(failures)
+
+
+def run_test():
+    print("=" * 40)
+    print("IMPORT TIME BUDGET TEST")
+    print("=" * 40)
+
+    failures = check_budgets()
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        print("\n" + "=" * 40)
+        sys.exit(1)
+
+    print("✅ Import time within budget")
+    print("\n" + "=" * 40)
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,114 @@
+"""
+Prompt Prefix Stability Test
+
+Prompt caching provider hanya berlaku jika awal prompt identik byte-per-byte.
+Test ini membangun context untuk beberapa session dan turn yang berbeda lalu
+memastikan pesan system pertama (role, rules, schema) tidak berubah dan tidak
+memuat state apa pun; semua yang dinamis harus berada setelahnya. Varian
+pendek (mode degradasi) harus sama stabilnya dan benar-benar berbeda dari
+prompt normal.
+
+    python test_prompt_prefix.py
+    python -m pytest test_prompt_prefix.py
+"""
+import hashlib
+import sys
+
+from app.services.game_engine import build_context, SYSTEM_PROMPT, SHORT_SYSTEM_PROMPT
+
+
+def make_session(hp, level, inventory, location, summary):
+    return {
+        "hp": hp, "max_hp": 100, "level": level, "exp": level * 7,
+        "inventory": inventory, "location": location, "summary": summary
+    }
+
+
+SESSIONS = [
+    make_session(100, 1, {"Rusty Sword": 1}, "Dark Cave", ""),
+    make_session(87, 2, {"Rusty Sword": 1, "Arrow": 20}, "Goblin Camp", "You fought a goblin."),
+    make_session(12, 5, {}, "Crypt of Ash", "The lich awakened. Your party fled."),
+]
+
+TURNS = [
+    ([], "Look around", None, None),
+    ([{"role": "user", "content": "Open the door"},
+      {"role": "assistant", "content": "The door creaks open."}], "Step inside", "Goblin: small, cruel", None),
+    ([{"role": "assistant", "content": "Bones crunch underfoot."}], "Cast fireball", None, "[turn 3] user: I lit a torch"),
+]
+
+
+def prefix_bytes(conversation):
+    return conversation[0]["content"].encode("utf-8")
+
+
+def check_prefix(short=False):
+    """(daftar pelanggaran, jumlah prefix berbeda) untuk semua session x turn"""
+    failures = []
+    expected = (SHORT_SYSTEM_PROMPT if short else SYSTEM_PROMPT).encode("utf-8")
+    digests = set()
+
+    for session in SESSIONS:
+        for messages, action, lore, memories in TURNS:
+            conversation = build_context(session, messages, action, lore=lore, memories=memories, short=short)
+            prefix = prefix_bytes(conversation)
+            digests.add(hashlib.sha256(prefix).hexdigest())
+
+            if prefix != expected:
+                failures.append(f"prefix differs for {session['location']} / {action}")
+
+            dynamic = [session["location"], action, str(session["hp"])]
+            dynamic += [lore, memories] if lore or memories else []
+            if any(value and value in conversation[0]["content"] for value in dynamic):
+                failures.append(f"dynamic value leaked into prefix for {session['location']} / {action}")
+
+            if conversation[-1] != {"role": "user", "content": action}:
+                failures.append(f"action is not the last message for {action}")
+
+    if len(digests) != 1:
+        failures.append(f"{len(digests)} distinct prefixes (expected 1)")
+    return failures, len(digests)
+
+
+def test_prompt_prefix_is_stable():
+    failures, _ = check_prefix()
+    assert not failures, "; ".join(failures)
+
+
+def test_short_prompt_prefix_is_stable():
+    failures, _ = check_prefix(short=True)
+    assert not failures, "; ".join(failures)
+
+
+def test_short_prompt_differs():
+    # replace() di game_engine diam-diam tidak berbuat apa-apa jika teks LENGTH diubah
+    assert SHORT_SYSTEM_PROMPT != SYSTEM_PROMPT
+
+
+def run_test():
+    print("=" * 40)
+    print("PROMPT PREFIX STABILITY TEST")
+    print("=" * 40)
+
+    print(f"\n1. Building {len(SESSIONS) * len(TURNS)} contexts (normal + short)...")
+    failures, distinct = check_prefix()
+    short_failures, short_distinct = check_prefix(short=True)
+    failures += [f"short: {failure}" for failure in short_failures]
+    if SHORT_SYSTEM_PROMPT == SYSTEM_PROMPT:
+        failures.append("SHORT_SYSTEM_PROMPT is identical to SYSTEM_PROMPT")
+
+    print(f"\n2. Distinct prefixes: {distinct} normal, {short_distinct} short "
+          f"({len(SYSTEM_PROMPT.encode('utf-8'))} bytes)")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        print("\n" + "=" * 40)
+        sys.exit(1)
+
+    print("✅ Prompt prefix is byte-stable across turns and sessions")
+    print("\n" + "=" * 40)
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,233 @@
+"""
+Query Plan Regression Test
+
+Menjalankan setiap fungsi di app/db/database.py terhadap Postgres lokal yang
+sudah di-seed, merekam semua query yang dikirim, lalu menjalankan EXPLAIN untuk
+masing-masing. Test gagal jika query hot path memakai Seq Scan pada tabel yang
+lebih besar dari ROW_THRESHOLD baris.
+
+Persiapan (database kosong dengan skema dari init.sql):
+    docker compose up -d db
+    POSTGRES_SERVER=localhost python test_query_plans.py
+
+Env opsional: PLAN_SEED_SESSIONS (default 2000), PLAN_ROW_THRESHOLD (default 1000)
+"""
+import inspect
+import os
+import sys
+
+import psycopg2
+import psycopg2.extensions
+
+from app.db import database, prepared
+from app.db.migrate import apply_migrations
+
+SEED_SESSIONS = int(os.environ.get("PLAN_SEED_SESSIONS", "2000"))
+ROW_THRESHOLD = int(os.environ.get("PLAN_ROW_THRESHOLD", "1000"))
+
+recorded = []  # (function name, sql)
+current_function = None
+
+
+class RecordingConnection(psycopg2.extensions.connection):
+    """Connection yang membungkus setiap cursor agar query-nya direkam"""
+    _recording_classes = {}
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        recording = self._recording_classes.get(base)
+        if recording is None:
+            def execute(cursor, query, vars=None):
+                sql = cursor.mogrify(query, vars).decode("utf-8")
+                recorded.append((current_function, sql))
+                return base.execute(cursor, query, vars)
+            recording = type(f"Recording{base.__name__}", (base,), {"execute": execute})
+            self._recording_classes[base] = recording
+        kwargs["cursor_factory"] = recording
+        return super().cursor(*args, **kwargs)
+
+
+SEED_SQL = """
+INSERT INTO game_sessions (summary, updated_at)
+SELECT 'seed', NOW() - random() * INTERVAL '30 days' FROM generate_series(1, %(n)s);
+
+INSERT INTO characters (session_id, name) SELECT id, 'Seed' FROM game_sessions;
+
+INSERT INTO inventory_items (character_id, item_name, quantity)
+SELECT c.id, 'Item ' || g, 1 FROM characters c, generate_series(1, 3) g;
+
+INSERT INTO quests (session_id, title, status)
+SELECT id, 'Quest ' || g, CASE WHEN g = 1 THEN 'active' ELSE 'completed' END
+FROM game_sessions, generate_series(1, 2) g;
+
+INSERT INTO chat_history (session_id, role, content, turn_order)
+SELECT id, CASE WHEN g %% 2 = 0 THEN 'user' ELSE 'assistant' END, 'seed message', 100 + g
+FROM game_sessions, generate_series(1, 20) g;
+
+INSERT INTO chat_history_archive (id, session_id, role, content, created_at, turn_order)
+SELECT gen_random_uuid(), id, 'user', 'archived seed message', NOW(), g
+FROM game_sessions, generate_series(1, 20) g;
+
+INSERT INTO story_cards (session_id, title, type, description, keys)
+SELECT id, 'Card ' || g, 'NPC', 'seed card', '["seed", "goblin"]'
+FROM game_sessions, generate_series(1, 3) g;
+
+INSERT INTO world_state (session_id, entity_key, current_state)
+SELECT id, 'flag_' || g, '{"seen": true}' FROM game_sessions, generate_series(1, 3) g;
+
+INSERT INTO memory_vectors (session_id, turn_order, role, content, embedding)
+SELECT id, g, 'user', 'seed memory', '\\x0000'::bytea FROM game_sessions, generate_series(1, 5) g;
+
+INSERT INTO story_summaries (session_id, level, idx, content)
+SELECT id, 'chunk', g, 'seed summary' FROM game_sessions, generate_series(0, 2) g;
+"""
+
+
+def seed():
+    with database.get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM game_sessions")
+        if cursor.fetchone()[0] < SEED_SESSIONS:
+            print(f"   Seeding {SEED_SESSIONS} sessions...")
+            cursor.execute(SEED_SQL, {"n": SEED_SESSIONS})
+        cursor.execute("ANALYZE")
+        conn.commit()
+
+
+def sample_ids():
+    with database.get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.id, c.id, i.id, q.id FROM game_sessions s
+            JOIN characters c ON c.session_id = s.id
+            JOIN inventory_items i ON i.character_id = c.id
+            JOIN quests q ON q.session_id = s.id
+            LIMIT 1
+        """)
+        return [str(v) for v in cursor.fetchone()]
+
+
+def exercise(session_id, character_id, item_id, quest_id):
+    """Panggil setiap fungsi database dengan data seed"""
+    global current_function
+    calls = {
+        "get_game_session": lambda: database.get_game_session(session_id),
+        "update_game_session": lambda: database.update_game_session(session_id, summary="plan check"),
+        "get_character": lambda: database.get_character(session_id),
+        "update_character": lambda: database.update_character(character_id, gold=1),
+        "add_inventory_item": lambda: database.add_inventory_item(character_id, "Plan Check Item"),
+        "get_inventory": lambda: database.get_inventory(character_id),
+        "update_inventory_item": lambda: database.update_inventory_item(item_id, quantity=2),
+        "get_quests": lambda: (database.get_quests(session_id), database.get_quests(session_id, "active")),
+        "update_quest_status": lambda: database.update_quest_status(quest_id, "completed"),
+        "add_chat_message": lambda: database.add_chat_message(session_id, "user", "plan check"),
+        "get_chat_history": lambda: database.get_chat_history(session_id),
+        "get_all_chat_history": lambda: database.get_all_chat_history(session_id),
+        "get_story_cards": lambda: (database.get_story_cards(session_id), database.get_story_cards(session_id, "NPC")),
+        "get_story_cards_version": lambda: database.get_story_cards_version(session_id),
+        "search_story_cards_by_keyword": lambda: database.search_story_cards_by_keyword(session_id, "goblin"),
+        "get_memory_vectors": lambda: database.get_memory_vectors(session_id),
+        "get_last_story_summary": lambda: database.get_last_story_summary(session_id, "chunk"),
+        "get_story_summaries": lambda: database.get_story_summaries(session_id, "chunk", 0, 4),
+        "upsert_story_summary": lambda: database.upsert_story_summary(session_id, "saga", 0, "plan check", 1),
+        "set_world_state": lambda: database.set_world_state(session_id, "plan_check", {"ok": True}),
+        "get_world_state": lambda: database.get_world_state(session_id, "plan_check"),
+        "get_all_world_states": lambda: database.get_all_world_states(session_id),
+        "set_world_states": lambda: database.set_world_states(session_id, {"flag_1": {"seen": False}, "plan_bulk": {"ok": True}}),
+        "get_world_state_map": lambda: database.get_world_state_map(session_id),
+        "get_presets_by_category": lambda: database.get_presets_by_category("RACE"),
+        "get_preset_by_value": lambda: database.get_preset_by_value("RACE", "elf"),
+        "get_all_presets": lambda: database.get_all_presets(),
+        "load_preset_catalog": lambda: database.load_preset_catalog(),
+        "get_preset_catalog": lambda: database.get_preset_catalog(),
+        "count_idle_sessions": lambda: database.count_idle_sessions(24 * 365),
+        "purge_idle_sessions": lambda: database.purge_idle_sessions(24 * 365 * 100, 10),
+        "_load_session": lambda: database._load_session(session_id),
+        "count_pooled_sessions": lambda: database.count_pooled_sessions(),
+        "claim_pooled_session": lambda: database.claim_pooled_session("plan/check", "Plan"),
+        "get_session_version": lambda: database.get_session_version(session_id),
+        "commit_turn": lambda: database.commit_turn(session_id, database._load_session(session_id)["version"],
+                                                    "plan check", "plan narrative", hp=98, turn_count=2),
+        "update_session": lambda: database.update_session(session_id, hp=99, turn_count=1,
+                                                          inventory_diff={"Item 1": 0, "Item 2": 5, "Arrow": 20}),
+        "get_messages": lambda: database.get_messages(session_id),
+        "get_all_messages": lambda: database.get_all_messages(session_id),
+        "get_message_count": lambda: database.get_message_count(session_id),
+        "archive_old_messages": lambda: database.archive_old_messages(session_id, keep_last=10),
+        "iter_archived_messages": lambda: list(database.iter_archived_messages(session_id)),
+    }
+
+    for name, call in calls.items():
+        current_function = name
+        call()
+    current_function = None
+
+    # Fungsi database publik yang belum dicakup test ini
+    public = {
+        name for name, fn in inspect.getmembers(database, inspect.isfunction)
+        if fn.__module__ == database.__name__ and not name.startswith("_")
+    }
+    return sorted(public - set(calls))
+
+
+def seq_scans(plan, found):
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        seq_scans(child, found)
+    return found
+
+
+def table_rows(cursor, relation):
+    cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", (relation,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def run_test():
+    print("=" * 40)
+    print("QUERY PLAN REGRESSION TEST")
+    print("=" * 40)
+
+    database.connection_pool = database.create_connection_pool(connection_factory=RecordingConnection)
+    database.CACHE_ENABLED = False  # Setiap panggilan harus benar-benar ke database
+    prepared.ENABLED = False  # EXPLAIN butuh SQL asli, bukan EXECUTE name (...)
+
+    print("\n1. Applying migrations & seeding...")
+    apply_migrations()
+    seed()
+
+    print("\n2. Recording queries...")
+    recorded.clear()
+    uncovered = exercise(*sample_ids())
+    for name in uncovered:
+        print(f"⚠️  Not covered: {name}")
+
+    print(f"\n3. EXPLAIN {len(recorded)} queries (threshold {ROW_THRESHOLD} rows)...")
+    failures = []
+    with database.get_db() as conn:
+        cursor = conn.cursor()
+        for function, sql in list(recorded):
+            statement = sql.strip().split(None, 1)[0].upper()
+            if statement not in ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH"):
+                continue
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql)
+            plan = cursor.fetchone()[0][0]["Plan"]
+            for relation in seq_scans(plan, []):
+                rows = table_rows(cursor, relation)
+                if rows > ROW_THRESHOLD:
+                    failures.append((function, relation, rows, " ".join(sql.split())[:120]))
+        conn.rollback()
+
+    if failures:
+        for function, relation, rows, sql in failures:
+            print(f"❌ {function}: Seq Scan on {relation} (~{rows} rows)\n   {sql}")
+        print("\n" + "=" * 40)
+        sys.exit(1)
+
+    print("✅ No sequential scans above threshold")
+    print("\n" + "=" * 40)
+
+
+if __name__ == "__main__":
+    run_test()
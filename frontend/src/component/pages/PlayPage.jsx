@@ -5,7 +5,7 @@ const PlayPage = () => {
     const [sessionId, setSessionId] = useState(null);
     const [messages, setMessages] = useState([]);
     const [choices, setChoices] = useState([]);
-    const [stats, setStats] = useState({ hp: 100, maxHp: 100, level: 1, exp: 0, location: '', inventory: [] });
+    const [stats, setStats] = useState({ hp: 100, maxHp: 100, level: 1, exp: 0, location: '', inventory: {} });
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
     const [showInventory, setShowInventory] = useState(false);
@@ -222,17 +222,17 @@ const PlayPage = () => {
                                 }`}
                         >
                             <span>🎒</span>
-                            <span className="text-sm font-medium">{stats.inventory?.length || 0}</span>
+                            <span className="text-sm font-medium">{Object.keys(stats.inventory || {}).length}</span>
                         </button>
 
                         {/* Inventory Dropdown */}
                         {showInventory && (
                             <div className="absolute top-full left-0 mt-2 bg-[#0f172a]/95 backdrop-blur-md rounded-lg border border-[#facc15]/20 p-4 w-48 shadow-xl">
                                 <h3 className="text-[#facc15] text-sm font-semibold mb-3" style={{ fontFamily: 'var(--font-display)' }}>🎒 Inventory</h3>
-                                {stats.inventory?.length > 0 ? (
+                                {Object.keys(stats.inventory || {}).length > 0 ? (
                                     <ul className="space-y-2">
-                                        {stats.inventory.map((item, index) => (
-                                            <li key={index} className="text-gray-300 text-sm">• {item}</li>
+                                        {Object.entries(stats.inventory).map(([item, quantity]) => (
+                                            <li key={item} className="text-gray-300 text-sm">• {item}{quantity > 1 ? ` x${quantity}` : ''}</li>
                                         ))}
                                     </ul>
                                 ) : (